@@ -2,16 +2,28 @@
 Chat API endpoints for medical question-answering.
 Handles query processing, history retrieval, and session management.
 """
-from fastapi import APIRouter, HTTPException, Query
-from typing import List
-from sqlalchemy import desc
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from datetime import datetime
 from contextlib import contextmanager
+from sqlalchemy.exc import OperationalError
 
-from app.schemas.chat import ChatRequest, ChatResponse, ChatHistoryItem
-from app.services.chat_service import process_chat_message
+from app.schemas.chat import ChatRequest, ChatResponse, ChatHistoryItem, ChatSearchHit
+from app.services.chat_service import process_chat_message, stream_chat_message
+from app.services.history_writer import get_history_writer
+from app.services.history_query import decode_cursor, history_page
+from app.services.history_export import MEDIA_TYPES, export_history
+from app.services.history_search import search_history
+from app.services.auth_service import get_admin_user
+from app.rag.qa_cache import get_cache_stats
+from app.rag.embeddings import get_query_cache_stats
+from app.core.config import settings
 from app.utils.logger import get_logger
 from app.db.session import SessionLocal
 from app.models.history import ChatHistory
+from app.models.users import User
 
 logger = get_logger("chat_api")
 
@@ -47,22 +59,60 @@ async def chat_endpoint(request: ChatRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/query/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    Process a medical query and stream the answer as Server-Sent Events.
+
+    Events, in order:
+        sources — JSON list of citation labels
+        token   — JSON string, one answer fragment per event
+        error   — JSON object, only if generation fails part-way
+        done    — JSON object with session_id and whether the answer was cached
+    """
+    logger.info(f"📨 Received streaming query: {request.message[:50]}...")
+
+    async def event_stream():
+        async for event, data in stream_chat_message(request):
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/history/{session_id}", response_model=List[ChatHistoryItem])
-async def get_chat_history(session_id: str):
+async def get_chat_history(
+    session_id: str,
+    response: Response,
+    limit: int = Query(settings.HISTORY_PAGE_SIZE, ge=1, le=settings.HISTORY_PAGE_MAX_SIZE),
+    before: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
+):
     """
-    Retrieve chat history for a specific session.
+    Retrieve chat history for a specific session, one page at a time.
     
     Args:
         session_id: Unique session identifier
+        limit: Maximum number of interactions to return
+        before: Cursor of the previous page; omit it for the most recent interactions
     
     Returns:
-        List of chat interactions sorted by timestamp
+        Up to `limit` chat interactions, newest first. When older ones exist, the
+        X-Next-Cursor response header holds the `before` value for the next page.
     """
     try:
+        cursor = decode_cursor(before) if before else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        await get_history_writer().flush()  # include records still queued for the writer
         with get_db() as db:
-            history = db.query(ChatHistory).filter(
-                ChatHistory.session_id == session_id
-            ).order_by(desc(ChatHistory.timestamp)).all()
+            history, next_cursor = history_page(db, session_id, limit, cursor)
+            if next_cursor:
+                response.headers["X-Next-Cursor"] = next_cursor
             
             return [
                 ChatHistoryItem(
@@ -92,6 +142,7 @@ async def clear_chat_history(session_id: str):
         Success message
     """
     try:
+        await get_history_writer().flush()  # queued records must not reappear after the delete
         with get_db() as db:
             db.query(ChatHistory).filter(
                 ChatHistory.session_id == session_id
@@ -105,6 +156,78 @@ async def clear_chat_history(session_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/export")
+async def export_chat_history(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    session_id: Optional[str] = Query(None, description="Only this session"),
+    since: Optional[datetime] = Query(None, description="Only interactions at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only interactions before this time (default: now)"),
+    admin: User = Depends(get_admin_user),
+):
+    """
+    Stream chat history as NDJSON or CSV for offline analysis.
+    
+    Rows are read in short (timestamp, id)-ordered batches and sent as they are read, so
+    memory stays flat however many rows match and chat traffic is not held up by the export.
+    Every user's history can be exported, so only admins (ADMIN_EMAILS) may call this.
+    """
+    logger.info(f"📤 History export by {admin.email}: session={session_id or 'all'}, format={format}")
+    await get_history_writer().flush()  # include records still queued for the writer
+    chunks = export_history(format, SessionLocal, session_id=session_id, since=since, until=until or datetime.utcnow())
+    filename = f"chat_history_{session_id or 'all'}.{format}"
+    return StreamingResponse(
+        chunks,  # a sync iterator: batches are read in the threadpool, off the event loop
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/search", response_model=List[ChatSearchHit])
+async def search_chat_history(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=500, description="Words that must all appear in the question or answer"),
+    session_id: Optional[str] = Query(None, description="Only this session"),
+    since: Optional[datetime] = Query(None, description="Only interactions at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only interactions before this time"),
+    limit: int = Query(settings.HISTORY_PAGE_SIZE, ge=1, le=settings.HISTORY_PAGE_MAX_SIZE),
+    offset: int = Query(0, ge=0, description="X-Next-Offset header of the previous page"),
+    admin: User = Depends(get_admin_user),
+):
+    """
+    Full-text search over past questions and answers, best match first.
+    
+    Returns:
+        Up to `limit` matching interactions with a relevance score and a snippet. When more
+        matches exist, the X-Next-Offset response header holds the `offset` of the next page.
+        Searches every user's history, so only admins (ADMIN_EMAILS) may call this; 503 when
+        the database has no full-text index.
+    """
+    try:
+        await get_history_writer().flush()  # include records still queued for the writer
+        with get_db() as db:
+            hits, next_offset = search_history(db, q, limit, offset, session_id=session_id, since=since, until=until)
+        if next_offset is not None:
+            response.headers["X-Next-Offset"] = str(next_offset)
+        
+        return [
+            ChatSearchHit(**{**hit, "sources": hit["sources"].split("|") if hit["sources"] else []})
+            for hit in hits
+        ]
+    except OperationalError as e:
+        # No FTS5 index: not SQLite, SQLite built without FTS5, or ensure_history_fts failed
+        logger.error(f"History search unavailable: {str(e)}")
+        raise HTTPException(status_code=503, detail="Chat history search is unavailable.")
+    except Exception as e:
+        logger.exception(f"History search error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Chat history search failed.")
+
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """QA cache and query-embedding cache counters, plus semantic similarity distribution."""
+    return {**get_cache_stats(), "query_embeddings": get_query_cache_stats()}
+
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint for monitoring."""
@@ -1,14 +1,87 @@
-from sqlalchemy import create_engine
+from typing import List
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import settings
 
 # SQLite database file path
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False}  # Needed for SQLite + FastAPI
-)
+
+def sqlite_pragmas() -> List[str]:
+    """The SQLite performance profile from the SQLITE_* settings, as PRAGMA statements."""
+    return [
+        # WAL lets every worker read the QA cache and history while another one writes
+        f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}",
+        f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}",
+        f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KIB)}",  # negative = KiB, not pages
+        f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None) -> None:
+    """Connect listener: apply the profile to every new connection (most pragmas are per connection)."""
+    cursor = dbapi_connection.cursor()
+    for pragma in sqlite_pragmas():
+        cursor.execute(pragma)
+    cursor.close()
+
+
+def create_db_engine(url: str, tuned: bool = True):
+    """
+    Engine for url. A SQLite file gets a QueuePool of DB_POOL_SIZE connections shared by the
+    request threads and, when tuned, the SQLITE_* profile on each connection. In-memory SQLite
+    keeps SQLAlchemy's default pool, since every connection would be a separate database.
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite":
+        return create_engine(url, pool_pre_ping=True, pool_size=settings.DB_POOL_SIZE, max_overflow=settings.DB_MAX_OVERFLOW)
+
+    options = {"connect_args": {"check_same_thread": False}}  # Needed for SQLite + FastAPI
+    if parsed.database not in (None, "", ":memory:"):
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+    db_engine = create_engine(url, **options)
+    if tuned:
+        event.listen(db_engine, "connect", apply_sqlite_pragmas)
+    return db_engine
+
+
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+
+def add_missing_columns(bind=engine) -> None:
+    """
+    create_all() never alters tables that already exist. Add model columns that an older
+    database is missing; new columns are nullable, so ALTER TABLE ... ADD COLUMN suffices.
+    """
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=bind.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+
+def add_missing_indexes(bind=engine) -> None:
+    """create_all() also skips indexes of existing tables; create the ones a model gained since."""
+    inspector = inspect(bind)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=bind)
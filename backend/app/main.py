@@ -1,11 +1,14 @@
 from contextlib import asynccontextmanager
+from functools import partial
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.chat import router as chat_router
 from app.core.config import settings
 from app.utils.logger import get_logger
-from app.db.session import engine, Base 
+from app.db.session import engine, Base, SessionLocal, add_missing_columns, add_missing_indexes
 from app.models.history import ChatHistory 
+from app.models.cache import QACacheEntry
+from app.services.history_search import ensure_history_fts
 
 from app.api.auth import router as auth_router     
 from app.db.postgres_session import pg_engine, AuthBase  
@@ -18,6 +21,9 @@ logger = get_logger("main")
 async def lifespan(app: FastAPI):
     logger.info("Verifying SQL Database tables...")
     Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
+    add_missing_indexes(engine)
+    ensure_history_fts(engine)
     # inside lifespan(), after Base.metadata.create_all(bind=engine):
     try:
         AuthBase.metadata.create_all(bind=pg_engine)
@@ -27,6 +33,10 @@ async def lifespan(app: FastAPI):
 
 
     logger.info("Database is ready.")
+
+    if settings.CACHE_BACKEND == "sqlite":
+        from app.rag.qa_cache import warm_cache
+        logger.info(f"QA cache warmed with {warm_cache()} entries from SQLite.")
     
     logger.info("Pre-loading vector store index (this may take a moment)...")
     try:
@@ -34,28 +44,52 @@ async def lifespan(app: FastAPI):
         vs = get_vector_store()
         logger.info(f"Vector store ready — {len(vs.documents)} documents loaded.")
         
-        # Issue 7: On-demand indexing moved to startup to avoid blocking live requests
-        if len(vs.documents) == 0:
-            logger.info("Vector store index is empty. Running initial PDF ingestion...")
-            try:
-                from app.rag.loader import load_medical_documents
-                from app.rag.vectorstore import SimpleDocument
-                loaded_docs = load_medical_documents(settings.PDF_FOLDER)
-                if loaded_docs:
-                    vs.add_documents([
-                        SimpleDocument(page_content=doc.page_content, metadata=doc.metadata)
-                        for doc in loaded_docs
-                    ])
-                    logger.info(f"Successfully loaded and indexed {len(loaded_docs)} documents on startup.")
-                else:
-                    logger.warning("No PDF documents found to index during startup.")
-            except Exception as load_error:
-                logger.error(f"Failed to auto-load documents on startup: {str(load_error)}")
+        # Issue 7: On-demand indexing moved to startup to avoid blocking live requests.
+        # The sync is incremental: only new, changed or removed files (or files whose chunks
+        # are missing from the index) are processed, so it runs on every startup.
+        logger.info("Syncing the vector store with the PDF folder...")
+        db = SessionLocal()
+        try:
+            from app.rag.ingestion import sync_documents
+            from app.rag.loader import SUPPORTED_EXTENSIONS, load_medical_files
+            from app.rag.page_cache import get_page_cache
+            from app.rag.splitter import get_text_splitter
+            page_cache = get_page_cache()
+            stats = sync_documents(
+                vs, settings.PDF_FOLDER, db,
+                extensions=tuple(SUPPORTED_EXTENSIONS),
+                load_files=partial(load_medical_files, page_cache=page_cache),
+                split=get_text_splitter().split_pages,  # CHUNK_SIZE chunks, not whole pages
+                page_cache=page_cache,  # reuses the content hashes sync_documents computes
+            )
+            if stats["chunks"] or stats["removed"]:
+                logger.info(f"Indexed {stats['chunks']} chunks on startup; {len(vs.documents)} documents in the index.")
+            elif len(vs.documents) == 0:
+                logger.warning("No PDF documents found to index during startup.")
+        except Exception as load_error:
+            logger.error(f"Failed to sync documents on startup: {str(load_error)}")
+        finally:
+            db.close()
     except Exception as e:
         logger.warning(f"Vector store pre-load failed: {e}")
-    
+
+    from app.rag.chain import start_llm_client, close_llm_client
+    await start_llm_client()
+    logger.info("Groq HTTP connection pool opened.")
+
     yield
 
+    from app.services.history_writer import get_history_writer
+    await get_history_writer().close()
+    logger.info(f"Chat history writer flushed: {get_history_writer().stats()}")
+
+    await close_llm_client()
+    logger.info("Groq HTTP connection pool closed.")
+
+    from app.rag import vectorstore
+    if vectorstore._vector_store_instance is not None:
+        await vectorstore._vector_store_instance.query_batcher.close()
+
 
 def create_app() -> FastAPI:
     app = FastAPI(
@@ -71,6 +105,7 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "X-Next-Offset"],  # history / search pagination, for browser clients
     )
 
     # Include routers
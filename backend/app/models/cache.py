@@ -0,0 +1,37 @@
+from sqlalchemy import Column, String, Text, DateTime, LargeBinary
+from datetime import datetime
+from app.db.session import Base
+
+
+class QACacheEntry(Base):
+    """
+    Persistent QA cache shared by every worker process (CACHE_BACKEND=sqlite).
+    Rows are keyed by the SHA-256 of the normalized question.
+    """
+    __tablename__ = "qa_cache"
+
+    key_hash = Column(String(64), primary_key=True)           # sha256 hex of normalized question
+    question = Column(Text, nullable=False)
+    answer = Column(Text, nullable=False)
+    embedding = Column(LargeBinary, nullable=True)            # float32 question embedding
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=True, index=True)  # NULL = never expires
+
+    def __repr__(self):
+        return f"<QACacheEntry(key_hash={self.key_hash[:12]}, expires_at={self.expires_at})>"
+
+
+class EmbeddingCacheEntry(Base):
+    """
+    Content-addressed chunk embeddings: rows are keyed by the SHA-256 of (model name, chunk
+    text), so re-ingesting an unchanged chunk reuses its vector instead of re-encoding it.
+    """
+    __tablename__ = "embedding_cache"
+
+    key_hash = Column(String(64), primary_key=True)           # sha256 hex of model name + chunk text
+    model = Column(String(200), nullable=False)
+    embedding = Column(LargeBinary, nullable=False)           # float32 vector as returned by the model
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<EmbeddingCacheEntry(key_hash={self.key_hash[:12]}, model={self.model})>"
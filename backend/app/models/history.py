@@ -1,5 +1,5 @@
 
-from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Index
 from datetime import datetime
 from app.db.session import Base
 
@@ -18,6 +18,11 @@ class ChatHistory(Base):
     sources = Column(String(1000), nullable=True) # Citation sources (pipe-separated)
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
 
+    __table_args__ = (
+        # Keyset pagination of a session's history: newest first, seek by (timestamp, id)
+        Index("ix_chat_history_session_timestamp_id", "session_id", "timestamp", "id"),
+    )
+
     def __repr__(self):
         return f"<ChatHistory(id={self.id}, session_id={self.session_id}, timestamp={self.timestamp})>"
 
@@ -25,7 +30,7 @@ class ChatHistory(Base):
 class DocumentMetadata(Base):
     """
     Stores metadata about ingested PDF documents.
-    Useful for analytics and source tracking.
+    Useful for analytics and source tracking, and lets re-ingestion skip unchanged files.
     """
     __tablename__ = "document_metadata"
 
@@ -34,6 +39,9 @@ class DocumentMetadata(Base):
     file_path = Column(String(512))
     total_pages = Column(Integer)
     total_chunks = Column(Integer)
+    content_hash = Column(String(64), nullable=True)  # sha256 of the file at its last ingestion
+    file_size = Column(Integer, nullable=True)
+    file_mtime = Column(Float, nullable=True)         # os.stat().st_mtime at its last ingestion
     ingest_date = Column(DateTime, default=datetime.utcnow)
     last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -0,0 +1,263 @@
+# Bulk document embedding across a pool of worker processes, each with its own model
+import os
+import time
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from app.core.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger("bulk_embed")
+
+_END = object()
+
+# Model of this worker process, built once by _init_worker
+_worker_model = None
+
+
+def set_torch_threads(threads: int) -> None:
+    """Limit intra-op threads so N workers x threads does not oversubscribe the cores."""
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+
+
+def _init_worker(model_factory: Callable[[], Any], torch_threads: int) -> None:
+    global _worker_model
+    set_torch_threads(torch_threads)
+    _worker_model = model_factory()
+
+
+def _encode_batch(texts: List[str]) -> Tuple[np.ndarray, float]:
+    """Embed one batch in a worker process; also returns the seconds the encode took."""
+    start = time.perf_counter()
+    vectors = np.asarray(_worker_model.embed_documents(texts), dtype=np.float32)
+    return vectors, time.perf_counter() - start
+
+
+def _default_model_factory():
+    from app.rag.embeddings import get_embeddings_model
+    return get_embeddings_model()
+
+
+class AdaptiveBatchSize:
+    """
+    Picks the embedding batch size by hill climbing on measured rows per second: starting at
+    minimum, the size doubles while `samples` full batches at the new size are more than `gain`
+    faster than the best so far, then settles on the best size seen. Larger batches amortize
+    per-call overhead until padding and cache misses make them slower again.
+    """
+
+    def __init__(self, minimum: int, maximum: int, samples: int = 3, gain: float = 1.05):
+        self.size = minimum
+        self.maximum = maximum
+        self.samples = samples
+        self.gain = gain
+        self.best_size = minimum
+        self.best_rate = 0.0
+        self.settled = minimum >= maximum
+        self._rows = 0
+        self._seconds = 0.0
+        self._count = 0
+
+    def record(self, rows: int, seconds: float) -> None:
+        if self.settled or rows != self.size:  # stream tails and batches cut at an older size
+            return
+        self._rows += rows
+        self._seconds += seconds
+        self._count += 1
+        if self._count < self.samples:
+            return
+
+        rate = self._rows / max(self._seconds, 1e-9)
+        self._rows, self._seconds, self._count = 0, 0.0, 0
+        if rate > self.best_rate * self.gain:
+            self.best_size, self.best_rate = self.size, rate
+            if self.size >= self.maximum:
+                self.settled = True
+            else:
+                self.size = min(self.size * 2, self.maximum)
+        else:
+            self.size = self.best_size
+            self.settled = True
+            logger.info(f"Embedding batch size settled at {self.size} ({self.best_rate:.0f} chunks/s per worker)")
+
+
+class BulkEmbedder:
+    """
+    Embeds a stream of texts in batches over `workers` processes and returns the vectors in
+    input order.
+
+    Each worker builds its own model with model_factory (get_embeddings_model by default) and
+    limits torch to torch_threads intra-op threads, cores / workers by default. Workers are
+    started with "spawn": forking a parent whose torch thread pool is already running can
+    deadlock. With one worker nothing is started and batches are encoded in this process with
+    `model` (or a model from model_factory). About 2 x workers batches are in flight; the batch
+    size is tuned by AdaptiveBatchSize between min_batch and max_batch.
+
+    With an EmbeddingCache as cache, texts already embedded by the same model are served from
+    it and only the rest reach the model; their new vectors are added to the cache.
+    """
+
+    def __init__(
+        self,
+        model: Any = None,
+        model_factory: Optional[Callable[[], Any]] = None,
+        workers: Optional[int] = None,
+        torch_threads: Optional[int] = None,
+        min_batch: Optional[int] = None,
+        max_batch: Optional[int] = None,
+        cache=None,
+    ):
+        self.workers = workers or settings.EMBEDDING_WORKERS or os.cpu_count() or 1
+        self.torch_threads = torch_threads or settings.EMBEDDING_TORCH_THREADS or max(1, (os.cpu_count() or 1) // self.workers)
+        self.model = model
+        self.model_factory = model_factory or _default_model_factory
+        self.cache = cache
+        self.batch_size = AdaptiveBatchSize(
+            min_batch or settings.EMBEDDING_BULK_MIN_BATCH,
+            max_batch or settings.EMBEDDING_BULK_MAX_BATCH,
+        )
+        self.rows = 0
+        self.batches = 0
+        self.encode_seconds = 0.0  # summed over workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def in_flight(self) -> int:
+        return 1 if self.workers == 1 else 2 * self.workers
+
+    def _submit(self, texts: List[str]):
+        if self.workers == 1:
+            if self.model is None:
+                self.model = self.model_factory()
+            start = time.perf_counter()
+            vectors = np.asarray(self.model.embed_documents(texts), dtype=np.float32)
+            return vectors, time.perf_counter() - start
+
+        if self._pool is None:
+            logger.info(f"Starting {self.workers} embedding workers with {self.torch_threads} torch threads each")
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_factory, self.torch_threads),
+            )
+        return self._pool.submit(_encode_batch, texts)
+
+    def _result(self, unit) -> np.ndarray:
+        vectors, seconds = unit.result() if isinstance(unit, Future) else unit
+        self.rows += len(vectors)
+        self.batches += 1
+        self.encode_seconds += seconds
+        self.batch_size.record(len(vectors), seconds)
+        return vectors
+
+    def _lookup(self, texts: Sequence[str]) -> Tuple[Sequence[str], Optional[tuple]]:
+        """Texts the model still has to embed, and how to merge them with the cached vectors."""
+        if self.cache is None or not texts:
+            return texts, None
+        keys = self.cache.keys(texts)
+        found = self.cache.get_many(keys)
+        misses = [i for i, key in enumerate(keys) if key not in found]
+        return [texts[i] for i in misses], (keys, found, misses)
+
+    def _merge(self, embedded: np.ndarray, plan: Optional[tuple]) -> np.ndarray:
+        """Cache the newly embedded vectors and put them back among the cached ones."""
+        if plan is None:
+            return embedded
+        keys, found, misses = plan
+        self.cache.put_many([keys[i] for i in misses], embedded)
+        if not found:
+            return embedded
+        vectors = np.empty((len(keys), len(next(iter(found.values())))), dtype=np.float32)
+        for i, key in enumerate(keys):
+            if key in found:
+                vectors[i] = found[key]
+        if misses:
+            vectors[misses] = embedded
+        return vectors
+
+    def embed_stream(self, items: Iterable[Tuple[Any, Sequence[str]]]) -> Iterator[Tuple[Any, np.ndarray]]:
+        """
+        For each (tag, texts) in items yield (tag, vectors of texts), in input order. Texts of
+        consecutive items are packed into batches of the current batch size, so items of any
+        length (including none) keep the workers evenly loaded. items is consumed lazily, only
+        as far as needed to keep the pool busy.
+        """
+        upcoming = iter(items)
+        waiting = deque()   # (tag, rows to embed, cache plan) not yet handed back, in input order
+        units = deque()     # submitted batches, in input order
+        ready: List[np.ndarray] = []  # finished vectors not yet handed back
+        ready_rows = 0
+        texts: List[str] = []
+        exhausted = False
+        try:
+            while True:
+                while waiting and waiting[0][1] <= ready_rows:
+                    tag, rows, plan = waiting.popleft()
+                    done = np.concatenate(ready) if len(ready) > 1 else (ready[0] if ready else np.empty((0, 0), np.float32))
+                    ready = [done[rows:]] if rows < len(done) else []
+                    ready_rows -= rows
+                    yield tag, self._merge(done[:rows], plan)
+
+                # Cut batches only while the pool has room, so each is cut at the current size
+                while len(units) < self.in_flight:
+                    size = self.batch_size.size
+                    if len(texts) >= size or (exhausted and texts):
+                        units.append(self._submit(texts[:size]))
+                        del texts[:size]
+                        continue
+                    if exhausted:
+                        break
+                    item = next(upcoming, _END)
+                    if item is _END:
+                        exhausted = True
+                        continue
+                    tag, item_texts = item
+                    item_texts, plan = self._lookup(item_texts)
+                    waiting.append((tag, len(item_texts), plan))
+                    texts.extend(item_texts)
+
+                if units:
+                    vectors = self._result(units.popleft())
+                    ready.append(vectors)
+                    ready_rows += len(vectors)
+                elif not waiting:
+                    return
+        finally:
+            for unit in units:
+                if isinstance(unit, Future):
+                    unit.cancel()
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Vectors of texts, in order."""
+        return next(vectors for _, vectors in self.embed_stream([(None, list(texts))]))
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "torch_threads": self.torch_threads,
+            "batch_size": self.batch_size.size,
+            "batches": self.batches,
+            "rows": self.rows,
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "per_second": round(self.rows / self.encode_seconds * self.workers, 1) if self.encode_seconds else 0.0,
+        }
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,56 +1,105 @@
 # Simple RAG chain implementation using direct Groq API calls
-import requests
+import json
+from typing import AsyncIterator, Optional
+import httpx
 from app.core.config import settings
 from app.utils.logger import get_logger
 
 logger = get_logger("rag_chain")
 
-def get_rag_chain():
-    """Return a callable RAG chain function."""
-    def rag_chain(query: str, context_docs: list | None = None) -> str:
-        """Generate an answer from Groq using retrieved context documents."""
-        context = ""
-        if context_docs:
-            formatted_docs = []
-            for doc in context_docs[: settings.TOP_K]:
-                metadata = getattr(doc, "metadata", {}) or {}
-                source = metadata.get("source", "Unknown source")
-                page = metadata.get("page", "N/A")
-                formatted_docs.append(
-                    f"Source: {source} (Page {page})\n{doc.page_content.strip()}"
-                )
-            context = "\n\n".join(formatted_docs)
-            context = f"Context from medical documents:\n{context}\n\n"
-
-        prompt = (
-            "You are a medical AI assistant. Answer the user's question based on the provided context. "
-            "If the context does not contain the answer, say you don't know rather than inventing facts. "
-            "Use citations from the context when available.\n\n"
-            "CRITICAL FORMATTING RULES:\n"
-            "1. Do NOT include raw file names, PDF titles, or page numbers anywhere in your written text response (e.g., avoid writing '(Guyton.pdf, Page 970)').\n"
-            "2. Write your response in smooth, natural, and conversational paragraphs.\n"
-            f"\n\nContext:\n{context}\n\nQuestion: {query}\nAnswer:"
-        )
-
-        headers = {
+# Shared keep-alive connection pool; opened and closed by the FastAPI lifespan.
+_llm_client: Optional[httpx.AsyncClient] = None
+
+
+def create_llm_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    """Build the pooled async HTTP client for the OpenAI-compatible Groq endpoint."""
+    return httpx.AsyncClient(
+        base_url=settings.GROQ_API_BASE,
+        headers={
             "Authorization": f"Bearer {settings.GROQ_API_KEY}",
             "Content-Type": "application/json",
-        }
+        },
+        timeout=httpx.Timeout(settings.LLM_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY,
+        ),
+        transport=transport,
+    )
 
-        payload = {
-            "model": settings.LLM_MODEL,
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": settings.TEMPERATURE,
-            "max_tokens": 1000,
-        }
 
-        try:
-            response = requests.post(
-                "https://api.groq.com/openai/v1/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=30,
+async def start_llm_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    """Open the shared client (pass a transport to point it at a local stub in tests)."""
+    global _llm_client
+    await close_llm_client()
+    _llm_client = create_llm_client(transport)
+    return _llm_client
+
+
+async def close_llm_client() -> None:
+    """Close the shared client and release its pooled connections."""
+    global _llm_client
+    if _llm_client is not None:
+        await _llm_client.aclose()
+        _llm_client = None
+
+
+def get_llm_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it lazily when running outside the app lifespan."""
+    global _llm_client
+    if _llm_client is None:
+        _llm_client = create_llm_client()
+    return _llm_client
+
+
+def build_prompt(query: str, context_docs: list | None = None) -> str:
+    """Format retrieved context documents and the question into the LLM prompt."""
+    context = ""
+    if context_docs:
+        formatted_docs = []
+        for doc in context_docs[: settings.TOP_K]:
+            metadata = getattr(doc, "metadata", {}) or {}
+            source = metadata.get("source", "Unknown source")
+            page = metadata.get("page", "N/A")
+            formatted_docs.append(
+                f"Source: {source} (Page {page})\n{doc.page_content.strip()}"
             )
+        context = "\n\n".join(formatted_docs)
+        context = f"Context from medical documents:\n{context}\n\n"
+
+    return (
+        "You are a medical AI assistant. Answer the user's question based on the provided context. "
+        "If the context does not contain the answer, say you don't know rather than inventing facts. "
+        "Use citations from the context when available.\n\n"
+        "CRITICAL FORMATTING RULES:\n"
+        "1. Do NOT include raw file names, PDF titles, or page numbers anywhere in your written text response (e.g., avoid writing '(Guyton.pdf, Page 970)').\n"
+        "2. Write your response in smooth, natural, and conversational paragraphs.\n"
+        f"\n\nContext:\n{context}\n\nQuestion: {query}\nAnswer:"
+    )
+
+
+def build_payload(query: str, context_docs: list | None = None, stream: bool = False) -> dict:
+    """Chat-completions request body for the configured model."""
+    payload = {
+        "model": settings.LLM_MODEL,
+        "messages": [{"role": "user", "content": build_prompt(query, context_docs)}],
+        "temperature": settings.TEMPERATURE,
+        "max_tokens": settings.LLM_MAX_TOKENS,
+    }
+    if stream:
+        payload["stream"] = True
+    return payload
+
+
+def get_rag_chain():
+    """Return an awaitable RAG chain function."""
+    async def rag_chain(query: str, context_docs: list | None = None) -> str:
+        """Generate an answer from Groq using retrieved context documents."""
+        payload = build_payload(query, context_docs)
+
+        try:
+            response = await get_llm_client().post("/chat/completions", json=payload)
             response.raise_for_status()
             result = response.json()
             answer = result["choices"][0]["message"]["content"]
@@ -60,4 +109,31 @@ def get_rag_chain():
             logger.error(f"Groq API error: {str(e)}")
             raise RuntimeError(f"Failed to generate answer from Groq: {str(e)}")
 
-    return rag_chain
\ No newline at end of file
+    return rag_chain
+
+
+def get_streaming_rag_chain():
+    """Return an async-generator RAG chain that yields answer tokens as Groq produces them."""
+    async def streaming_rag_chain(query: str, context_docs: list | None = None) -> AsyncIterator[str]:
+        """Stream an answer from Groq's OpenAI-compatible SSE response."""
+        payload = build_payload(query, context_docs, stream=True)
+
+        try:
+            async with get_llm_client().stream("POST", "/chat/completions", json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    delta = json.loads(data)["choices"][0].get("delta", {})
+                    token = delta.get("content")
+                    if token:
+                        yield token
+            logger.info("Streaming RAG chain completed successfully")
+        except Exception as e:
+            logger.error(f"Groq streaming API error: {str(e)}")
+            raise RuntimeError(f"Failed to stream answer from Groq: {str(e)}")
+
+    return streaming_rag_chain
@@ -0,0 +1,69 @@
+# Persistent content-addressed cache of chunk embeddings, consulted before the model
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Sequence
+import numpy as np
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app.db.session import SessionLocal
+from app.models.cache import EmbeddingCacheEntry
+
+# Keys per SELECT ... IN (...) or INSERT, well below SQLite's bound-parameter limit
+_STATEMENT_ROWS = 500
+
+
+class EmbeddingCache:
+    """
+    embedding_cache table in the chat-history SQLite database. A chunk's key is the SHA-256
+    of the model name and its exact text, so a vector is reused only for byte-identical
+    chunks embedded by the same model, whichever file or index they came from.
+    """
+
+    def __init__(self, model_name: str, session_factory=SessionLocal):
+        self.model_name = model_name
+        self._session_factory = session_factory
+        self.hits = 0
+        self.misses = 0
+
+    def keys(self, texts: Sequence[str]) -> List[str]:
+        prefix = self.model_name.encode("utf-8") + b"\0"
+        return [hashlib.sha256(prefix + text.encode("utf-8")).hexdigest() for text in texts]
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Cached vectors of the keys that are present."""
+        found: Dict[str, np.ndarray] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._session_factory() as db:
+            for start in range(0, len(unique), _STATEMENT_ROWS):
+                rows = db.execute(
+                    select(EmbeddingCacheEntry.key_hash, EmbeddingCacheEntry.embedding)
+                    .where(EmbeddingCacheEntry.key_hash.in_(unique[start:start + _STATEMENT_ROWS]))
+                )
+                found.update((key, np.frombuffer(blob, dtype=np.float32)) for key, blob in rows)
+        hits = sum(key in found for key in keys)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, keys: Sequence[str], vectors: np.ndarray) -> None:
+        if not len(keys):
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        now = datetime.utcnow()
+        with self._session_factory() as db:
+            for start in range(0, len(keys), _STATEMENT_ROWS):
+                db.execute(sqlite_insert(EmbeddingCacheEntry).values([
+                    {"key_hash": key, "model": self.model_name, "embedding": vector.tobytes(), "created_at": now}
+                    for key, vector in zip(keys[start:start + _STATEMENT_ROWS], vectors[start:start + _STATEMENT_ROWS])
+                ]).on_conflict_do_nothing(index_elements=[EmbeddingCacheEntry.key_hash]))
+            db.commit()
+
+    def clear(self) -> None:
+        """Drop this model's entries."""
+        with self._session_factory() as db:
+            db.execute(delete(EmbeddingCacheEntry).where(EmbeddingCacheEntry.model == self.model_name))
+            db.commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0}
@@ -1,20 +1,175 @@
 # Sentence Transformers embeddings implementation
+import asyncio
+from typing import List, Optional, Tuple
+import numpy as np
 from app.core.config import settings
+from app.utils.cache import LRUCache
+from app.utils.logger import get_logger
+
+logger = get_logger("embeddings")
+
+# Bounded LRU of (model name, normalized query text) -> read-only float32 vector, shared by
+# every embeddings instance so repeated questions skip the transformer forward pass.
+_query_cache = LRUCache(max_entries=settings.EMBEDDING_CACHE_SIZE)
+
+
+def normalize_query_text(text: str) -> str:
+    """Cache key for a query: case-folded with whitespace collapsed."""
+    return " ".join(text.split()).casefold()
+
+
+def get_query_cache_stats() -> dict:
+    """Hit/miss counters of the query-embedding cache."""
+    return _query_cache.stats()
+
+
+class CachedQueryEmbeddings:
+    """Adds the query-embedding LRU to any model implementing _encode(texts) -> float32 array."""
+
+    model_name: str = ""
+
+    def _encode(self, texts) -> np.ndarray:
+        raise NotImplementedError
+
+    def embed_documents(self, texts) -> np.ndarray:
+        return self._encode(list(texts))
+
+    def cached_query(self, text) -> Optional[np.ndarray]:
+        return _query_cache.get((self.model_name, normalize_query_text(text)))
+
+    def remember_query(self, text, vector: np.ndarray) -> np.ndarray:
+        vector.flags.writeable = False  # shared between callers
+        _query_cache.put((self.model_name, normalize_query_text(text)), vector)
+        return vector
+
+    def embed_query(self, text) -> np.ndarray:
+        vector = self.cached_query(text)
+        if vector is None:
+            vector = self.remember_query(text, self._encode([text])[0])
+        return vector
+
+
+class QueryEmbeddingBatcher:
+    """
+    Micro-batching scheduler for query embeddings.
+
+    Concurrent callers of embed() are queued; a single worker task collects requests for up
+    to max_wait seconds (or max_batch items), runs one batched encode in a worker thread so
+    the event loop stays free, and resolves every caller's future. Requests that arrive while
+    an encode is running are picked up together by the next batch. When traffic is idle (the
+    previous batch was a single query) a lone query is encoded at once instead of waiting.
+    """
+
+    def __init__(self, model: CachedQueryEmbeddings, max_batch: int = None, max_wait: float = None):
+        self.model = model
+        self.max_batch = max_batch or settings.EMBEDDING_BATCH_MAX_SIZE
+        self.max_wait = settings.EMBEDDING_BATCH_MAX_WAIT_MS / 1000 if max_wait is None else max_wait
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.items = 0
+        self._last_batch_size = 0
+
+    async def embed(self, text: str) -> np.ndarray:
+        vector = self.model.cached_query(text)
+        if vector is not None:
+            return vector
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def _collect(self) -> List[Tuple[str, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            if len(batch) == 1 and self._last_batch_size <= 1:
+                break
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                vectors = await asyncio.to_thread(self.model.embed_documents, texts)
+            except Exception as e:
+                logger.error(f"Batched query embedding failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            by_text = {text: self.model.remember_query(text, vectors[i].copy()) for i, text in enumerate(texts)}
+            self.batches += 1
+            self.items += len(batch)
+            self._last_batch_size = len(batch)
+            for text, future in batch:
+                if not future.done():
+                    future.set_result(by_text[text])
+
+    async def close(self) -> None:
+        """Stop the worker task (pending callers are cancelled)."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            future.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+        }
+
+
+class DummyEmbeddings(CachedQueryEmbeddings):
+    model_name = "dummy"
+
+    def _encode(self, texts) -> np.ndarray:
+        # return zero vectors
+        return np.zeros((len(texts), 768), dtype=np.float32)
+
 
 try:
     from sentence_transformers import SentenceTransformer
     import torch
 
-    class SentenceTransformerEmbeddings:
+    class SentenceTransformerEmbeddings(CachedQueryEmbeddings):
         def __init__(self, model_name: str = None):
             device = 'cuda' if torch.cuda.is_available() and settings.EMBEDDING_DEVICE == 'cuda' else 'cpu'
-            self.model = SentenceTransformer(model_name or settings.EMBEDDING_MODEL, device=device)
-
-        def embed_documents(self, texts):
-            return self.model.encode(texts, convert_to_numpy=True).tolist()
+            self.model_name = model_name or settings.EMBEDDING_MODEL
+            self.model = SentenceTransformer(self.model_name, device=device)
 
-        def embed_query(self, text):
-            return self.model.encode([text], convert_to_numpy=True)[0].tolist()
+        def _encode(self, texts) -> np.ndarray:
+            # One forward pass per call: callers (query batcher, BulkEmbedder) choose the batch size
+            return np.asarray(
+                self.model.encode(texts, batch_size=max(1, len(texts)), convert_to_numpy=True), dtype=np.float32
+            )
 
     def get_embeddings_model():
         """Return sentence transformer embeddings model."""
@@ -27,13 +182,6 @@ try:
 except ImportError:
     print("sentence-transformers not available. Using dummy embeddings.")
 
-    class DummyEmbeddings:
-        def embed_documents(self, texts):
-            # return zero vectors
-            return [[0.0] * 768 for _ in texts]
-        def embed_query(self, text):
-            return [0.0] * 768
-
     def get_embeddings_model():
         """Return a simple placeholder embeddings model."""
         return DummyEmbeddings()
@@ -0,0 +1,137 @@
+# Incremental ingestion: only new or modified files are parsed and embedded again
+import os
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+from sqlalchemy.orm import Session
+from app.models.history import DocumentMetadata
+from app.rag.bulk_embed import BulkEmbedder
+from app.rag.pipeline import IngestionPipeline, SplitFile
+from app.rag.vectorstore import SimpleDocument, SimpleVectorStore
+from app.utils.hashing import file_sha256
+from app.utils.logger import get_logger
+
+logger = get_logger("ingestion")
+
+
+LoadResult = Union[List[SimpleDocument], Exception]
+
+
+def load_each(
+    load_file: Callable[[str], List[SimpleDocument]],
+    paths: Sequence[str],
+) -> Iterator[Tuple[str, LoadResult]]:
+    """Adapt a one-file loader to the load_files protocol: (path, documents or exception) in order."""
+    for path in paths:
+        try:
+            yield path, load_file(path)
+        except Exception as e:
+            yield path, e
+
+
+def sync_documents(
+    store: SimpleVectorStore,
+    directory: str,
+    db: Session,
+    load_file: Optional[Callable[[str], List[SimpleDocument]]] = None,
+    extensions=(".pdf",),
+    load_files: Optional[Callable[[Sequence[str]], Iterable[Tuple[str, LoadResult]]]] = None,
+    split: Optional[SplitFile] = None,
+    embedder: Optional[BulkEmbedder] = None,
+    page_cache=None,
+) -> Dict[str, int]:
+    """
+    Bring the vector store in line with the files in directory, using DocumentMetadata as the
+    record of what was ingested. A file whose size and mtime are unchanged is skipped without
+    being read; otherwise it is hashed, and only a changed hash triggers loading (parse, split)
+    and embedding. A file is also reloaded when the store does not hold as many of its chunks
+    as its record says (e.g. the index was deleted). Chunks of modified and removed files are
+    deleted from the store first.
+
+    Files are loaded either one at a time by load_file, or by load_files, which receives every
+    file to load and yields (path, documents or exception) in the same order, so it can parse
+    them in parallel (see load_medical_files). split(path, pages), if given, turns a file's
+    pages into chunks. Loading, splitting and embedding run as an IngestionPipeline; pass a
+    multi-process BulkEmbedder as embedder to embed on every core (store's model otherwise).
+    Pass the PageTextCache that load_files parses through as page_cache, and the hashes
+    computed here become its keys, so a changed PDF is read once rather than twice.
+
+    Each file is committed right after its last chunk batch is written, so an interrupted run
+    resumes where it stopped: a half-ingested file still has its old hash and is redone.
+    Returns counts of added / updated / removed / unchanged files and chunks written.
+    """
+    stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "failed": 0, "chunks": 0}
+    records = {record.filename: record for record in db.query(DocumentMetadata).all()}
+    files = {
+        name: os.path.join(directory, name)
+        for name in sorted(os.listdir(directory))
+        if os.path.splitext(name)[1].lower() in extensions
+    }
+
+    # A record only vouches for a file whose chunks are still in the store: an index that was
+    # wiped, moved or failed to load is rebuilt from the files
+    indexed = store.count_by_source() if records else {}
+    pending = []
+    for name, path in files.items():
+        stat = os.stat(path)
+        record = records.get(name)
+        in_store = record is not None and indexed.get(name, 0) == (record.total_chunks or 0)
+        unchanged_stat = in_store and (record.file_size, record.file_mtime) == (stat.st_size, stat.st_mtime)
+        if unchanged_stat and record.content_hash:
+            stats["unchanged"] += 1
+            continue
+        content_hash = file_sha256(path)
+        if in_store and record.content_hash == content_hash:
+            record.file_size, record.file_mtime = stat.st_size, stat.st_mtime  # touched, not modified
+            stats["unchanged"] += 1
+            continue
+        pending.append((name, path, stat, content_hash))
+        if page_cache is not None:
+            page_cache.remember(path, content_hash, stat)
+
+    removed = [name for name in records if name not in files]
+    # New files are included in case an interrupted run left chunks without a record
+    store.delete_by_source(removed + [name for name, *_ in pending])
+    for name in removed:
+        db.delete(records.pop(name))
+        stats["removed"] += 1
+    db.commit()
+
+    def split_file(path: str, pages: List[SimpleDocument]):
+        for chunk in (split(path, pages) if split is not None else pages):
+            chunk.metadata["source"] = os.path.basename(path)  # critical for citations and for delete_by_source
+            yield chunk
+
+    paths = [path for _, path, _, _ in pending]
+    pipeline = IngestionPipeline(
+        store,
+        load_files if load_files is not None else (lambda paths: load_each(load_file, paths)),
+        split=split_file,
+        embedder=embedder,
+    )
+    for (name, path, stat, content_hash), result in zip(pending, pipeline.run(paths)):
+        if result.error is not None:
+            logger.error(f"Failed to ingest {name}: {result.error}")
+            if result.chunks:
+                store.delete_by_source([name])  # drop the batches written before the failure
+            stats["failed"] += 1
+            continue
+
+        record = records.get(name)
+        if record is None:
+            record = DocumentMetadata(filename=name)
+            db.add(record)
+            stats["added"] += 1
+        else:
+            stats["updated"] += 1
+        record.file_path = path
+        record.total_pages = result.pages
+        record.total_chunks = result.chunks
+        record.content_hash, record.file_size, record.file_mtime = content_hash, stat.st_size, stat.st_mtime
+        db.commit()
+        stats["chunks"] += result.chunks
+        logger.info(f"Ingested {name}: {result.pages} pages, {result.chunks} chunks")
+
+    logger.info(
+        f"Document sync: {stats['added']} added, {stats['updated']} updated, {stats['removed']} removed, "
+        f"{stats['unchanged']} unchanged, {stats['failed']} failed"
+    )
+    return stats
@@ -1,7 +1,12 @@
 import os
-from typing import List
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
 from langchain_community.document_loaders import PyPDFLoader, TextLoader
 from langchain.schema import Document
+from app.rag.page_cache import PageTextCache, get_page_cache
+from app.rag.pdf_extract import parse_pdfs
+from app.utils.logger import get_logger
+
+logger = get_logger("loader")
 
 
 SUPPORTED_EXTENSIONS = {
@@ -10,27 +15,47 @@ SUPPORTED_EXTENSIONS = {
 }
 
 
-def load_medical_documents(directory_path: str) -> List[Document]:
-    """
-    Load all supported medical documents from a directory.
-    Supported formats: PDF, TXT
-    """
-    documents: List[Document] = []
+def load_medical_file(file_path: str) -> List[Document]:
+    """Load one supported document (PDF or TXT), tagging every page with its file name."""
+    ext = os.path.splitext(file_path)[1].lower()
+    loader = SUPPORTED_EXTENSIONS[ext](file_path)
 
-    for filename in os.listdir(directory_path):
-        file_path = os.path.join(directory_path, filename)
-        ext = os.path.splitext(filename)[1].lower()
-
-        if ext not in SUPPORTED_EXTENSIONS:
-            continue
+    docs = loader.load()
+    for doc in docs:
+        doc.metadata["source"] = os.path.basename(file_path)  # critical for citations
+    return docs
 
-        loader_class = SUPPORTED_EXTENSIONS[ext]
-        loader = loader_class(file_path)
 
-        docs = loader.load()
-        for doc in docs:
-            doc.metadata["source"] = filename  # critical for citations
+def load_medical_files(
+    file_paths: Sequence[str],
+    workers: Optional[int] = None,
+    page_cache: Optional[PageTextCache] = None,
+) -> Iterator[Tuple[str, Union[List[Document], Exception]]]:
+    """
+    Load many documents, yielding (path, pages) in input order; a file that fails yields
+    its exception instead. PDFs are parsed in parallel by a process pool (see parse_pdfs);
+    a PDF already in the page text cache (page_cache, else PDF_TEXT_CACHE_DIR) is not parsed.
+    """
+    pdfs = parse_pdfs(
+        [path for path in file_paths if path.lower().endswith(".pdf")],
+        workers=workers,
+        cache=page_cache or get_page_cache(),
+    )
+    for path in file_paths:
+        if not path.lower().endswith(".pdf"):
+            try:
+                yield path, load_medical_file(path)
+            except Exception as e:
+                yield path, e
+            continue
 
-        documents.extend(docs)
+        _, pages = next(pdfs)
+        if isinstance(pages, Exception):
+            yield path, pages
+            continue
+        source = os.path.basename(path)
+        yield path, [
+            Document(page_content=text, metadata={"source": source, "page": page})  # critical for citations
+            for page, text in pages
+        ]
 
-    return documents
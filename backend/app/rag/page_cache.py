@@ -0,0 +1,85 @@
+# On-disk cache of extracted PDF page text, keyed by the content hash of the PDF
+import os
+import gzip
+import json
+from typing import Dict, List, Optional, Tuple
+import pypdf
+from app.core.config import settings
+from app.rag.pdf_extract import Page
+from app.utils.hashing import file_sha256
+from app.utils.logger import get_logger
+
+logger = get_logger("page_cache")
+
+# Entries written by another extractor version are treated as missing
+EXTRACTOR = f"pypdf {pypdf.__version__}"
+
+
+class PageTextCache:
+    """
+    Extracted text of every page of a PDF, stored as <sha256>.jsonl.gz in directory: a header
+    line {"extractor", "pages"} then one {"page", "text"} line per page. The key is the hash of
+    the file's bytes, so a renamed or copied PDF is not parsed again, and a modified one
+    misses. Chunking settings are not part of the key: re-chunking or rebuilding the index
+    reads pages from here instead of parsing the PDFs. A caller that has just hashed a file
+    hands the hash over with remember(), so the file is not read a second time.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or settings.PDF_TEXT_CACHE_DIR
+        os.makedirs(self.directory, exist_ok=True)
+        self.hits = 0
+        self.stored = 0
+        self._known: Dict[str, Tuple[str, int, int]] = {}  # path -> (sha256, size, mtime_ns)
+
+    def remember(self, path: str, key: str, stat: os.stat_result) -> None:
+        """Use key for the next key(path), as long as the file still has this size and mtime."""
+        self._known[path] = (key, stat.st_size, stat.st_mtime_ns)
+
+    def key(self, path: str) -> str:
+        known = self._known.pop(path, None)
+        if known is not None:
+            stat = os.stat(path)
+            if known[1:] == (stat.st_size, stat.st_mtime_ns):
+                return known[0]
+        return file_sha256(path)
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.jsonl.gz")
+
+    def contains(self, key: str) -> bool:
+        return os.path.exists(self.path_for(key))
+
+    def get(self, key: str) -> Optional[List[Page]]:
+        """Cached pages, or None if missing, unreadable or written by another extractor."""
+        try:
+            with gzip.open(self.path_for(key), "rt", encoding="utf-8") as f:
+                header = json.loads(f.readline())
+                if header.get("extractor") != EXTRACTOR:
+                    return None
+                pages = [(entry["page"], entry["text"]) for entry in map(json.loads, f)]
+        except (OSError, EOFError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable page text cache entry {key[:12]}: {e}")
+            return None
+        if len(pages) != header.get("pages"):
+            return None
+        self.hits += 1
+        return pages
+
+    def put(self, key: str, pages: List[Page]) -> None:
+        path = self.path_for(key)
+        tmp = f"{path}.tmp{os.getpid()}"
+        with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=5) as f:
+            f.write(json.dumps({"extractor": EXTRACTOR, "pages": len(pages)}) + "\n")
+            for page, text in pages:
+                f.write(json.dumps({"page": page, "text": text}, ensure_ascii=False) + "\n")
+        os.replace(tmp, path)  # readers never see a half-written entry
+        self.stored += 1
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "stored": self.stored}
+
+
+def get_page_cache() -> Optional[PageTextCache]:
+    """Cache in PDF_TEXT_CACHE_DIR, or None when that setting is empty."""
+    return PageTextCache() if settings.PDF_TEXT_CACHE_DIR else None
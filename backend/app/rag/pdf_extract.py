@@ -0,0 +1,124 @@
+# Parallel PDF text extraction across a process pool
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+from pypdf import PdfReader
+from app.core.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger("pdf_extract")
+
+Page = Tuple[int, str]  # (0-based page number, extracted text), as PyPDFLoader numbers pages
+
+
+def extract_page_range(path: str, start: int, stop: int) -> List[Page]:
+    """Text of pages start..stop-1 of one PDF. Runs in a worker process."""
+    reader = PdfReader(path)
+    return [(page, reader.pages[page].extract_text() or "") for page in range(start, stop)]
+
+
+def page_ranges(pages: int, pages_per_task: int) -> List[Tuple[int, int]]:
+    """Split a document of `pages` pages into [start, stop) ranges of at most pages_per_task."""
+    return [(start, min(start + pages_per_task, pages)) for start in range(0, pages, pages_per_task)] or [(0, 0)]
+
+
+def default_workers() -> int:
+    return settings.PDF_PARSE_WORKERS or os.cpu_count() or 1
+
+
+def parse_pdfs(
+    paths: Sequence[str],
+    workers: Optional[int] = None,
+    pages_per_task: Optional[int] = None,
+    cache=None,
+) -> Iterator[Tuple[str, Union[List[Page], Exception]]]:
+    """
+    Extract the text of many PDFs, yielding (path, pages) in input order as each file completes.
+
+    Files are fanned out over a ProcessPoolExecutor; a file longer than pages_per_task pages is
+    split into page ranges that are parsed in parallel and reassembled in page order. A file that
+    cannot be opened or parsed yields its exception instead of pages and does not affect the
+    others. About 2 x workers ranges are kept in flight, so memory held by parsed-but-unconsumed
+    results stays bounded however many files are queued.
+
+    With a PageTextCache as cache, files whose content hash is cached are read from it and
+    only the others are parsed; their pages are added to the cache.
+    """
+    if cache is None:
+        return _extract_pdfs(paths, workers, pages_per_task)
+    return _parse_with_cache(paths, workers, pages_per_task, cache)
+
+
+def _parse_with_cache(paths, workers, pages_per_task, cache) -> Iterator[Tuple[str, Union[List[Page], Exception]]]:
+    keys = []
+    for path in paths:
+        try:
+            keys.append(cache.key(path))
+        except OSError:
+            keys.append(None)  # unreadable: parsing reports the error
+    cached = [key is not None and cache.contains(key) for key in keys]
+    parsed = _extract_pdfs([path for path, hit in zip(paths, cached) if not hit], workers, pages_per_task)
+
+    for path, key, hit in zip(paths, keys, cached):
+        pages = cache.get(key) if hit else None
+        if pages is None:
+            if hit:  # stale or damaged entry: parse this one file here
+                pages = next(_extract_pdfs([path], 1, pages_per_task))[1]
+            else:
+                pages = next(parsed)[1]
+            if key is not None and not isinstance(pages, Exception):
+                cache.put(key, pages)
+        yield path, pages
+
+
+def _extract_pdfs(
+    paths: Sequence[str],
+    workers: Optional[int] = None,
+    pages_per_task: Optional[int] = None,
+) -> Iterator[Tuple[str, Union[List[Page], Exception]]]:
+    workers = workers or default_workers()
+    pages_per_task = pages_per_task or settings.PDF_PAGES_PER_TASK
+
+    if workers == 1:  # no pool: avoids process start-up and pickling for a single core
+        for path in paths:
+            try:
+                yield path, extract_page_range(path, 0, len(PdfReader(path).pages))
+            except Exception as e:
+                yield path, e
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        queued = deque()  # (path, [futures] or the exception raised while planning it)
+        upcoming = iter(paths)
+        in_flight = 0
+
+        def submit_more():
+            nonlocal in_flight
+            while in_flight < 2 * workers:
+                path = next(upcoming, None)
+                if path is None:
+                    return
+                try:
+                    ranges = page_ranges(len(PdfReader(path).pages), pages_per_task)
+                except Exception as e:
+                    queued.append((path, e))
+                    continue
+                queued.append((path, [pool.submit(extract_page_range, path, *r) for r in ranges]))
+                in_flight += len(ranges)
+
+        submit_more()
+        while queued:
+            path, futures = queued.popleft()
+            if isinstance(futures, Exception):
+                yield path, futures
+                continue
+            pages, error = [], None
+            for future in futures:
+                try:
+                    pages.extend(future.result())
+                except Exception as e:
+                    error = error or e
+            in_flight -= len(futures)
+            submit_more()
+            yield path, (error if error is not None else pages)
@@ -0,0 +1,255 @@
+# Streaming ingestion pipeline: load -> split -> embed + write, with bounded queues between stages
+import time
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from app.core.config import settings
+from app.rag.bulk_embed import BulkEmbedder
+from app.rag.vectorstore import SimpleVectorStore
+from app.utils.logger import get_logger
+
+logger = get_logger("pipeline")
+
+_END = object()
+
+# load_files(paths) yields (path, pages or exception) in order; split(path, pages) yields chunks
+LoadFiles = Callable[[Sequence[str]], Iterable[Tuple[str, Any]]]
+SplitFile = Callable[[str, List[Any]], Iterable[Any]]
+
+
+class FileResult:
+    """Outcome of one file: pages loaded, chunks written, and the error if it failed."""
+
+    def __init__(self, path: str, pages: int = 0, chunks: int = 0, error: Optional[Exception] = None):
+        self.path = path
+        self.pages = pages
+        self.chunks = chunks
+        self.error = error
+
+
+class StageStats:
+    """Items through one stage and the time the stage spent working (not waiting on a queue)."""
+
+    def __init__(self, name: str, unit: str):
+        self.name = name
+        self.unit = unit
+        self.items = 0
+        self.busy = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "items": self.items,
+            "seconds": round(self.busy, 3),
+            "per_second": round(self.items / self.busy, 1) if self.busy else 0.0,
+        }
+
+
+class IngestionPipeline:
+    """
+    Streaming ingestion. Load and split run in their own threads, connected by bounded queues
+    to the caller's thread, which embeds and writes:
+
+      load   pages of one file at a time from load_files (which may parse in a process pool)
+      split  chunks from split(path, pages), cut into batches of at most batch_size;
+             a batch never spans two files
+      embed  the batches' texts, re-cut into adaptive batches, by a BulkEmbedder: in this
+             process by default, or across worker processes; vectors come back in order
+      write  embedded batches are buffered and appended as one index segment per
+             segment_rows chunks (add_embedded_documents), so segments are not tiny
+
+    Parsing, splitting and embedding therefore overlap. At most queue_size files of pages,
+    queue_size chunk batches, the embedder's in-flight batches and one segment buffer are held
+    at a time, so peak memory depends on the largest file and the segment size, not on the
+    size of the library. run() yields a FileResult per file, in input order, once all of that
+    file's chunks are in the index; a file that fails has its unwritten batches dropped and
+    reports the chunks already written.
+    """
+
+    def __init__(
+        self,
+        store: SimpleVectorStore,
+        load_files: LoadFiles,
+        split: Optional[SplitFile] = None,
+        batch_size: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        segment_rows: Optional[int] = None,
+        embedder: Optional[BulkEmbedder] = None,
+        progress_every: float = 10.0,
+    ):
+        self.store = store
+        self.load_files = load_files
+        self.split = split or (lambda path, pages: pages)
+        self.batch_size = batch_size or settings.INGEST_BATCH_SIZE
+        self.queue_size = queue_size or settings.INGEST_QUEUE_SIZE
+        self.segment_rows = segment_rows or settings.INGEST_SEGMENT_ROWS
+        self.embedder = embedder or BulkEmbedder(model=store.embeddings_model, workers=1, cache=store.embedding_cache)
+        self.progress_every = progress_every
+        self.load_stats = StageStats("load", "pages")
+        self.split_stats = StageStats("split", "chunks")
+        self.embed_stats = StageStats("embed", "chunks")
+        self.write_stats = StageStats("write", "chunks")
+        self.files_done = 0
+        self._stop = threading.Event()
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        """Blocking put that gives up once the pipeline is stopped (consumer went away)."""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue):
+        """Blocking get that returns _END once the pipeline is stopped."""
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _load(self, paths: Sequence[str], pages_out: queue.Queue) -> None:
+        try:
+            loaded = iter(self.load_files(paths))
+            while True:
+                start = time.perf_counter()
+                item = next(loaded, _END)
+                if item is _END:
+                    break
+                path, pages = item
+                self.load_stats.busy += time.perf_counter() - start
+                if not isinstance(pages, Exception):
+                    self.load_stats.items += len(pages)
+                if not self._put(pages_out, (path, pages)):
+                    return
+        except Exception as e:  # the loader itself broke: fail everything still queued
+            self._put(pages_out, (None, e))
+            return
+        self._put(pages_out, _END)
+
+    def _split(self, pages_in: queue.Queue, batches_out: queue.Queue) -> None:
+        while True:
+            item = self._get(pages_in)
+            if item is _END:
+                self._put(batches_out, _END)
+                return
+            path, pages = item
+            if isinstance(pages, Exception):
+                if not self._put(batches_out, (path, pages, 0, True)) or path is None:
+                    return
+                continue
+
+            batch: List[Any] = []
+            start = time.perf_counter()
+            try:
+                for chunk in self.split(path, pages):
+                    batch.append(chunk)
+                    if len(batch) == self.batch_size:
+                        self.split_stats.busy += time.perf_counter() - start
+                        self.split_stats.items += len(batch)
+                        if not self._put(batches_out, (path, batch, len(pages), False)):
+                            return
+                        batch, start = [], time.perf_counter()
+                self.split_stats.busy += time.perf_counter() - start
+                self.split_stats.items += len(batch)
+                last = (path, batch, len(pages), True)
+            except Exception as e:
+                last = (path, e, len(pages), True)
+            del pages  # release the file's pages before waiting on the queue
+            if not self._put(batches_out, last):
+                return
+
+    def _flush(self, buffered: List[Tuple[str, List[Any], np.ndarray]], written: Dict[str, int]) -> None:
+        """Write the buffered batches as one index segment."""
+        if not buffered:
+            return
+        start = time.perf_counter()
+        self.store.add_embedded_documents(
+            [doc for _, docs, _ in buffered for doc in docs],
+            np.concatenate([vectors for _, _, vectors in buffered]),
+        )
+        for path, docs, _ in buffered:
+            written[path] = written.get(path, 0) + len(docs)
+        self.write_stats.busy += time.perf_counter() - start
+        self.write_stats.items += sum(len(docs) for _, docs, _ in buffered)
+        buffered.clear()
+
+    def _batches(self, batch_queue: queue.Queue) -> Iterator[Tuple[tuple, List[str]]]:
+        """Split-stage output as (item, texts to embed) for the embedder; failures embed nothing."""
+        while True:
+            item = batch_queue.get()
+            if item is _END:
+                return
+            path, batch, pages, last = item
+            if path is None:
+                raise batch
+            yield item, ([] if isinstance(batch, Exception) else [doc.page_content for doc in batch])
+
+    def run(self, paths: Sequence[str]) -> Iterator[FileResult]:
+        pages_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        batch_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        threads = [
+            threading.Thread(target=self._load, args=(paths, pages_queue), name="ingest-load", daemon=True),
+            threading.Thread(target=self._split, args=(pages_queue, batch_queue), name="ingest-split", daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        buffered: List[Tuple[str, List[Any], np.ndarray]] = []  # embedded batches not yet in a segment
+        written: Dict[str, int] = {}                             # chunks per file already in the index
+        finished: List[FileResult] = []                          # files waiting for their segment write
+        started = last_report = time.perf_counter()
+        encode_seconds = self.embedder.encode_seconds
+        try:
+            for (path, batch, pages, last), vectors in self.embedder.embed_stream(self._batches(batch_queue)):
+                if isinstance(batch, Exception):
+                    buffered[:] = [entry for entry in buffered if entry[0] != path]
+                    finished.append(FileResult(path, pages, error=batch))
+                    continue
+
+                if batch:
+                    self.embed_stats.items += len(batch)
+                    buffered.append((path, batch, vectors))
+                if last:
+                    finished.append(FileResult(path, pages))
+
+                if sum(len(docs) for _, docs, _ in buffered) >= self.segment_rows:
+                    self._flush(buffered, written)
+                    yield from self._completed(finished, written)
+                now = time.perf_counter()
+                if now - last_report >= self.progress_every:
+                    last_report = now
+                    logger.info(
+                        f"Ingest progress: {self.files_done}/{len(paths)} files, {self.embed_stats.items} chunks, "
+                        f"{self.embed_stats.items / (now - started):.1f} chunks/s"
+                    )
+
+            self._flush(buffered, written)
+            yield from self._completed(finished, written)
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join(timeout=1.0)
+            self.embed_stats.busy = self.embedder.encode_seconds - encode_seconds  # summed over workers
+            logger.info("Ingest stages: " + ", ".join(
+                f"{s.name} {s.items} {s.unit} in {s.busy:.1f}s ({s.as_dict()['per_second']}/s)"
+                for s in self._stages
+            ))
+
+    def _completed(self, finished: List[FileResult], written: Dict[str, int]) -> Iterator[FileResult]:
+        """Yield finished files (all of their chunks are now in the index), oldest first."""
+        while finished:
+            result = finished.pop(0)
+            result.chunks = written.pop(result.path, 0)
+            self.files_done += 1
+            yield result
+
+    @property
+    def _stages(self) -> List[StageStats]:
+        return [self.load_stats, self.split_stats, self.embed_stats, self.write_stats]
+
+    def stats(self) -> Dict[str, dict]:
+        return {s.name: s.as_dict() for s in self._stages}
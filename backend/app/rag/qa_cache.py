@@ -1,15 +1,480 @@
-# Simple in-memory cache to replace vectorstore-based implementation.
-# This cache will reset when the process restarts; for persistent caching a
-# database table could be used instead.
+# Two-level QA cache.
+# L1 is a bounded in-process LRU (settings.CACHE_MAX_ENTRIES / CACHE_MAX_BYTES) whose
+# entries expire after settings.CACHE_TTL seconds; ENABLE_CACHE switches caching off.
+# With CACHE_BACKEND=sqlite, an L2 table in the chat-history SQLite database is shared
+# by every uvicorn worker and survives restarts; L1 misses fall through to it and
+# L1 is warmed from it at startup. The functions below block on SQLite; async
+# callers run them with asyncio.to_thread.
+#
+# Lookups first try the exact normalized question, then fall back to a semantic
+# match: every cached question keeps its embedding in an IVF-partitioned index
+# (SemanticIndex), and a few small matvecs find the closest stored question. The
+# cached answer is returned when its cosine similarity reaches
+# settings.SEMANTIC_CACHE_THRESHOLD.
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.cache import QACacheEntry
+from app.rag.vectorstore import IVFIndex, top_k_indices
+from app.utils.cache import LRUCache
+from app.utils.logger import get_logger
 
-_cache_store: dict[str, str] = {}
+logger = get_logger("qa_cache")
 
+# Purge expired L2 rows every this many writes
+_PURGE_EVERY = 500
 
-def get_cached_answer(question: str) -> str | None:
-    """Return previously stored answer or None if not found."""
-    return _cache_store.get(question)
+# Nearest cached questions tried by a semantic lookup when the closest ones have expired
+_SEMANTIC_CANDIDATES = 8
 
 
-def save_to_cache(question: str, answer: str) -> None:
-    """Store question-answer in the in-memory cache."""
-    _cache_store[question] = answer
+class SemanticIndex:
+    """
+    L2-normalized question embeddings partitioned into inverted-file cells.
+
+    Each cell keeps its rows in a contiguous matrix without holes: removing a key moves the
+    cell's last row into its place. A new row joins the cell with the closest centroid; a cell
+    that reaches MAX_CELL_ROWS is split in two by the vector store's spherical k-means
+    (IVFIndex), so the partition grows with the cache without a global retrain. Centroids
+    follow the mean of their rows, and every add re-checks a few rows of a sweep over all
+    cells so rows do not stay in a cell that no longer fits them. A lookup scores the
+    centroids and scans only the NPROBE closest cells.
+    """
+
+    MAX_CELL_ROWS = 256
+    NPROBE = 8
+    REHOME_ROWS = 16
+
+    def __init__(self, initial_capacity: int = 1024):
+        self._initial_capacity = initial_capacity
+        self._dim: Optional[int] = None
+        self._centroids: Optional[np.ndarray] = None  # row i belongs to cell i
+        self._sums: Optional[np.ndarray] = None  # sum of each cell's rows; centroid = normalized sum
+        self._cells: List[np.ndarray] = []
+        self._cell_keys: List[List[str]] = []
+        self._where: Dict[str, Tuple[int, int]] = {}  # key -> (cell, row)
+        self._sweep = (0, 0)  # (cell, row) where _rehome() continues
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._where
+
+    @property
+    def row_bytes(self) -> int:
+        return self._dim * np.dtype(np.float32).itemsize if self._dim else 0
+
+    @property
+    def cells(self) -> int:
+        return len(self._cells)
+
+    def add(self, key: str, embedding) -> None:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            return
+        if self._dim is None:
+            self._dim = vector.shape[0]
+            self._centroids = np.zeros((16, self._dim), dtype=np.float32)
+            self._sums = np.zeros((16, self._dim), dtype=np.float32)
+            self._cells = [np.zeros((self._initial_capacity, self._dim), dtype=np.float32)]
+            self._cell_keys = [[]]
+        elif vector.shape[0] != self._dim:
+            return
+
+        vector = vector / norm
+        self.remove(key)
+        cell = int(np.argmax(self._centroids[: self.cells] @ vector))
+        self._insert(cell, key, vector)
+        if len(self._cell_keys[cell]) >= self.MAX_CELL_ROWS:
+            self._split(cell)
+        self._rehome()
+
+    def remove(self, key: str) -> None:
+        where = self._where.pop(key, None)
+        if where is None:
+            return
+        cell, row = where
+        keys = self._cell_keys[cell]
+        self._move_centroid(cell, -self._cells[cell][row])
+        last = len(keys) - 1
+        if row != last:
+            self._cells[cell][row] = self._cells[cell][last]
+            keys[row] = keys[last]
+            self._where[keys[row]] = (cell, row)
+        keys.pop()
+
+    def _insert(self, cell: int, key: str, vector: np.ndarray) -> None:
+        keys = self._cell_keys[cell]
+        if len(keys) == len(self._cells[cell]):
+            self._cells[cell] = self._grown(self._cells[cell], 2 * len(keys))
+        self._cells[cell][len(keys)] = vector
+        self._where[key] = (cell, len(keys))
+        keys.append(key)
+        self._move_centroid(cell, vector)
+
+    def _move_centroid(self, cell: int, delta: np.ndarray) -> None:
+        """Keep the centroid at the mean direction of the cell's rows as rows come and go."""
+        self._sums[cell] += delta
+        norm = float(np.linalg.norm(self._sums[cell]))
+        if norm > 1e-6:
+            self._centroids[cell] = self._sums[cell] / norm
+
+    def _grown(self, matrix: np.ndarray, rows: int) -> np.ndarray:
+        grown = np.zeros((max(rows, 16), self._dim), dtype=np.float32)
+        grown[: min(len(matrix), len(grown))] = matrix[: len(grown)]
+        return grown
+
+    def _rehome(self) -> None:
+        """
+        Re-check the next REHOME_ROWS rows of a sweep over every cell and move each to the cell
+        whose centroid is now closest, since centroids drift as rows come and go.
+        """
+        cell, start = self._sweep
+        if start >= len(self._cell_keys[cell]):
+            cell, start = (cell + 1) % self.cells, 0
+        keys = self._cell_keys[cell][start:start + self.REHOME_ROWS]
+        self._sweep = (cell, start + len(keys))
+        if not keys:
+            return
+        rows = self._cells[cell][start:start + len(keys)].copy()
+        targets = np.argmax(rows @ self._centroids[: self.cells].T, axis=1)
+        for key, row, target in zip(keys, rows, targets):
+            if target != cell:
+                self.remove(key)
+                self._insert(int(target), key, row)
+
+    def _split(self, cell: int) -> None:
+        """
+        2-means over one full cell gives it and a new cell their centroids; its rows are then
+        re-homed to their closest centroid overall, which keeps older cells from collecting
+        rows that newer cells now fit better.
+        """
+        keys = self._cell_keys[cell]
+        rows = self._cells[cell][: len(keys)].copy()
+        ivf = IVFIndex.train(rows, 2)
+        new = self.cells
+        if new == len(self._centroids):
+            self._centroids = self._grown(self._centroids, 2 * new)
+            self._sums = self._grown(self._sums, 2 * new)
+        self._centroids[cell], self._centroids[new] = ivf.centroids[0], ivf.centroids[1]
+        if ivf.assignments.all() or not ivf.assignments.any():  # (near-)duplicate rows: halve by position
+            targets = np.where(np.arange(len(keys)) < len(keys) // 2, cell, new)
+        else:
+            targets = np.argmax(rows @ self._centroids[: new + 1].T, axis=1)
+
+        self._cells.append(np.zeros((len(keys), self._dim), dtype=np.float32))
+        self._cell_keys.append([])
+        self._cell_keys[cell] = []
+        self._sums[cell] = self._sums[new] = 0.0
+        for key in keys:
+            del self._where[key]
+        for key, row, target in zip(keys, rows, targets):
+            self._insert(int(target), key, row)
+
+    def nearest(self, embedding) -> Tuple[Optional[str], float]:
+        """Return the closest stored key and its cosine similarity."""
+        found = self.top(embedding, 1)
+        return found[0] if found else (None, 0.0)
+
+    def top(self, embedding, k: int) -> List[Tuple[str, float]]:
+        """Up to k closest stored keys with their cosine similarities, best first."""
+        if not self._where:
+            return []
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        if vector.shape[0] != self._dim:
+            return []
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            return []
+        vector = vector / norm
+
+        found: List[Tuple[str, float]] = []
+        for cell in top_k_indices(self._centroids[: self.cells] @ vector, self.NPROBE):
+            keys = self._cell_keys[cell]
+            scores = self._cells[cell][: len(keys)] @ vector
+            found.extend((keys[row], float(scores[row])) for row in top_k_indices(scores, k))
+        return sorted(found, key=lambda item: item[1], reverse=True)[:k]
+
+
+class CacheStats:
+    """Hit/miss counters plus a histogram of best semantic similarities for threshold tuning."""
+
+    BUCKETS = np.linspace(0.0, 1.0, 21)
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.exact_hits = 0
+        self.persistent_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._hit_similarity_sum = 0.0
+        self._miss_similarity_sum = 0.0
+        self._semantic_misses = 0
+        self._histogram = np.zeros(len(self.BUCKETS) - 1, dtype=np.int64)
+
+    def record_similarity(self, similarity: float, hit: bool) -> None:
+        bucket = min(int(max(similarity, 0.0) * (len(self.BUCKETS) - 1)), len(self._histogram) - 1)
+        self._histogram[bucket] += 1
+        if hit:
+            self._hit_similarity_sum += similarity
+        else:
+            self._semantic_misses += 1
+            self._miss_similarity_sum += similarity
+
+    def as_dict(self) -> dict:
+        hits = self.exact_hits + self.persistent_hits + self.semantic_hits
+        lookups = hits + self.misses
+        return {
+            "lookups": lookups,
+            "exact_hits": self.exact_hits,
+            "persistent_hits": self.persistent_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "threshold": settings.SEMANTIC_CACHE_THRESHOLD,
+            "mean_semantic_hit_similarity": (
+                self._hit_similarity_sum / self.semantic_hits if self.semantic_hits else None
+            ),
+            "mean_semantic_miss_similarity": (
+                self._miss_similarity_sum / self._semantic_misses if self._semantic_misses else None
+            ),
+            "similarity_histogram": [
+                {"min": round(float(lo), 2), "max": round(float(hi), 2), "count": int(count)}
+                for lo, hi, count in zip(self.BUCKETS[:-1], self.BUCKETS[1:], self._histogram)
+            ],
+        }
+
+
+def _question_key(question: str) -> str:
+    return hashlib.sha256(question.encode("utf-8")).hexdigest()
+
+
+class SQLiteCacheStore:
+    """L2 cache table (qa_cache) in the chat-history SQLite database."""
+
+    def __init__(self, session_factory=SessionLocal):
+        self._session_factory = session_factory
+        self._writes = 0
+
+    def get(self, question: str) -> Optional[Tuple[str, Optional[np.ndarray], Optional[datetime]]]:
+        """Return (answer, embedding, expires_at) for a live entry, or None."""
+        with self._session_factory() as db:
+            row = db.get(QACacheEntry, _question_key(question))
+            if row is None or (row.expires_at is not None and row.expires_at <= datetime.utcnow()):
+                return None
+            return row.answer, self._decode(row.embedding), row.expires_at
+
+    def put(self, question: str, answer: str, embedding=None, ttl: Optional[int] = None) -> None:
+        now = datetime.utcnow()
+        values = {
+            "key_hash": _question_key(question),
+            "question": question,
+            "answer": answer,
+            "embedding": np.asarray(embedding, dtype=np.float32).tobytes() if embedding is not None else None,
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=ttl) if ttl else None,
+        }
+        stmt = sqlite_insert(QACacheEntry).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[QACacheEntry.key_hash],
+            set_={column: stmt.excluded[column] for column in values if column != "key_hash"},
+        )
+        with self._session_factory() as db:
+            db.execute(stmt)
+            self._writes += 1
+            if self._writes % _PURGE_EVERY == 0:
+                self._purge_expired(db)
+            db.commit()
+
+    def recent(self, limit: int) -> List[Tuple[str, str, Optional[np.ndarray], Optional[datetime]]]:
+        """Most recently written live entries, newest first."""
+        with self._session_factory() as db:
+            self._purge_expired(db)
+            db.commit()
+            rows = db.execute(
+                select(QACacheEntry).order_by(QACacheEntry.created_at.desc()).limit(limit)
+            ).scalars()
+            return [(r.question, r.answer, self._decode(r.embedding), r.expires_at) for r in rows]
+
+    def clear(self) -> None:
+        with self._session_factory() as db:
+            db.execute(delete(QACacheEntry))
+            db.commit()
+
+    @staticmethod
+    def _purge_expired(db) -> None:
+        db.execute(delete(QACacheEntry).where(
+            QACacheEntry.expires_at.is_not(None), QACacheEntry.expires_at <= datetime.utcnow()
+        ))
+
+    @staticmethod
+    def _decode(blob: Optional[bytes]) -> Optional[np.ndarray]:
+        return np.frombuffer(blob, dtype=np.float32) if blob else None
+
+
+def _entry_size(question: str, answer: str) -> int:
+    """Approximate bytes held for one entry, including its semantic index row."""
+    row_bytes = _semantic_index.row_bytes if question in _semantic_index else 0
+    return len(question.encode("utf-8")) + len(answer.encode("utf-8")) + row_bytes
+
+
+_semantic_index = SemanticIndex()
+_cache_store = LRUCache(
+    max_entries=settings.CACHE_MAX_ENTRIES,
+    max_bytes=settings.CACHE_MAX_BYTES,
+    ttl=settings.CACHE_TTL,
+    sizeof=_entry_size,
+    on_evict=lambda question, _: _semantic_index.remove(question),
+)
+_persistent_store: Optional[SQLiteCacheStore] = (
+    SQLiteCacheStore() if settings.CACHE_BACKEND == "sqlite" else None
+)
+_stats = CacheStats()
+_lock = threading.Lock()
+
+
+def _remaining_ttl(expires_at: Optional[datetime]) -> Optional[float]:
+    """Seconds until expires_at (None = no expiry); <= 0 means already expired."""
+    if expires_at is None:
+        return None
+    return (expires_at - datetime.utcnow()).total_seconds()
+
+
+def _promote(question: str, answer: str, embedding, expires_at: Optional[datetime]) -> bool:
+    """Copy an L2 entry into L1, keeping its remaining lifetime. Caller holds _lock."""
+    remaining = _remaining_ttl(expires_at)
+    if remaining is not None and remaining <= 0:
+        return False
+    if embedding is not None:
+        _semantic_index.add(question, embedding)
+    _cache_store.put(question, answer, ttl=remaining if remaining is not None else settings.CACHE_TTL)
+    return True
+
+
+def warm_cache(limit: Optional[int] = None) -> int:
+    """Load the most recent live L2 entries into L1 (and the semantic index). Returns the count."""
+    if not settings.ENABLE_CACHE or _persistent_store is None:
+        return 0
+    try:
+        entries = _persistent_store.recent(limit or settings.CACHE_MAX_ENTRIES)
+    except Exception as e:
+        logger.warning(f"Could not warm QA cache from SQLite: {e}")
+        return 0
+    loaded = 0
+    with _lock:
+        # Oldest first so the newest entries end up most recently used
+        for question, answer, embedding, expires_at in reversed(entries):
+            loaded += _promote(question, answer, embedding, expires_at)
+    return loaded
+
+
+def get_exact_answer(question: str) -> str | None:
+    """Answer cached for exactly this normalized question (L1, then L2), or None. Misses are not counted."""
+    if not settings.ENABLE_CACHE:
+        return None
+
+    with _lock:
+        answer = _cache_store.get(question)
+        if answer is not None:
+            _stats.exact_hits += 1
+            return answer
+
+    if _persistent_store is not None:
+        try:
+            entry = _persistent_store.get(question)
+        except Exception as e:
+            logger.warning(f"Persistent QA cache lookup failed: {e}")
+            entry = None
+        if entry is not None:
+            answer, stored_embedding, expires_at = entry
+            with _lock:
+                _promote(question, answer, stored_embedding, expires_at)
+                _stats.persistent_hits += 1
+            return answer
+    return None
+
+
+def get_similar_answer(embedding) -> str | None:
+    """
+    Answer of the live cached question most similar to embedding if it clears the semantic
+    threshold, else None (counted as a miss). Expired questions met on the way are dropped.
+    Call after get_exact_answer() missed.
+    """
+    if not settings.ENABLE_CACHE:
+        return None
+
+    with _lock:
+        if embedding is not None and settings.SEMANTIC_CACHE_ENABLED:
+            for key, similarity in _semantic_index.top(embedding, _SEMANTIC_CANDIDATES):
+                if key not in _cache_store:
+                    # Expired in L1 but not yet evicted: drop it (and its row), try the next best
+                    _cache_store.pop(key)
+                    continue
+                hit = similarity >= settings.SEMANTIC_CACHE_THRESHOLD
+                _stats.record_similarity(similarity, hit)
+                answer = _cache_store.get(key) if hit else None
+                if answer is not None:
+                    _stats.semantic_hits += 1
+                    return answer
+                break
+
+        _stats.misses += 1
+        return None
+
+
+def get_cached_answer(question: str, embedding=None) -> str | None:
+    """
+    Return previously stored answer or None if not found.
+    When the question embedding is given and there is no exact match, the answer of the
+    most similar cached question is returned if it clears the semantic threshold.
+    """
+    answer = get_exact_answer(question)
+    if answer is not None:
+        return answer
+    return get_similar_answer(embedding)
+
+
+def save_to_cache(question: str, answer: str, embedding=None) -> None:
+    """Store question-answer (and the question embedding, if given) in the in-memory cache."""
+    if not settings.ENABLE_CACHE:
+        return
+
+    with _lock:
+        if embedding is not None:
+            _semantic_index.add(question, embedding)
+        _cache_store.put(question, answer)
+
+    if _persistent_store is not None:
+        try:
+            _persistent_store.put(question, answer, embedding, settings.CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Persistent QA cache write failed: {e}")
+
+
+def clear_cache() -> None:
+    """Drop every cached answer (in both levels) and reset the counters."""
+    with _lock:
+        _cache_store.clear()
+        _stats.reset()
+    if _persistent_store is not None:
+        _persistent_store.clear()
+
+
+def get_cache_stats() -> dict:
+    """Snapshot of cache size, hit/miss counters and semantic similarity distribution."""
+    with _lock:
+        stats = _stats.as_dict()
+        stats["backend"] = "sqlite" if _persistent_store is not None else "memory"
+        stats["store"] = _cache_store.stats()
+        stats["semantic_entries"] = len(_semantic_index)
+        return stats
@@ -0,0 +1,93 @@
+# Recursive character / sentence splitter shared by startup ingestion and script/ingest_doc.py
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+from app.core.config import settings
+from app.rag.vectorstore import SimpleDocument
+
+# Break points from strongest to weakest; a chunk ends at the strongest one that fits
+SEPARATORS: Tuple[Tuple[str, ...], ...] = (
+    ("\n\n",),              # paragraph
+    ("\n",),                # line
+    (". ", "? ", "! "),     # sentence
+    (" ", "\t"),            # word
+)
+
+
+class TextSplitter:
+    """
+    Splits text into chunks of at most chunk_size characters, like langchain's
+    RecursiveCharacterTextSplitter: a chunk holds as many whole paragraphs as fit, and only a
+    paragraph longer than chunk_size is cut at a line, then a sentence, then a word boundary
+    (a hard cut if it has none). The next chunk starts up to chunk_overlap characters before
+    the end of the previous one, at a word boundary.
+
+    Instead of splitting the text into pieces and merging them back, it scans with str.rfind
+    for the last boundary inside each window, so each chunk costs a few C-level searches.
+    """
+
+    def __init__(
+        self,
+        chunk_size: Optional[int] = None,
+        chunk_overlap: Optional[int] = None,
+        separators: Sequence[Sequence[str]] = SEPARATORS,
+    ):
+        self.chunk_size = chunk_size or settings.CHUNK_SIZE
+        self.chunk_overlap = settings.CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
+        if not 0 <= self.chunk_overlap < self.chunk_size:
+            raise ValueError(f"chunk_overlap ({self.chunk_overlap}) must be smaller than chunk_size ({self.chunk_size})")
+        self.separators = separators
+
+    def _cut(self, text: str, floor: int, end: int) -> int:
+        """Chunk end: just after the strongest boundary in [floor, end), or end if there is none."""
+        for level in self.separators:
+            cut = -1
+            for sep in level:
+                found = text.rfind(sep, floor, end)
+                if found >= 0:
+                    cut = max(cut, found + len(sep))
+            if cut > 0:
+                return cut
+        return end
+
+    def _next_start(self, text: str, start: int, cut: int) -> int:
+        """Start of the following chunk: the first word boundary inside the overlap window."""
+        if self.chunk_overlap:
+            lo = max(cut - self.chunk_overlap, start + 1) - 1  # a word may start right at the window
+            spaces = [i for i in (text.find(" ", lo, cut), text.find("\n", lo, cut)) if i >= 0]
+            if spaces:
+                return min(spaces) + 1
+        return cut
+
+    def split_text(self, text: str) -> List[str]:
+        chunks = []
+        start, cut, length = 0, 0, len(text)
+        while start < length:
+            while start < length and text[start].isspace():
+                start += 1
+            end = start + self.chunk_size
+            # Past the previous cut: in the overlap it would only find the boundary just used
+            cut = length if end >= length else self._cut(text, max(start, cut), end)
+            chunk = text[start:cut].strip()
+            if chunk:
+                chunks.append(chunk)
+            if cut >= length:
+                break
+            start = self._next_start(text, start, cut)
+        return chunks
+
+    def split_documents(self, documents: Iterable) -> List[SimpleDocument]:
+        """Chunks of every document, each with a copy of its document's metadata (source, page)."""
+        return [
+            SimpleDocument(chunk, dict(doc.metadata))
+            for doc in documents
+            for chunk in self.split_text(doc.page_content)
+        ]
+
+    def split_pages(self, path: str, pages: List) -> Iterator[SimpleDocument]:
+        """IngestionPipeline split stage: one file's pages into chunks, page by page."""
+        for page in pages:
+            yield from self.split_documents([page])
+
+
+def get_text_splitter() -> TextSplitter:
+    """Splitter configured from CHUNK_SIZE / CHUNK_OVERLAP."""
+    return TextSplitter()
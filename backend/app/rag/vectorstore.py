@@ -1,86 +1,961 @@
 # Minimal vector store implementation using sentence-transformer embeddings
 import os
 import json
+import mmap
+import shutil
+import threading
+from collections import Counter
+from collections.abc import Sequence
+from typing import Iterable, List, Dict, Any, Optional, Tuple
 import numpy as np
-from typing import List, Dict, Any, Optional
 from app.core.config import settings
-from app.rag.embeddings import get_embeddings_model
+from app.rag.bulk_embed import BulkEmbedder
+from app.rag.embedding_cache import EmbeddingCache
+from app.rag.embeddings import QueryEmbeddingBatcher, get_embeddings_model
+from app.utils.logger import get_logger
+
+logger = get_logger("vectorstore")
+
+# On-disk index layout (format version 2):
+#   manifest.json               — format version, row count, dimension and the ordered segment list
+#   segments/seg-NNNNNN/        — immutable segments; new documents always go to a new segment and
+#                                 compaction replaces a run of segments with their merge
+#     embeddings.npy            — L2-normalized float32 matrix, opened with np.load(mmap_mode="r")
+#     documents.jsonl           — one {"page_content", "metadata"} object per line
+#     documents.offsets.npy     — int64 byte offsets into documents.jsonl (count + 1)
+#     ivf.npz                   — optional IVF coarse quantizer (VECTOR_SEARCH_MODE=ivf)
+#     embeddings.int8.npy       — optional int8 codes + quantizer.npz (VECTOR_SEARCH_MODE=int8)
+#     embeddings.bits.npy       — optional packed sign bits (VECTOR_SEARCH_MODE=binary)
+#     deleted.npy               — sorted tombstoned rows; the manifest records how many are valid
+#     sources.npy               — int32 id per row of its metadata "source", indexing sources.json
+# Version 1 kept a single segment's files directly in the index directory; it is migrated on load.
+INDEX_FORMAT_VERSION = 2
+MANIFEST_FILE = "manifest.json"
+SEGMENTS_DIR = "segments"
+EMBEDDINGS_FILE = "embeddings.npy"
+DOCUMENTS_FILE = "documents.jsonl"
+OFFSETS_FILE = "documents.offsets.npy"
+LEGACY_INDEX_FILE = "simple_index.json"
+IVF_FILE = "ivf.npz"
+INT8_CODES_FILE = "embeddings.int8.npy"
+QUANTIZER_FILE = "quantizer.npz"
+BINARY_CODES_FILE = "embeddings.bits.npy"
+DELETED_FILE = "deleted.npy"
+SOURCE_IDS_FILE = "sources.npy"
+SOURCE_NAMES_FILE = "sources.json"
+SEGMENT_FILES = (
+    EMBEDDINGS_FILE, DOCUMENTS_FILE, OFFSETS_FILE, IVF_FILE, INT8_CODES_FILE, QUANTIZER_FILE, BINARY_CODES_FILE,
+)
+_COPY_CHUNK_BYTES = 16 * 1024 * 1024
+_BLOCK_ROWS = 65536
+
 
 class SimpleDocument:
     def __init__(self, page_content: str, metadata: Optional[Dict[str, Any]] = None):
         self.page_content = page_content
         self.metadata = metadata or {}
 
+
+def normalize_rows(embeddings: np.ndarray) -> np.ndarray:
+    """L2-normalize each row so cosine similarity reduces to a dot product."""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-10)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first, without sorting the whole array."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(scores, len(scores) - k)[-k:]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(scores[candidates])[::-1]]
+
+
+def _replace_atomically(path: str, write) -> None:
+    """Write a file through a temporary sibling and rename it into place."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _save_row_blocks(path: str, rows: int, dim: int, blocks: Iterable[np.ndarray]) -> None:
+    """Stream float32 row blocks into a .npy file without materializing the whole matrix."""
+    header = {"descr": np.lib.format.dtype_to_descr(np.dtype(np.float32)), "fortran_order": False, "shape": (rows, dim)}
+
+    def write(f):
+        np.lib.format.write_array_header_1_0(f, header)
+        for block in blocks:
+            f.write(np.ascontiguousarray(block, dtype=np.float32).tobytes())
+
+    _replace_atomically(path, write)
+
+
+def segment_name(number: int) -> str:
+    return f"seg-{number:06d}"
+
+
+def segment_number(name: str) -> int:
+    return int(name.rsplit("-", 1)[1])
+
+
+class DocumentStore(Sequence):
+    """
+    Read-only view over a segment's documents.jsonl.
+    Lines are decoded on access, so only the documents a search returns are ever parsed.
+    """
+
+    def __init__(self, segment_dir: Optional[str] = None):
+        self._data: Any = b""
+        self._offsets: np.ndarray = np.zeros(1, dtype=np.int64)
+        if segment_dir is not None:
+            self._offsets = np.load(os.path.join(segment_dir, OFFSETS_FILE), mmap_mode="r")
+            with open(os.path.join(segment_dir, DOCUMENTS_FILE), "rb") as f:
+                if os.fstat(f.fileno()).st_size > 0:
+                    self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("document index out of range")
+        return SimpleDocument(**json.loads(self.raw(i)))
+
+    def raw(self, i: int) -> bytes:
+        """The encoded JSON line of document i."""
+        return self._data[int(self._offsets[i]):int(self._offsets[i + 1])]
+
+    @property
+    def nbytes(self) -> int:
+        return int(self._offsets[-1])
+
+    def copy_to(self, f, first: int = 0, last: Optional[int] = None) -> None:
+        """Copy the raw lines of documents first..last-1 to an open file in bounded chunks."""
+        begin = int(self._offsets[first])
+        end = int(self._offsets[len(self) if last is None else last])
+        for start in range(begin, end, _COPY_CHUNK_BYTES):
+            f.write(self._data[start:min(start + _COPY_CHUNK_BYTES, end)])
+
+
+def encode_sources(sources: Iterable[Optional[str]]) -> Tuple[np.ndarray, List[Optional[str]]]:
+    """Per-row ids and the distinct names they index, in first-seen order."""
+    ids: Dict[Optional[str], int] = {}
+    rows = np.fromiter((ids.setdefault(source, len(ids)) for source in sources), dtype=np.int32)
+    return rows, list(ids)
+
+
+def write_sources(segment_dir: str, ids: np.ndarray, names: List[Optional[str]]) -> None:
+    _replace_atomically(os.path.join(segment_dir, SOURCE_IDS_FILE), lambda f: np.save(f, ids))
+    _replace_atomically(
+        os.path.join(segment_dir, SOURCE_NAMES_FILE),
+        lambda f: f.write(json.dumps(names, ensure_ascii=False).encode("utf-8")),
+    )
+
+
+def write_segment(segment_dir: str, documents: List[SimpleDocument], embeddings: np.ndarray) -> None:
+    """Write a new segment. Embeddings must already be L2-normalized (see normalize_rows)."""
+    os.makedirs(segment_dir, exist_ok=True)
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if embeddings.shape[0] != len(documents):
+        raise ValueError(f"{len(documents)} documents but {embeddings.shape[0]} embeddings")
+    encoded = [
+        json.dumps(
+            {"page_content": doc.page_content, "metadata": doc.metadata},
+            ensure_ascii=False,
+        ).encode("utf-8") + b"\n"
+        for doc in documents
+    ]
+    offsets = np.concatenate([[0], np.cumsum([len(line) for line in encoded], dtype=np.int64)]).astype(np.int64)
+    _replace_atomically(os.path.join(segment_dir, DOCUMENTS_FILE), lambda f: f.writelines(encoded))
+    _replace_atomically(os.path.join(segment_dir, OFFSETS_FILE), lambda f: np.save(f, offsets))
+    _replace_atomically(os.path.join(segment_dir, EMBEDDINGS_FILE), lambda f: np.save(f, embeddings))
+    write_sources(segment_dir, *encode_sources(doc.metadata.get("source") for doc in documents))
+
+
+def _live_ranges(rows: int, deleted: np.ndarray) -> List[Tuple[int, int]]:
+    """[start, stop) runs of rows that are not tombstoned."""
+    edges = [-1] + deleted.tolist() + [rows]
+    return [(a + 1, b) for a, b in zip(edges, edges[1:]) if b > a + 1]
+
+
+def merge_segments(segments: List["Segment"], segment_dir: str) -> None:
+    """
+    Write the live rows of several segments as one new segment, dropping tombstoned rows.
+    Rows and document lines are streamed in runs, so memory stays bounded by the copy buffers.
+    """
+    os.makedirs(segment_dir, exist_ok=True)
+    rows = sum(segment.live_count for segment in segments)
+    dim = segments[0].dim
+    runs = [(segment, start, stop) for segment in segments for start, stop in segment.live_ranges()]
+
+    def write_documents(f):
+        for segment, start, stop in runs:
+            segment.documents.copy_to(f, start, stop)
+
+    lengths = [np.diff(np.asarray(segment.documents._offsets[start:stop + 1])) for segment, start, stop in runs]
+    offsets = np.concatenate([[0], np.cumsum(np.concatenate(lengths or [[]]))]).astype(np.int64)
+
+    _replace_atomically(os.path.join(segment_dir, DOCUMENTS_FILE), write_documents)
+    _replace_atomically(os.path.join(segment_dir, OFFSETS_FILE), lambda f: np.save(f, offsets))
+    _save_row_blocks(os.path.join(segment_dir, EMBEDDINGS_FILE), rows, dim, (
+        segment.embeddings[block:min(block + _BLOCK_ROWS, stop)]
+        for segment, start, stop in runs
+        for block in range(start, stop, _BLOCK_ROWS)
+    ))
+
+    # Source ids are renumbered into one name list, keeping only the names still in use
+    merged: Dict[Optional[str], int] = {}
+    remap = {
+        id(segment): np.array([merged.setdefault(name, len(merged)) for name in segment.source_names], dtype=np.int32)
+        for segment in segments
+    }
+    ids = np.concatenate([remap[id(segment)][segment.source_ids[start:stop]] for segment, start, stop in runs] or [[]])
+    used, ids = np.unique(ids.astype(np.int32), return_inverse=True)
+    names = list(merged)
+    write_sources(segment_dir, ids.astype(np.int32), [names[i] for i in used])
+
+
+def write_manifest(index_dir: str, segments: List[Dict[str, Any]], dim: int, next_segment: int) -> None:
+    """
+    Write the manifest, the single commit point that makes a set of segments the live index.
+    Each segment entry holds its name, row count and number of tombstoned rows.
+    """
+    manifest = {
+        "format_version": INDEX_FORMAT_VERSION,
+        "count": sum(entry["count"] for entry in segments),
+        "dim": dim,
+        "dtype": "float32",
+        "normalized": True,
+        "segments": segments,
+        "next_segment": next_segment,
+    }
+    _replace_atomically(
+        os.path.join(index_dir, MANIFEST_FILE),
+        lambda f: f.write(json.dumps(manifest, indent=2).encode("utf-8")),
+    )
+
+
+def convert_json_index(json_path: str, index_dir: str) -> int:
+    """
+    One-shot conversion of a legacy simple_index.json into the binary format.
+    The JSON file is left in place; it is no longer read once manifest.json exists.
+    Returns the number of converted documents.
+    """
+    with open(json_path, "r") as f:
+        data = json.load(f)
+    documents = [SimpleDocument(**doc) for doc in data.get("documents", [])]
+    embeddings = np.array(data.get("embeddings", []), dtype=np.float32)
+    del data
+    if embeddings.ndim == 1:
+        embeddings = embeddings.reshape(len(documents), -1) if embeddings.size else embeddings.reshape(0, 0)
+    embeddings = normalize_rows(embeddings)
+    if embeddings.shape[0] != len(documents):
+        raise ValueError(
+            f"{json_path} has {len(documents)} documents but {embeddings.shape[0]} embeddings"
+        )
+    segments = []
+    if documents:
+        write_segment(os.path.join(index_dir, SEGMENTS_DIR, segment_name(1)), documents, embeddings)
+        segments.append({"name": segment_name(1), "count": len(documents), "deleted": 0})
+    write_manifest(index_dir, segments, int(embeddings.shape[1]) if embeddings.ndim == 2 else 0, next_segment=2)
+    logger.info(f"Converted {len(documents)} documents from {json_path} to binary index in {index_dir}")
+    return len(documents)
+
+
+def migrate_v1_index(index_dir: str, manifest: Dict[str, Any]) -> None:
+    """
+    Move a version 1 index (one set of files directly in index_dir) into a first segment.
+    Files are hard-linked so the old layout stays readable until the new manifest commits;
+    an index that was never normalized is normalized while being written into the segment.
+    """
+    segment_dir = os.path.join(index_dir, SEGMENTS_DIR, segment_name(1))
+    os.makedirs(segment_dir, exist_ok=True)
+    linked = []
+    for name in SEGMENT_FILES:
+        source, target = os.path.join(index_dir, name), os.path.join(segment_dir, name)
+        if not os.path.exists(source) or (name == EMBEDDINGS_FILE and not manifest.get("normalized", False)):
+            continue
+        if os.path.exists(target):
+            os.remove(target)
+        os.link(source, target)
+        linked.append(source)
+
+    embeddings = np.load(os.path.join(index_dir, EMBEDDINGS_FILE), mmap_mode="r")
+    if not manifest.get("normalized", False):
+        logger.info("Index embeddings are not normalized yet; normalizing once while migrating...")
+        dim = embeddings.shape[1] if embeddings.ndim == 2 else 0
+        _save_row_blocks(os.path.join(segment_dir, EMBEDDINGS_FILE), len(embeddings), dim, (
+            normalize_rows(embeddings[start:start + _BLOCK_ROWS]) for start in range(0, len(embeddings), _BLOCK_ROWS)
+        ))
+        linked.append(os.path.join(index_dir, EMBEDDINGS_FILE))
+
+    count = int(manifest["count"])
+    segments = [{"name": segment_name(1), "count": count, "deleted": 0}] if count else []
+    write_manifest(index_dir, segments, int(manifest.get("dim", 0)), next_segment=2)
+    for path in linked:
+        os.remove(path)
+    logger.info(f"Migrated index in {index_dir} to the segmented layout")
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest-neighbour index in pure NumPy.
+
+    A spherical k-means coarse quantizer splits the (normalized) embeddings into nlist
+    cells; rows are stored grouped by cell. A search scores the query against the
+    centroids, scans only the nprobe closest cells exactly, and returns the best k rows.
+    """
+
+    def __init__(self, centroids: np.ndarray, assignments: np.ndarray, trained_rows: int):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.trained_rows = trained_rows
+        self._set_assignments(np.asarray(assignments, dtype=np.int32))
+
+    def _set_assignments(self, assignments: np.ndarray) -> None:
+        self.assignments = assignments
+        self.order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=len(self.centroids))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def __len__(self) -> int:
+        return len(self.assignments)
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @staticmethod
+    def assign(centroids: np.ndarray, embeddings: np.ndarray, chunk_rows: int = 65536) -> np.ndarray:
+        """Nearest centroid per row, computed in chunks to bound temporary memory."""
+        assignments = np.empty(len(embeddings), dtype=np.int32)
+        for start in range(0, len(embeddings), chunk_rows):
+            block = np.asarray(embeddings[start:start + chunk_rows], dtype=np.float32)
+            assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        return assignments
+
+    @classmethod
+    def train(
+        cls,
+        embeddings: np.ndarray,
+        nlist: int,
+        iterations: int = 10,
+        sample_per_list: int = 64,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        """Fit the coarse quantizer on a sample of rows, then assign every row to a cell."""
+        rng = np.random.default_rng(seed)
+        n = len(embeddings)
+        nlist = max(1, min(nlist, n))
+        sample_size = min(n, nlist * sample_per_list)
+        sample_rows = np.sort(rng.choice(n, size=sample_size, replace=False))
+        sample = np.asarray(embeddings[sample_rows], dtype=np.float32)
+
+        centroids = sample[rng.choice(sample_size, size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = cls.assign(centroids, sample)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=nlist)
+            empty = counts == 0
+            if empty.any():  # reseed empty cells from random sample rows
+                sums[empty] = sample[rng.choice(sample_size, size=int(empty.sum()))]
+            centroids = normalize_rows(sums)
+
+        return cls(centroids, cls.assign(centroids, embeddings), trained_rows=n)
+
+    def search(
+        self, embeddings: np.ndarray, query: np.ndarray, k: int, nprobe: int, exclude: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Row indices of the approximate top-k, best first, skipping the sorted rows in exclude."""
+        cells = top_k_indices(self.centroids @ query, nprobe)
+        rows = np.sort(np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in cells]))
+        if exclude is not None and len(exclude):
+            rows = rows[~np.isin(rows, exclude, assume_unique=True)]
+        scores = np.asarray(embeddings[rows]) @ query
+        return rows[top_k_indices(scores, k)]
+
+    def save(self, path: str) -> None:
+        _replace_atomically(path, lambda f: np.savez(
+            f, centroids=self.centroids, assignments=self.assignments, trained_rows=self.trained_rows,
+        ))
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        with np.load(path) as data:
+            return cls(data["centroids"], data["assignments"], int(data["trained_rows"]))
+
+
+class ScalarQuantizer:
+    """
+    Per-dimension int8 scalar quantization: x[d] ~= low[d] + scale[d] * (code[d] + 128).
+
+    For ranking, the query-dependent constant drops out, so a candidate score is just
+    codes @ (query * scale). Scores are computed in cache-sized row blocks, so the only
+    full-size array held in memory is the int8 code matrix (a quarter of float32).
+    """
+
+    BLOCK_ROWS = 8192
+
+    def __init__(self, low: np.ndarray, scale: np.ndarray):
+        self.low = np.asarray(low, dtype=np.float32)
+        self.scale = np.asarray(scale, dtype=np.float32)
+
+    @classmethod
+    def fit(cls, embeddings: np.ndarray) -> "ScalarQuantizer":
+        low = np.full(embeddings.shape[1], np.inf, dtype=np.float32)
+        high = np.full(embeddings.shape[1], -np.inf, dtype=np.float32)
+        for start in range(0, len(embeddings), 65536):
+            block = np.asarray(embeddings[start:start + 65536])
+            low = np.minimum(low, block.min(axis=0))
+            high = np.maximum(high, block.max(axis=0))
+        return cls(low, np.maximum(high - low, 1e-12) / 255.0)
+
+    def encode(self, embeddings: np.ndarray) -> np.ndarray:
+        codes = np.empty(embeddings.shape, dtype=np.int8)
+        for start in range(0, len(embeddings), 65536):
+            block = np.asarray(embeddings[start:start + 65536], dtype=np.float32)
+            scaled = np.rint((block - self.low) / self.scale) - 128
+            codes[start:start + len(block)] = np.clip(scaled, -128, 127)
+        return codes
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Approximate dot products (up to a per-query constant) for every row of codes."""
+        weights = query * self.scale
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), self.BLOCK_ROWS):
+            block = codes[start:start + self.BLOCK_ROWS]
+            out[start:start + len(block)] = block.astype(np.float32) @ weights
+        return out
+
+    def save(self, path: str) -> None:
+        _replace_atomically(path, lambda f: np.savez(f, low=self.low, scale=self.scale))
+
+    @classmethod
+    def load(cls, path: str) -> "ScalarQuantizer":
+        with np.load(path) as data:
+            return cls(data["low"], data["scale"])
+
+
+_POPCOUNT16 = np.array([bin(i).count("1") for i in range(1 << 16)], dtype=np.uint8)
+
+
+def pack_signs(embeddings: np.ndarray) -> np.ndarray:
+    """One bit per dimension (1 = positive), packed 8 per byte and padded to whole uint16 words."""
+    bits = np.packbits(np.asarray(embeddings) > 0, axis=-1)
+    if bits.shape[-1] % 2:
+        bits = np.concatenate([bits, np.zeros(bits.shape[:-1] + (1,), dtype=np.uint8)], axis=-1)
+    return bits
+
+
+def hamming_distances(codes: np.ndarray, query_bits: np.ndarray, block_rows: int = 65536) -> np.ndarray:
+    """Hamming distance from the query to every packed row: XOR, then popcount, in row blocks."""
+    out = np.empty(len(codes), dtype=np.uint16)
+    query_words = query_bits.view(np.uint16)
+    for start in range(0, len(codes), block_rows):
+        words = np.asarray(codes[start:start + block_rows]).view(np.uint16) ^ query_words
+        if hasattr(np, "bitwise_count"):  # NumPy >= 2.0
+            out[start:start + len(words)] = np.bitwise_count(words).sum(axis=1, dtype=np.uint16)
+        else:
+            out[start:start + len(words)] = _POPCOUNT16[words].sum(axis=1, dtype=np.uint16)
+    return out
+
+
+def rerank_exact(embeddings: np.ndarray, candidates: np.ndarray, query: np.ndarray, k: int) -> np.ndarray:
+    """Exact top-k among candidate rows, reading only those rows of the float matrix."""
+    rows = np.sort(candidates)
+    return rows[top_k_indices(np.asarray(embeddings[rows]) @ query, k)]
+
+
+def default_nlist(rows: int) -> int:
+    """IVF_NLIST, or roughly sqrt(rows) cells when it is left at 0."""
+    return settings.IVF_NLIST or max(1, int(np.sqrt(rows)))
+
+
+# Hamming priority of a tombstoned row: below any real -distance
+_MASKED = np.iinfo(np.int32).min
+
+
+class Segment:
+    """
+    One immutable slice of the index: a memory-mapped embedding matrix, its documents, and
+    the search structures for the configured VECTOR_SEARCH_MODE. The structures are derived
+    from the segment's own rows, so they never need updating after the segment is written.
+    Deletes only add tombstones, which searches skip and compaction drops.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.documents = DocumentStore(path)
+        self.embeddings = np.load(os.path.join(path, EMBEDDINGS_FILE), mmap_mode="r")
+        if len(self.documents) != len(self.embeddings):
+            raise ValueError(
+                f"segment {self.name} has {len(self.documents)} documents but {len(self.embeddings)} embeddings"
+            )
+        self.ivf: Optional[IVFIndex] = None
+        self.quantizer: Optional[ScalarQuantizer] = None
+        self.codes: Optional[np.ndarray] = None
+        self.sign_bits: Optional[np.ndarray] = None
+        self.deleted: np.ndarray = np.array([], dtype=np.int64)  # replaced, never mutated in place
+        self._live_rows: Optional[np.ndarray] = None
+        self._sources: Optional[Tuple[np.ndarray, List[Optional[str]]]] = None
+
+    def __len__(self) -> int:
+        return len(self.embeddings)
+
+    @property
+    def live_count(self) -> int:
+        return len(self) - len(self.deleted)
+
+    @property
+    def live_rows(self) -> np.ndarray:
+        if self._live_rows is None:
+            self._live_rows = np.setdiff1d(np.arange(len(self)), self.deleted)
+        return self._live_rows
+
+    def live_ranges(self) -> List[Tuple[int, int]]:
+        return _live_ranges(len(self), self.deleted)
+
+    @property
+    def source_ids(self) -> np.ndarray:
+        """Per-row index into source_names of each document's metadata "source"."""
+        return self._load_sources()[0]
+
+    @property
+    def source_names(self) -> List[Optional[str]]:
+        return self._load_sources()[1]
+
+    def _load_sources(self) -> Tuple[np.ndarray, List[Optional[str]]]:
+        if self._sources is None:
+            if os.path.exists(self._file(SOURCE_IDS_FILE)) and os.path.exists(self._file(SOURCE_NAMES_FILE)):
+                with open(self._file(SOURCE_NAMES_FILE), "rb") as f:
+                    self._sources = np.load(self._file(SOURCE_IDS_FILE)), json.load(f)
+            else:  # written before sources were stored: parse the documents once
+                ids, names = encode_sources(
+                    json.loads(self.documents.raw(row)).get("metadata", {}).get("source") for row in range(len(self))
+                )
+                write_sources(self.path, ids, names)
+                self._sources = ids, names
+        return self._sources
+
+    def source_counts(self) -> Dict[Optional[str], int]:
+        """Live rows per metadata "source"."""
+        ids = self.source_ids
+        counts = np.bincount(ids, minlength=len(self.source_names))
+        counts -= np.bincount(ids[self.deleted], minlength=len(counts))
+        return {self.source_names[i]: int(n) for i, n in enumerate(counts) if n}
+
+    def rows_from(self, sources) -> np.ndarray:
+        """Live rows whose metadata "source" is one of sources."""
+        wanted = [i for i, name in enumerate(self.source_names) if name in sources]
+        if not wanted:
+            return np.array([], dtype=np.int64)
+        return np.setdiff1d(np.flatnonzero(np.isin(self.source_ids, wanted)), self.deleted)
+
+    def manifest_entry(self) -> Dict[str, Any]:
+        return {"name": self.name, "count": len(self), "deleted": len(self.deleted)}
+
+    def load_tombstones(self, count: int) -> None:
+        """Read the first count tombstones; later ones belong to a delete that never committed."""
+        if count:
+            self.deleted = np.asarray(np.load(self._file(DELETED_FILE))[:count], dtype=np.int64)
+            self._live_rows = None
+
+    def tombstone(self, rows) -> None:
+        """Mark rows deleted and persist the tombstones (the caller commits the manifest)."""
+        deleted = np.union1d(self.deleted, np.asarray(rows, dtype=np.int64))
+        _replace_atomically(self._file(DELETED_FILE), lambda f: np.save(f, deleted))
+        self.deleted, self._live_rows = deleted, None
+
+    @property
+    def dim(self) -> int:
+        return int(self.embeddings.shape[1])
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def prepare(self) -> None:
+        """Load the search structures for VECTOR_SEARCH_MODE, building any that are missing."""
+        self.ivf, self.quantizer, self.codes, self.sign_bits = None, None, None, None
+        mode = settings.VECTOR_SEARCH_MODE
+        if mode == "ivf" and len(self) >= settings.IVF_MIN_ROWS:
+            self._prepare_ivf()
+        elif mode == "int8":
+            self._prepare_int8()
+        elif mode == "binary":
+            self._prepare_binary()
+
+    def _prepare_ivf(self) -> None:
+        if os.path.exists(self._file(IVF_FILE)):
+            try:
+                ivf = IVFIndex.load(self._file(IVF_FILE))
+                if len(ivf) == len(self):
+                    self.ivf = ivf
+                    return
+            except Exception as e:
+                logger.warning(f"Could not load IVF index of {self.name}, rebuilding: {e}")
+        logger.info(f"Training IVF index ({default_nlist(len(self))} lists) on {len(self)} embeddings of {self.name}...")
+        self.ivf = IVFIndex.train(self.embeddings, default_nlist(len(self)))
+        self.ivf.save(self._file(IVF_FILE))
+
+    def _prepare_int8(self) -> None:
+        """The float matrix stays memory-mapped and is only read for reranking candidates."""
+        if os.path.exists(self._file(INT8_CODES_FILE)) and os.path.exists(self._file(QUANTIZER_FILE)):
+            codes = np.load(self._file(INT8_CODES_FILE), mmap_mode="r")
+            if codes.shape == self.embeddings.shape:
+                self.quantizer, self.codes = ScalarQuantizer.load(self._file(QUANTIZER_FILE)), codes
+                return
+        logger.info(f"Quantizing {len(self)} embeddings of {self.name} to int8...")
+        quantizer = ScalarQuantizer.fit(self.embeddings)
+        codes = quantizer.encode(self.embeddings)
+        _replace_atomically(self._file(INT8_CODES_FILE), lambda f: np.save(f, codes))
+        quantizer.save(self._file(QUANTIZER_FILE))
+        self.quantizer, self.codes = quantizer, np.load(self._file(INT8_CODES_FILE), mmap_mode="r")
+
+    def _prepare_binary(self) -> None:
+        if os.path.exists(self._file(BINARY_CODES_FILE)):
+            bits = np.load(self._file(BINARY_CODES_FILE), mmap_mode="r")
+            if len(bits) == len(self):
+                self.sign_bits = bits
+                return
+        logger.info(f"Packing sign bits for {len(self)} embeddings of {self.name}...")
+        bits = np.concatenate([
+            pack_signs(self.embeddings[start:start + _BLOCK_ROWS]) for start in range(0, len(self), _BLOCK_ROWS)
+        ])
+        _replace_atomically(self._file(BINARY_CODES_FILE), lambda f: np.save(f, bits))
+        self.sign_bits = np.load(self._file(BINARY_CODES_FILE), mmap_mode="r")
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Row numbers of this segment's top-k live rows for a normalized query, with exact scores.
+        Tombstoned rows get the worst possible score (or are left out of the IVF candidates)
+        before any top-k, so the number of candidates does not grow with the deletes.
+        """
+        deleted = self.deleted
+        k = min(k, self.live_count)
+        if self.ivf is not None:
+            rows = self.ivf.search(self.embeddings, query, k, settings.IVF_NPROBE, exclude=deleted)
+        elif self.codes is not None:
+            approx = self.quantizer.scores(self.codes, query)
+            approx[deleted] = -np.inf
+            candidates = top_k_indices(approx, max(k, settings.INT8_RERANK_CANDIDATES))
+            rows = rerank_exact(self.embeddings, candidates[approx[candidates] > -np.inf], query, k)
+        elif self.sign_bits is not None:
+            priority = -hamming_distances(self.sign_bits, pack_signs(query)).astype(np.int32)
+            priority[deleted] = _MASKED
+            candidates = top_k_indices(priority, max(k, settings.BINARY_RERANK_CANDIDATES))
+            rows = rerank_exact(self.embeddings, candidates[priority[candidates] > _MASKED], query, k)
+        else:
+            scores = self.embeddings @ query
+            scores[deleted] = -np.inf
+            rows = top_k_indices(scores, k)  # k <= live rows, so no masked row is picked
+        return rows, np.asarray(self.embeddings[rows]) @ query
+
+
+class SegmentedDocuments(Sequence):
+    """The live documents of every segment, addressed by one global position."""
+
+    def __init__(self, segments: List[Segment]):
+        self._segments = segments
+        self._starts = np.cumsum([0] + [segment.live_count for segment in segments])
+
+    def __len__(self) -> int:
+        return int(self._starts[-1])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("document index out of range")
+        segment = int(np.searchsorted(self._starts, i, side="right")) - 1
+        owner, position = self._segments[segment], i - int(self._starts[segment])
+        row = int(owner.live_rows[position]) if len(owner.deleted) else position
+        return owner.documents[row]
+
+
 class SimpleVectorStore:
-    def __init__(self):
-        self.documents: List[SimpleDocument] = []
-        self.embeddings: np.ndarray = np.array([], dtype=np.float32)
-        self.embeddings_model = get_embeddings_model()
-        self.index_path = os.path.join(settings.VECTOR_STORE_PATH or "./vector_store", "simple_index.json")
-        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+    """
+    Log-structured vector index. add_documents writes only the new rows, as a new immutable
+    segment, and commits it by rewriting the small manifest; searches merge the per-segment
+    top-k. Once there are more than VECTOR_COMPACTION_MAX_SEGMENTS segments, or a segment is
+    mostly tombstones, a compaction (in a background thread by default) rewrites them.
+    With an embedding_cache (EmbeddingCache), chunks embedded before are not re-encoded.
+    """
+
+    def __init__(self, index_dir: Optional[str] = None, embeddings_model=None, embedding_cache=None):
+        self.segments: List[Segment] = []
+        self.dim = 0
+        self.next_segment = 1
+        self._lock = threading.Lock()             # segment list + manifest writes
+        self._compaction_lock = threading.Lock()  # one compaction at a time
+        self._compactor: Optional[threading.Thread] = None
+        self.embeddings_model = embeddings_model or get_embeddings_model()
+        self.embedding_cache = embedding_cache
+        self.query_batcher = QueryEmbeddingBatcher(self.embeddings_model)
+        self.index_dir = index_dir or settings.VECTOR_STORE_PATH or "./vector_store"
+        os.makedirs(self.index_dir, exist_ok=True)
         self.load_index()
 
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.index_dir, MANIFEST_FILE)
+
+    @property
+    def legacy_index_path(self) -> str:
+        return os.path.join(self.index_dir, LEGACY_INDEX_FILE)
+
+    @property
+    def segments_dir(self) -> str:
+        return os.path.join(self.index_dir, SEGMENTS_DIR)
+
+    @property
+    def documents(self) -> SegmentedDocuments:
+        return SegmentedDocuments(self.segments)
+
     def load_index(self):
-        """Load index from disk if available."""
-        if os.path.exists(self.index_path):
+        """Memory-map the index segments, converting or migrating an older index first if needed."""
+        if not os.path.exists(self.manifest_path) and os.path.exists(self.legacy_index_path):
             try:
-                with open(self.index_path, "r") as f:
-                    data = json.load(f)
-                    self.documents = [SimpleDocument(**doc) for doc in data.get("documents", [])]
-                embeddings = data.get("embeddings", [])
-                self.embeddings = np.array(embeddings, dtype=np.float32)
-                if self.embeddings.size == 0:
-                    self.embeddings = np.array([], dtype=np.float32)
-                elif self.embeddings.ndim == 1:
-                    self.embeddings = np.atleast_2d(self.embeddings)
-                print(f"Loaded {len(self.documents)} documents from index")
+                convert_json_index(self.legacy_index_path, self.index_dir)
             except Exception as e:
-                print(f"Could not load index: {e}")
-                self.documents = []
-                self.embeddings = np.array([], dtype=np.float32)
-
-    def save_index(self):
-        """Save index to disk."""
-        data = {
-            "documents": [
-                {"page_content": doc.page_content, "metadata": doc.metadata}
-                for doc in self.documents
-            ],
-            "embeddings": self.embeddings.tolist() if self.embeddings.size else [],
-        }
-        with open(self.index_path, "w") as f:
-            json.dump(data, f)
-        print(f"Saved {len(self.documents)} documents to index")
+                logger.error(f"Could not convert legacy index {self.legacy_index_path}: {e}")
+                return
+
+        if not os.path.exists(self.manifest_path):
+            return
+
+        try:
+            with open(self.manifest_path, "r") as f:
+                manifest = json.load(f)
+            version = manifest.get("format_version")
+            if version == 1:
+                migrate_v1_index(self.index_dir, manifest)
+                with open(self.manifest_path, "r") as f:
+                    manifest = json.load(f)
+            elif version != INDEX_FORMAT_VERSION:
+                raise ValueError(f"unsupported index format version {version}")
+
+            segments = []
+            for entry in manifest["segments"]:
+                segment = Segment(os.path.join(self.segments_dir, entry["name"]))
+                segment.load_tombstones(entry.get("deleted", 0))
+                segments.append(segment)
+            count = sum(len(segment) for segment in segments)
+            if manifest["count"] != count:
+                raise ValueError(f"manifest count {manifest['count']} does not match {count} rows in segments")
+            self.segments = segments
+            self.dim = int(manifest.get("dim", 0))
+            self.next_segment = int(manifest["next_segment"])
+            logger.info(f"Loaded {len(self.documents)} documents in {len(segments)} segments from index")
+        except Exception as e:
+            logger.error(f"Could not load index: {e}")
+            self.segments = []
+            return
+
+        self._remove_orphan_segments()
+        for segment in self.segments:
+            segment.prepare()
+
+    def _remove_orphan_segments(self) -> None:
+        """
+        Delete segment directories the manifest no longer references (left behind by a
+        compaction or an interrupted write). Numbers at or past next_segment may belong to
+        a write in progress in another process and are left alone.
+        """
+        if not os.path.isdir(self.segments_dir):
+            return
+        live = {segment.name for segment in self.segments}
+        for name in os.listdir(self.segments_dir):
+            try:
+                number = segment_number(name)
+            except (IndexError, ValueError):
+                continue
+            if name not in live and number < self.next_segment:
+                shutil.rmtree(os.path.join(self.segments_dir, name), ignore_errors=True)
+
+    def _allocate_segment(self) -> str:
+        """Reserve a new segment directory; the caller holds self._lock."""
+        path = os.path.join(self.segments_dir, segment_name(self.next_segment))
+        self.next_segment += 1
+        return path
+
+    def _commit(self, segments: List[Segment]) -> None:
+        """Write the manifest for segments and make them live; the caller holds self._lock."""
+        write_manifest(self.index_dir, [s.manifest_entry() for s in segments], self.dim, self.next_segment)
+        self.segments = segments
 
     def add_documents(self, documents: List[SimpleDocument]):
-        """Add documents to the vector store and update the index."""
+        """Embed documents (in adaptive batches, not one call for all) and append them as a new segment."""
         if not documents:
             return
 
-        texts = [doc.page_content for doc in documents]
-        embeddings = np.array(self.embeddings_model.embed_documents(texts), dtype=np.float32)
-        if self.embeddings.size == 0:
-            self.embeddings = embeddings
+        embedder = BulkEmbedder(model=self.embeddings_model, workers=1, cache=self.embedding_cache)
+        self.add_embedded_documents(documents, embedder.embed([doc.page_content for doc in documents]))
+
+    def add_embedded_documents(self, documents: List[SimpleDocument], embeddings: np.ndarray):
+        """Append already embedded documents to the index as a new segment."""
+        if not documents:
+            return
+
+        embeddings = normalize_rows(embeddings)
+        if self.segments and embeddings.shape[1] != self.dim:
+            raise ValueError(f"embedding dimension {embeddings.shape[1]} does not match index dimension {self.dim}")
+
+        with self._lock:
+            path = self._allocate_segment()
+            write_segment(path, documents, embeddings)
+            segment = Segment(path)
+            segment.prepare()
+            self.dim = segment.dim
+            self._commit(self.segments + [segment])
+        logger.info(f"Added {len(documents)} documents as {segment.name} ({len(self.segments)} segments)")
+        self._schedule_compaction()
+
+    def delete_by_source(self, sources) -> int:
+        """
+        Tombstone every chunk whose metadata "source" is one of sources and commit.
+        The rows are found from each segment's stored source ids, without reading documents.
+        Returns the number of chunks deleted.
+        """
+        sources = set(sources)
+        if not sources or not self.segments:
+            return 0
+
+        deleted = 0
+        with self._compaction_lock, self._lock:
+            kept, dropped = [], []
+            for segment in self.segments:
+                rows = segment.rows_from(sources)
+                if len(rows):
+                    segment.tombstone(rows)
+                    deleted += len(rows)
+                (kept if segment.live_count else dropped).append(segment)
+            if deleted:
+                self._commit(kept)
+        for segment in dropped:
+            shutil.rmtree(segment.path, ignore_errors=True)
+
+        if deleted:
+            logger.info(f"Deleted {deleted} chunks from {len(sources)} sources")
+            self._schedule_compaction()
+        return deleted
+
+    def count_by_source(self) -> Dict[str, int]:
+        """Live chunks per metadata "source", summed from each segment's stored source ids."""
+        counts: Counter = Counter()
+        for segment in list(self.segments):
+            counts.update(segment.source_counts())
+        return dict(counts)
+
+    def _schedule_compaction(self) -> None:
+        if not self.compaction_run(self.segments, limit=settings.VECTOR_COMPACTION_MAX_SEGMENTS):
+            return
+        if settings.VECTOR_COMPACTION_BACKGROUND:
+            self._start_background_compaction()
         else:
-            self.embeddings = np.vstack([self.embeddings, embeddings])
+            self._compact_to_limit()
 
-        self.documents.extend(documents)
-        self.save_index()
+    @staticmethod
+    def compaction_run(segments: List[Segment], limit: int = 1) -> List[Segment]:
+        """
+        The segments the next compaction should rewrite, or [] when there are at most limit
+        segments and none is mostly tombstones. A segment with over a quarter of its rows
+        deleted is rewritten on its own. Otherwise the choice is size-tiered: the newest
+        segment plus each older neighbour no more than twice as large as everything gathered
+        so far, so every row is rewritten O(log n) times as the index grows.
+        """
+        for segment in segments:
+            if len(segment.deleted) * 4 > len(segment):
+                return [segment]
+        if len(segments) <= max(limit, 1):
+            return []
+        run, rows = [segments[-1]], segments[-1].live_count
+        for segment in reversed(segments[:-1]):
+            if segment.live_count > 2 * rows:
+                break
+            run.insert(0, segment)
+            rows += segment.live_count
+        return run if len(run) >= 2 else segments[-2:]
+
+    def compact(self, segments: Optional[List[Segment]] = None, limit: int = 1) -> bool:
+        """
+        Rewrite a contiguous run of segments (by default compaction_run(limit)) as one new segment
+        without their tombstoned rows. Searches keep using the old segments until the new
+        manifest is committed. Returns True if anything was rewritten.
+        """
+        with self._compaction_lock:
+            run = segments if segments is not None else self.compaction_run(self.segments, limit)
+            if not run or (len(run) == 1 and not len(run[0].deleted)):
+                return False
+            with self._lock:
+                path = self._allocate_segment()
+            merge_segments(run, path)
+            merged = Segment(path)
+            merged.prepare()
+
+            with self._lock:
+                current = self.segments
+                start = next((i for i, s in enumerate(current) if s is run[0]), None)
+                if start is None or current[start:start + len(run)] != run:
+                    raise ValueError("segments to compact are no longer contiguous in the index")
+                self._commit(current[:start] + [merged] + current[start + len(run):])
+
+        for segment in run:
+            shutil.rmtree(segment.path, ignore_errors=True)  # an open memory map keeps the data readable
+        logger.info(f"Compacted {len(run)} segments into {merged.name} ({len(merged)} rows)")
+        return True
+
+    def _compact_to_limit(self) -> None:
+        try:
+            while self.compact(limit=settings.VECTOR_COMPACTION_MAX_SEGMENTS):
+                pass
+        except Exception as e:
+            logger.error(f"Index compaction failed: {e}")
+
+    def _start_background_compaction(self) -> None:
+        if self._compactor is None or not self._compactor.is_alive():
+            self._compactor = threading.Thread(target=self._compact_to_limit, name="index-compaction", daemon=True)
+            self._compactor.start()
+
+    def wait_for_compaction(self) -> None:
+        """Block until a running background compaction finishes (e.g. before a script exits)."""
+        if self._compactor is not None:
+            self._compactor.join()
 
     def similarity_search(self, query: str, k: int = 5) -> List[SimpleDocument]:
         """Return the top-k most similar documents for the query."""
-        if len(self.documents) == 0:
+        if not self.segments:
+            return []
+        return self.similarity_search_by_vector(self.embeddings_model.embed_query(query), k=k)
+
+    def similarity_search_by_vector(self, embedding, k: int = 5) -> List[SimpleDocument]:
+        """Return the top-k documents for an already computed query embedding."""
+        segments = self.segments  # compaction swaps in a new list, it never mutates this one
+        if not segments:
             return []
 
-        query_embedding = np.array(self.embeddings_model.embed_query(query), dtype=np.float32)
-        query_norm = np.linalg.norm(query_embedding) + 1e-10
-        doc_norms = np.linalg.norm(self.embeddings, axis=1) + 1e-10
-        similarities = np.dot(self.embeddings, query_embedding) / (doc_norms * query_norm)
-        top_indices = np.argsort(similarities)[-k:][::-1]
-        return [self.documents[i] for i in top_indices]
+        query_embedding = normalize_rows(embedding)
+        hits = [segment.search(query_embedding, k) for segment in segments]
+        owners = np.concatenate([np.full(len(rows), i) for i, (rows, _) in enumerate(hits)])
+        rows = np.concatenate([rows for rows, _ in hits])
+        best = top_k_indices(np.concatenate([scores for _, scores in hits]), k)
+        return [segments[owners[i]].documents[int(rows[i])] for i in best]
 
 
-# Module-level singleton — load the 234 MB index only once at startup.
+# Module-level singleton — memory-map the index only once at startup.
 _vector_store_instance: Optional[SimpleVectorStore] = None
 
 
@@ -88,5 +963,7 @@ def get_vector_store() -> SimpleVectorStore:
     """Return the singleton vector store, initialising it on first call."""
     global _vector_store_instance
     if _vector_store_instance is None:
-        _vector_store_instance = SimpleVectorStore()
-    return _vector_store_instance
\ No newline at end of file
+        model = get_embeddings_model()
+        cache = EmbeddingCache(model.model_name) if settings.EMBEDDING_DISK_CACHE else None
+        _vector_store_instance = SimpleVectorStore(embeddings_model=model, embedding_cache=cache)
+    return _vector_store_instance
@@ -51,4 +51,12 @@ class ChatHistoryItem(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
- 
\ No newline at end of file
+ 
+
+
+class ChatSearchHit(ChatHistoryItem):
+    """
+    Chat interaction matching a full-text search.
+    """
+    score: float = Field(..., description="bm25 relevance; lower is a better match")
+    snippet: str = Field("", description="Matching excerpt with the matched words in [brackets]")
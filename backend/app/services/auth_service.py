@@ -69,6 +69,16 @@ def get_verified_user(user: User = Depends(get_current_user)) -> User:
     return user
 
 
+def get_admin_user(user: User = Depends(get_verified_user)) -> User:
+    """Like get_verified_user but also requires the email to be listed in ADMIN_EMAILS."""
+    if user.email.lower() not in {email.lower() for email in settings.ADMIN_EMAILS}:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required.",
+        )
+    return user
+
+
 #  Register
 def register_user(req: RegisterRequest, db: Session) -> TokenResponse:
     validate_password_strength(req.password)
@@ -1,7 +1,9 @@
 """
 Chat Service: Core RAG pipeline with caching, source tracking, and medical guardrails.
 """
-from typing import List, Dict, Any, Optional
+import re
+import asyncio
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
 
 # The original implementation relied heavily on LangChain core and Groq
 # libraries which depend on pydantic v1. That conflicts with the project’s
@@ -19,31 +21,48 @@ except Exception:
 from app.rag.vectorstore import SimpleDocument
 Document = SimpleDocument
 
-from app.rag.qa_cache import get_cached_answer, save_to_cache
+from app.rag.qa_cache import get_exact_answer, get_similar_answer, save_to_cache
 from app.core.config import settings
 from app.schemas.chat import ChatRequest, ChatResponse
 from app.utils.logger import get_logger
 from app.db.session import SessionLocal
 from app.models.history import ChatHistory
+from app.services.history_writer import get_history_writer
 from datetime import datetime
 
 logger = get_logger("chat_service")
 
+UNAVAILABLE_ANSWER = "I apologize, but I'm currently unable to access the medical knowledge base. Please try again later."
 
-def save_chat_history(session_id: str, message: str, response: str, sources: List[str]):
+
+def format_sources(docs: List[Document]) -> List[str]:
+    """Build "source (Page n)" citation labels for retrieved documents."""
+    sources = []
+    for doc in docs:
+        metadata = getattr(doc, "metadata", {}) or {}
+        source = metadata.get("source", "Unknown")
+        page = metadata.get("page", "N/A")
+        sources.append(f"{source} (Page {page})")
+    return sources
+
+
+def _history_row(session_id: str, message: str, response: str, sources: List[str]) -> dict:
+    return {
+        "session_id": session_id,
+        "message": message,
+        "response": response,
+        "sources": "|".join(sources),  # Store as pipe-separated string
+        "timestamp": datetime.utcnow(),
+    }
+
+
+def write_chat_history(session_id: str, message: str, response: str, sources: List[str]):
     """
-    Save chat interaction to SQLite database for persistence and analytics.
+    Save one chat interaction to SQLite right away (one transaction per call).
     """
     try:
         db = SessionLocal()
-        chat_record = ChatHistory(
-            session_id=session_id,
-            message=message,
-            response=response,
-            sources="|".join(sources),  # Store as pipe-separated string
-            timestamp=datetime.utcnow()
-        )
-        db.add(chat_record)
+        db.add(ChatHistory(**_history_row(session_id, message, response, sources)))
         db.commit()
         db.close()
         logger.info(f"Chat history saved for session: {session_id}")
@@ -51,6 +70,55 @@ def save_chat_history(session_id: str, message: str, response: str, sources: Lis
         logger.error(f"Failed to save chat history: {str(e)}")
 
 
+async def save_chat_history(session_id: str, message: str, response: str, sources: List[str]):
+    """
+    Save chat interaction to SQLite database for persistence and analytics.
+    With HISTORY_WRITE_BEHIND the record is queued for the batched background writer, so the
+    request does not wait for a commit; it only waits if the writer's queue is full.
+    """
+    if not settings.HISTORY_WRITE_BEHIND:
+        write_chat_history(session_id, message, response, sources)
+        return
+    await get_history_writer().submit(_history_row(session_id, message, response, sources))
+
+
+async def embed_query(message: str):
+    """
+    Embed the query once so the semantic cache and retrieval can share the vector.
+    Goes through the micro-batching scheduler, so concurrent requests share one encode.
+    """
+    try:
+        from app.rag.vectorstore import get_vector_store
+        return await get_vector_store().query_batcher.embed(message)
+    except Exception as e:
+        logger.warning(f"Query embedding failed, semantic cache disabled for this request: {str(e)}")
+        return None
+
+
+async def lookup_cache(normalized_question: str, message: str) -> Tuple[Optional[str], Any]:
+    """
+    Cached answer for the question (or None) and the query embedding. The exact key is
+    tried first, so a repeated question is answered without embedding it; the embedding is
+    computed only on a miss, for the semantic lookup and then retrieval. Both lookups run in
+    a worker thread, so the L2 SQLite read and the index scan do not block the event loop.
+    """
+    cached_answer = await asyncio.to_thread(get_exact_answer, normalized_question)
+    if cached_answer is not None:
+        return cached_answer, None
+    query_embedding = await embed_query(message)
+    return await asyncio.to_thread(get_similar_answer, query_embedding), query_embedding
+
+
+def retrieve_documents(message: str, query_embedding=None) -> List[Document]:
+    """Top-k retrieval, reusing the query embedding when one is available."""
+    from app.rag.vectorstore import get_vector_store
+
+    vectorstore = get_vector_store()
+    if query_embedding is not None:
+        return vectorstore.similarity_search_by_vector(query_embedding, k=settings.TOP_K)
+    return vectorstore.similarity_search(message, k=settings.TOP_K)
+
+
 async def process_chat_message(request: ChatRequest) -> ChatResponse:
     """
     Process medical query with:
@@ -64,8 +132,8 @@ async def process_chat_message(request: ChatRequest) -> ChatResponse:
 
     normalized_question = request.message.strip().lower()
 
-    # 1️⃣ CACHE LOOKUP - Fast retrieval for repeated questions
-    cached_answer = get_cached_answer(normalized_question)
+    # 1️⃣ CACHE LOOKUP - Fast retrieval for repeated (or semantically equivalent) questions
+    cached_answer, query_embedding = await lookup_cache(normalized_question, request.message)
     if cached_answer:
         logger.info("✅ Cache hit!")
         response = ChatResponse(
@@ -73,28 +141,20 @@ async def process_chat_message(request: ChatRequest) -> ChatResponse:
             sources=["Cached from Vector DB"],
             session_id=request.session_id
         )
-        save_chat_history(request.session_id, request.message, cached_answer, ["Cached"])
+        await save_chat_history(request.session_id, request.message, cached_answer, ["Cached"])
         return response
 
     is_success = True
     try:
-        from app.rag.vectorstore import get_vector_store, SimpleDocument
         from app.rag.chain import get_rag_chain
 
-        vectorstore = get_vector_store()
-
-        docs = vectorstore.similarity_search(request.message, k=settings.TOP_K)
+        docs = await asyncio.to_thread(retrieve_documents, request.message, query_embedding)
         logger.info(f"Retrieved {len(docs)} relevant documents")
 
-        sources = []
-        for doc in docs:
-            metadata = getattr(doc, "metadata", {}) or {}
-            source = metadata.get("source", "Unknown")
-            page = metadata.get("page", "N/A")
-            sources.append(f"{source} (Page {page})")
+        sources = format_sources(docs)
 
         rag_chain = get_rag_chain()
-        answer = rag_chain(request.message, docs)
+        answer = await rag_chain(request.message, docs)
         logger.info("✅ RAG pipeline completed successfully")
 
     except Exception as e:
@@ -103,17 +163,17 @@ async def process_chat_message(request: ChatRequest) -> ChatResponse:
         try:
             from app.rag.chain import get_rag_chain
             rag_chain = get_rag_chain()
-            answer = rag_chain(request.message, [])
+            answer = await rag_chain(request.message, [])
             sources = []
             logger.info("✅ Fallback direct model response generated")
         except Exception as inner:
             logger.error(f"Fallback model call failed: {str(inner)}")
-            answer = "I apologize, but I'm currently unable to access the medical knowledge base. Please try again later."
+            answer = UNAVAILABLE_ANSWER
             sources = ["Error: Knowledge base unavailable"]
 
     if is_success:
-        save_to_cache(normalized_question, answer)
-    save_chat_history(request.session_id, request.message, answer, sources)
+        await asyncio.to_thread(save_to_cache, normalized_question, answer, query_embedding)
+    await save_chat_history(request.session_id, request.message, answer, sources)
 
     response = ChatResponse(
         answer=answer,
@@ -121,3 +181,59 @@ async def process_chat_message(request: ChatRequest) -> ChatResponse:
         session_id=request.session_id
     )
     return response
+
+
+async def stream_chat_message(request: ChatRequest) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Streaming variant of process_chat_message. Yields (event, data) pairs:
+    1. ("sources", [...]) as soon as retrieval finishes
+    2. ("token", "...") for each answer fragment as the LLM produces it
+    3. ("error", {...}) if generation fails part-way
+    4. ("done", {...}) after the cache and chat history have been written
+    Cache hits are replayed through the same sequence of events.
+    """
+    logger.info(f"Streaming query: {request.message[:60]}... (Session: {request.session_id})")
+
+    normalized_question = request.message.strip().lower()
+    cached_answer, query_embedding = await lookup_cache(normalized_question, request.message)
+    if cached_answer:
+        logger.info("✅ Cache hit! Replaying as stream")
+        yield "sources", ["Cached from Vector DB"]
+        for token in re.findall(r"\s*\S+", cached_answer):
+            yield "token", token
+        await save_chat_history(request.session_id, request.message, cached_answer, ["Cached"])
+        yield "done", {"session_id": request.session_id, "cached": True}
+        return
+
+    from app.rag.chain import get_streaming_rag_chain
+
+    is_success = True
+    try:
+        docs = await asyncio.to_thread(retrieve_documents, request.message, query_embedding)
+        sources = format_sources(docs)
+        logger.info(f"Retrieved {len(docs)} relevant documents")
+    except Exception as e:
+        is_success = False
+        logger.error(f"Retrieval failed: {str(e)}. Streaming direct answer.")
+        docs, sources = [], []
+
+    yield "sources", sources
+
+    tokens: List[str] = []
+    try:
+        async for token in get_streaming_rag_chain()(request.message, docs):
+            tokens.append(token)
+            yield "token", token
+    except Exception as e:
+        is_success = False
+        logger.error(f"Streaming generation failed: {str(e)}")
+        if not tokens:
+            tokens.append(UNAVAILABLE_ANSWER)
+            sources = ["Error: Knowledge base unavailable"]
+        yield "error", {"detail": UNAVAILABLE_ANSWER}
+
+    answer = "".join(tokens).strip()
+    if is_success:
+        await asyncio.to_thread(save_to_cache, normalized_question, answer, query_embedding)
+    await save_chat_history(request.session_id, request.message, answer, sources)
+    yield "done", {"session_id": request.session_id, "cached": False}
@@ -0,0 +1,92 @@
+"""
+Bulk export of chat history as NDJSON or CSV, streamed in constant memory.
+"""
+import io
+import csv
+import json
+from datetime import datetime
+from typing import Iterator, List, Optional
+from sqlalchemy import select, tuple_
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.history import ChatHistory
+from app.services.history_query import naive_utc
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+COLUMNS = ["id", "session_id", "message", "response", "sources", "timestamp"]
+
+
+def iter_history_batches(
+    session_factory=SessionLocal,
+    session_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    batch_size: Optional[int] = None,
+) -> Iterator[List[tuple]]:
+    """
+    Rows of chat_history with since <= timestamp < until (and of session_id, if given) in
+    (timestamp, id) order, batch_size at a time. Each batch is its own short read that seeks
+    past the last row of the previous one on the timestamp (or session) index, so no
+    connection, lock or WAL snapshot is held between batches and memory does not grow with the
+    export. until defaults to the start of the export, so rows written meanwhile are left out.
+    """
+    batch_size = batch_size or settings.HISTORY_EXPORT_BATCH_SIZE
+    table = ChatHistory.__table__
+    query = select(*(table.c[name] for name in COLUMNS))
+    if session_id is not None:
+        query = query.where(table.c.session_id == session_id)
+    if since is not None:
+        query = query.where(table.c.timestamp >= naive_utc(since))
+    query = query.where(table.c.timestamp < (naive_utc(until) or datetime.utcnow()))
+    query = query.order_by(table.c.timestamp, table.c.id).limit(batch_size)
+
+    last = None
+    while True:
+        page = query if last is None else query.where(tuple_(table.c.timestamp, table.c.id) > tuple_(*last))
+        with session_factory() as db:
+            rows = db.execute(page).all()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < batch_size:
+            return
+        last = (rows[-1].timestamp, rows[-1].id)
+
+
+def _ndjson(rows: List[tuple]) -> str:
+    return "".join(
+        json.dumps({
+            "id": row.id,
+            "session_id": row.session_id,
+            "message": row.message,
+            "response": row.response,
+            "sources": row.sources.split("|") if row.sources else [],
+            "timestamp": row.timestamp.isoformat() if row.timestamp else None,
+        }, ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+
+def _csv(rows: List[tuple], header: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(COLUMNS)
+    writer.writerows(
+        (row.id, row.session_id, row.message, row.response, row.sources or "", row.timestamp.isoformat() if row.timestamp else "")
+        for row in rows
+    )
+    return buffer.getvalue()
+
+
+def export_history(fmt: str = "ndjson", session_factory=SessionLocal, **filters) -> Iterator[str]:
+    """
+    Chunks of the export in fmt ('ndjson' or 'csv'), one per batch of iter_history_batches().
+    NDJSON lines are the GET /history items; CSV keeps sources pipe-separated as stored.
+    """
+    if fmt not in MEDIA_TYPES:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {sorted(MEDIA_TYPES)}")
+    if fmt == "csv":
+        yield _csv([], header=True)
+    for rows in iter_history_batches(session_factory, **filters):
+        yield _ndjson(rows) if fmt == "ndjson" else _csv(rows, header=False)
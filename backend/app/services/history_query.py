@@ -0,0 +1,51 @@
+"""
+Keyset (cursor) pagination of a session's chat history, newest first.
+"""
+import base64
+import binascii
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+from app.models.history import ChatHistory
+
+Cursor = Tuple[datetime, int]
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Timestamps are stored as naive UTC; convert aware datetimes to match."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def encode_cursor(row: ChatHistory) -> str:
+    """Opaque cursor pointing just past row."""
+    raw = f"{row.timestamp.isoformat()}|{row.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """(timestamp, id) of an encode_cursor() value; ValueError if it is not one."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"Invalid history cursor: {cursor!r}") from e
+
+
+def history_page(db: Session, session_id: str, limit: int, before: Optional[Cursor] = None) -> Tuple[List[ChatHistory], Optional[str]]:
+    """
+    Up to limit messages of session_id older than the before cursor (newest first), and the
+    cursor of the next page, or None on the last page. The query seeks on the
+    (session_id, timestamp, id) index instead of skipping rows, so every page costs the same
+    however long the session is.
+    """
+    query = db.query(ChatHistory).filter(ChatHistory.session_id == session_id)
+    if before is not None:
+        query = query.filter(tuple_(ChatHistory.timestamp, ChatHistory.id) < tuple_(*before))
+    rows = query.order_by(ChatHistory.timestamp.desc(), ChatHistory.id.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    return rows[:limit], encode_cursor(rows[limit - 1])
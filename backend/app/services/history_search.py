@@ -0,0 +1,127 @@
+"""
+Full-text search over chat history with an SQLite FTS5 index kept in sync by triggers.
+"""
+import re
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import DateTime, bindparam, inspect, text
+from sqlalchemy.orm import Session
+from app.services.history_query import naive_utc
+from app.utils.logger import get_logger
+
+logger = get_logger("history_search")
+
+FTS_TABLE = "chat_history_fts"
+
+# External-content index: it stores only the inverted index and reads the text from
+# chat_history, so the messages are not kept twice. The triggers keep it in sync with every
+# write path (write-behind batches, the synchronous save, DELETE /history).
+_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        message, response, content='chat_history', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS chat_history_fts_insert AFTER INSERT ON chat_history BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, message, response) VALUES (new.id, new.message, new.response);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS chat_history_fts_delete AFTER DELETE ON chat_history BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, message, response) VALUES ('delete', old.id, old.message, old.response);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS chat_history_fts_update AFTER UPDATE OF message, response ON chat_history BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, message, response) VALUES ('delete', old.id, old.message, old.response);
+        INSERT INTO {FTS_TABLE}(rowid, message, response) VALUES (new.id, new.message, new.response);
+    END""",
+]
+
+# bm25 weights of the message (question) and response columns
+_WEIGHTS = (2.0, 1.0)
+
+
+def ensure_history_fts(bind) -> bool:
+    """
+    Create the FTS5 index and its triggers if missing; a new index is filled from the rows
+    already in chat_history. Returns False (search unavailable) on databases other than SQLite
+    or SQLite builds without FTS5.
+    """
+    if bind.dialect.name != "sqlite":
+        logger.warning("Chat history search needs SQLite FTS5; /search is disabled")
+        return False
+    created = not inspect(bind).has_table(FTS_TABLE)
+    try:
+        with bind.begin() as conn:
+            for statement in _DDL:
+                conn.execute(text(statement))
+            if created:
+                conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    except Exception as e:
+        logger.warning(f"Chat history search unavailable: {e}")
+        return False
+    if created:
+        logger.info("Built the chat history full-text index")
+    return True
+
+
+def match_expression(query: str) -> str:
+    """
+    FTS5 query for plain user text: every word must appear (any order, stemmed). Words are
+    quoted, so operators and punctuation in the input are searched for, not interpreted.
+    """
+    terms = re.findall(r"\w+", query)
+    return " ".join(f'"{term}"' for term in terms)
+
+
+def search_history(
+    db: Session,
+    query: str,
+    limit: int,
+    offset: int = 0,
+    session_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> Tuple[List[dict], Optional[int]]:
+    """
+    Up to limit interactions matching query, best bm25 match first, skipping offset; and the
+    offset of the next page, or None on the last page. Each result has the chat_history
+    columns plus score (lower is better) and a snippet with the matched words in [brackets].
+    """
+    expression = match_expression(query)
+    if not expression:
+        return [], None
+
+    filters, binds = [], []
+    params = {"match": expression, "limit": limit + 1, "offset": offset}
+    if session_id is not None:
+        filters.append("h.session_id = :session_id")
+        params["session_id"] = session_id
+    for name, value, op in (("since", since, ">="), ("until", until, "<")):
+        if value is not None:
+            filters.append(f"h.timestamp {op} :{name}")
+            binds.append(bindparam(name, naive_utc(value), type_=DateTime))
+
+    if session_id is not None:
+        # A session is short: walk its rows (session index) and test each against the match,
+        # instead of reading every match of a common word in the whole history
+        source = f"chat_history AS h CROSS JOIN {FTS_TABLE} ON {FTS_TABLE}.rowid = h.id"
+    else:
+        source = f"{FTS_TABLE} JOIN chat_history AS h ON h.id = {FTS_TABLE}.rowid"
+
+    # Rank and cut the page first; snippets are then built only for the rows returned
+    # (CROSS JOIN keeps SQLite from driving the outer query with a second full match)
+    statement = text(f"""
+        SELECT h.id, h.session_id, h.message, h.response, h.sources, h.timestamp, page.score,
+               snippet({FTS_TABLE}, -1, '[', ']', '…', 16) AS snippet
+        FROM (
+            SELECT h.id AS id, bm25({FTS_TABLE}, {_WEIGHTS[0]}, {_WEIGHTS[1]}) AS score
+            FROM {source}
+            WHERE {FTS_TABLE} MATCH :match {"".join(f" AND {f}" for f in filters)}
+            ORDER BY score, h.id
+            LIMIT :limit OFFSET :offset
+        ) AS page
+        CROSS JOIN chat_history AS h ON h.id = page.id
+        CROSS JOIN {FTS_TABLE} ON {FTS_TABLE}.rowid = page.id
+        WHERE {FTS_TABLE} MATCH :match
+        ORDER BY page.score, page.id
+    """).bindparams(*binds).columns(timestamp=DateTime)
+    rows = db.execute(statement, params).mappings().all()
+
+    results = [dict(row) for row in rows[:limit]]
+    return results, (offset + limit if len(rows) > limit else None)
@@ -0,0 +1,151 @@
+"""
+Write-behind chat history: requests enqueue records and a background task inserts them in
+batches, one transaction per batch, off the event loop.
+"""
+import asyncio
+from typing import List, Optional, Tuple
+from sqlalchemy import insert
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.history import ChatHistory
+from app.utils.logger import get_logger
+
+logger = get_logger("history_writer")
+
+
+class HistoryWriter:
+    """
+    Batches chat-history inserts.
+
+    submit() puts a row on a bounded queue and returns; when the queue is full it waits for
+    room, so a stalled database slows requests down instead of growing memory. A single
+    worker task collects up to max_batch rows, or whatever arrived within max_wait seconds of
+    the first, and inserts them with one executemany in one transaction in a worker thread.
+    flush() waits until the rows submitted before it was called are committed, not for the
+    queue to run dry, so it returns under steady traffic; close() flushes and stops the worker
+    (call it on shutdown).
+    """
+
+    def __init__(self, session_factory=SessionLocal, max_batch: int = None, max_wait: float = None, max_queue: int = None):
+        self._session_factory = session_factory
+        self.max_batch = max_batch or settings.HISTORY_BATCH_MAX_SIZE
+        self.max_wait = settings.HISTORY_BATCH_MAX_WAIT_MS / 1000 if max_wait is None else max_wait
+        self.max_queue = max_queue or settings.HISTORY_QUEUE_SIZE
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._submitted = 0  # rows accepted by submit()...
+        self._finished = 0   # ...and rows written or failed; both only grow
+        self._flushes: List[Tuple[int, asyncio.Future]] = []  # (rows to finish, future) per waiting flush()
+        self.batches = 0
+        self.written = 0
+        self.failed = 0
+
+    async def submit(self, row: dict) -> None:
+        self._ensure_worker()
+        await self._queue.put(row)
+        self._submitted += 1
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            # Rows still queued on a previous (closed) loop are carried over, not dropped
+            pending = []
+            while self._queue is not None and not self._queue.empty():
+                pending.append(self._queue.get_nowait())
+            if self._loop is not loop:
+                # A batch taken by the old loop's worker is gone with it, and the futures of a
+                # closed loop can never be awaited again
+                self._finished = self._submitted - len(pending)
+                self._flushes = []
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            for row in pending:
+                self._queue.put_nowait(row)
+            self._worker = loop.create_task(self._run())
+
+    async def _collect(self) -> List[dict]:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _insert(self, rows: List[dict]) -> None:
+        with self._session_factory() as db:
+            db.execute(insert(ChatHistory), rows)
+            db.commit()
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            try:
+                await asyncio.to_thread(self._insert, batch)
+                self.batches += 1
+                self.written += len(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                logger.error(f"Failed to save {len(batch)} chat history records: {e}")
+            finally:
+                self._finished += len(batch)
+                self._wake_flushes()
+
+    def _wake_flushes(self) -> None:
+        waiting = []
+        for target, future in self._flushes:
+            if target <= self._finished:
+                if not future.done():
+                    future.set_result(None)
+            else:
+                waiting.append((target, future))
+        self._flushes = waiting
+
+    async def flush(self) -> None:
+        """Wait until every row submitted before this call has been written (or has failed)."""
+        target = self._submitted
+        if self._finished >= target:
+            return
+        self._ensure_worker()
+        future = self._loop.create_future()
+        self._flushes.append((target, future))
+        await future
+
+    async def close(self) -> None:
+        """Flush, then stop the worker task."""
+        await self.flush()
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "written": self.written,
+            "failed": self.failed,
+            "mean_batch_size": self.written / self.batches if self.batches else 0.0,
+        }
+
+
+_history_writer: Optional[HistoryWriter] = None
+
+
+def get_history_writer() -> HistoryWriter:
+    """Return the process-wide history writer, creating it on first use."""
+    global _history_writer
+    if _history_writer is None:
+        _history_writer = HistoryWriter()
+    return _history_writer
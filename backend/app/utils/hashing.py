@@ -0,0 +1,10 @@
+import hashlib
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Hex SHA-256 of a file's contents, read in chunk_size blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
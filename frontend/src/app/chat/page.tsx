@@ -1,5 +1,5 @@
 'use client'
-import { useEffect, useRef, useCallback } from 'react'
+import { useEffect, useRef, useCallback, useState } from 'react'
 import { useRouter } from 'next/navigation'
 import { useAuth } from '@/context/authcontext'
 import { useConversations } from '@/context/conversationcontext'
@@ -21,21 +21,24 @@ export default function ChatPage() {
     addMessage,
     updateMessage,
     loadHistoryIntoConversation,
+    prependHistory,
   } = useConversations()
 
   const messagesEndRef = useRef<HTMLDivElement>(null)
-  const abortRef = useRef<boolean>(false)
+  const abortRef = useRef<AbortController | null>(null)
+  const [loadingEarlier, setLoadingEarlier] = useState(false)
   const isGenerating = active?.messages.some((m) => m.isStreaming) ?? false
+  const lastMessageId = active?.messages[active.messages.length - 1]?.id
 
   // ── Auth guard ────────────────────────────────────────────────────────────
   useEffect(() => {
     if (!isLoading && !isAuthenticated) router.replace('/login')
   }, [isAuthenticated, isLoading, router])
 
-  // ── Scroll to bottom on new messages ─────────────────────────────────────
+  // ── Scroll to bottom on new messages (not when earlier ones are prepended) ──
   useEffect(() => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' })
-  }, [active?.messages.length, isGenerating])
+  }, [lastMessageId, isGenerating])
 
   // ── Load chat history when switching conversations ────────────────────────
   useEffect(() => {
@@ -43,13 +46,27 @@ export default function ChatPage() {
     const conv = conversations.find((c) => c.id === activeId)
     if (!conv || conv.messages.length > 0) return   // already loaded or new
 
-    chatApi.history(activeId)
-      .then(({ data }) => {
-        if (data.length > 0) loadHistoryIntoConversation(activeId, data)
+    chatApi.historyPage(activeId)
+      .then(({ messages, cursor }) => {
+        if (messages.length > 0) loadHistoryIntoConversation(activeId, messages, cursor)
       })
       .catch(() => { })
   }, [activeId])  // eslint-disable-line react-hooks/exhaustive-deps
 
+  // ── Load the page of history before the oldest loaded message ─────────────
+  const handleLoadEarlier = useCallback(async () => {
+    if (!activeId || !active?.historyCursor || loadingEarlier) return
+    setLoadingEarlier(true)
+    try {
+      const { messages, cursor } = await chatApi.historyPage(activeId, active.historyCursor)
+      prependHistory(activeId, messages, cursor)
+    } catch {
+      // keep the cursor so the button can be retried
+    } finally {
+      setLoadingEarlier(false)
+    }
+  }, [activeId, active?.historyCursor, loadingEarlier, prependHistory])
+
   // ── New conversation ───────────────────────────────────────────────────────
   const handleNewChat = useCallback(() => {
     createConversation()
@@ -75,44 +92,52 @@ export default function ChatPage() {
     }
     const assistantMsg = addMessage(convId, placeholder)
 
-    abortRef.current = false
+    const controller = new AbortController()
+    abortRef.current = controller
+
+    let content = ''
+    let sources: string[] = []
 
     try {
-      const { data } = await chatApi.send(text, convId)
-
-      if (abortRef.current) return
-
-      // Simulate streaming by typing the response character by character
-      let displayed = ''
-      const words = data.answer.split(' ')
-      for (let i = 0; i < words.length; i++) {
-        if (abortRef.current) break
-        displayed += (i > 0 ? ' ' : '') + words[i]
-        updateMessage(convId, assistantMsg.id, {
-          content: displayed,
-          isStreaming: i < words.length - 1,
-          sources: i === words.length - 1 ? data.sources : undefined,
-        })
-        // Small delay between words for streaming effect
-        await new Promise((r) => setTimeout(r, 18))
-      }
+      // Tokens are rendered as the backend streams them (sources arrive first)
+      await chatApi.stream(
+        text,
+        convId,
+        {
+          onSources: (s) => { sources = s },
+          onToken: (token) => {
+            content += token
+            updateMessage(convId, assistantMsg.id, { content, isStreaming: true })
+          },
+          onError: (detail) => {
+            if (!content) content = `⚠️ ${detail}`
+          },
+        },
+        controller.signal
+      )
 
       // Final update — streaming done
       updateMessage(convId, assistantMsg.id, {
-        content: data.answer,
-        sources: data.sources,
+        content: content.trim(),
+        sources,
         isStreaming: false,
       })
     } catch (err) {
+      if (controller.signal.aborted) {
+        updateMessage(convId, assistantMsg.id, { content, sources, isStreaming: false })
+        return
+      }
       updateMessage(convId, assistantMsg.id, {
-        content: `⚠️ ${getErrorMessage(err)}`,
+        content: `⚠️ ${err instanceof Error ? err.message : getErrorMessage(err)}`,
         isStreaming: false,
         sources: [],
       })
+    } finally {
+      if (abortRef.current === controller) abortRef.current = null
     }
   }, [activeId, createConversation, addMessage, updateMessage])
 
-  const handleStop = () => { abortRef.current = true }
+  const handleStop = () => { abortRef.current?.abort() }
 
   const handleSuggest = (question: string) => handleSend(question)
 
@@ -160,6 +185,17 @@ export default function ChatPage() {
             <EmptyState onSuggest={handleSuggest} />
           ) : (
             <div className="max-w-3xl mx-auto px-4 py-6 space-y-6">
+              {active.historyCursor && (
+                <div className="flex justify-center">
+                  <button
+                    onClick={handleLoadEarlier}
+                    disabled={loadingEarlier}
+                    className="text-xs text-teal hover:underline disabled:opacity-50 disabled:no-underline"
+                  >
+                    {loadingEarlier ? 'Loading…' : 'Load earlier messages'}
+                  </button>
+                </div>
+              )}
               {active.messages.map((msg) => (
                 <MessageBubble key={msg.id} message={msg} />
               ))}
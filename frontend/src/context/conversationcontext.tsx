@@ -13,7 +13,8 @@ interface ConversationsContextValue {
   selectConversation: (conversationId: string) => void
   deleteConversation: (conversationId: string) => void
   renameConversation: (conversationId: string, title: string) => void
-  loadHistoryIntoConversation: (conversationId: string, history: Message[]) => void
+  loadHistoryIntoConversation: (conversationId: string, history: Message[], cursor?: string | null) => void
+  prependHistory: (conversationId: string, history: Message[], cursor?: string | null) => void
 }
 
 const ConversationsContext = createContext<ConversationsContextValue | undefined>(undefined)
@@ -108,7 +109,7 @@ export function ConversationsProvider({ children }: { children: React.ReactNode
     )
   }
 
-  const loadHistoryIntoConversation = (conversationId: string, history: Message[]) => {
+  const loadHistoryIntoConversation = (conversationId: string, history: Message[], cursor: string | null = null) => {
     setConversations((current) =>
       current.map((conversation) => {
         if (conversation.id !== conversationId) return conversation
@@ -116,12 +117,29 @@ export function ConversationsProvider({ children }: { children: React.ReactNode
         return {
           ...conversation,
           messages: history,
+          historyCursor: cursor,
           updatedAt: new Date().toISOString(),
         }
       })
     )
   }
 
+  // Older messages go in front of the loaded ones; cursor points at the page after them
+  const prependHistory = (conversationId: string, history: Message[], cursor: string | null = null) => {
+    setConversations((current) =>
+      current.map((conversation) => {
+        if (conversation.id !== conversationId) return conversation
+
+        const loaded = new Set(conversation.messages.map((message) => message.id))
+        return {
+          ...conversation,
+          messages: [...history.filter((message) => !loaded.has(message.id)), ...conversation.messages],
+          historyCursor: cursor,
+        }
+      })
+    )
+  }
+
   const value = useMemo<ConversationsContextValue>(
     () => ({
       conversations,
@@ -134,6 +152,7 @@ export function ConversationsProvider({ children }: { children: React.ReactNode
       deleteConversation,
       renameConversation,
       loadHistoryIntoConversation,
+      prependHistory,
     }),
     [active, activeId, conversations]
   )
@@ -1,5 +1,5 @@
 import axios, { AxiosError } from 'axios'
-import type { TokenResponse, ChatHistoryItem } from '@/types'
+import type { TokenResponse, ChatHistoryItem, Message } from '@/types'
 
 const BASE = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8001'
 
@@ -79,6 +79,77 @@ export const authApi = {
   logout: () => http.post('/api/v1/auth/logout'),
 }
 
+// ── Chat streaming (Server-Sent Events over POST) ────────────────────────────
+export interface StreamHandlers {
+  onSources?: (sources: string[]) => void
+  onToken?: (token: string) => void
+  onError?: (detail: string) => void
+  onDone?: (info: { session_id: string; cached: boolean }) => void
+}
+
+async function streamQuery(
+  message: string,
+  session_id: string,
+  handlers: StreamHandlers,
+  signal?: AbortSignal
+): Promise<void> {
+  const headers: Record<string, string> = { 'Content-Type': 'application/json' }
+  const token = typeof window !== 'undefined' ? localStorage.getItem('access_token') : null
+  if (token) headers.Authorization = `Bearer ${token}`
+
+  const res = await fetch(`${BASE}/api/v1/chat/query/stream`, {
+    method: 'POST',
+    headers,
+    body: JSON.stringify({ message, session_id }),
+    signal,
+  })
+  if (!res.ok || !res.body) {
+    const body = await res.json().catch(() => null)
+    throw new Error(typeof body?.detail === 'string' ? body.detail : `Request failed (${res.status})`)
+  }
+
+  const reader = res.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+
+  const dispatch = (block: string) => {
+    let event = 'message'
+    let data = ''
+    for (const line of block.split('\n')) {
+      if (line.startsWith('event: ')) event = line.slice(7)
+      else if (line.startsWith('data: ')) data += line.slice(6)
+    }
+    if (!data) return
+    const payload = JSON.parse(data)
+    if (event === 'sources') handlers.onSources?.(payload)
+    else if (event === 'token') handlers.onToken?.(payload)
+    else if (event === 'error') handlers.onError?.(payload.detail)
+    else if (event === 'done') handlers.onDone?.(payload)
+  }
+
+  for (;;) {
+    const { value, done } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+    let sep = buffer.indexOf('\n\n')
+    while (sep !== -1) {
+      dispatch(buffer.slice(0, sep))
+      buffer = buffer.slice(sep + 2)
+      sep = buffer.indexOf('\n\n')
+    }
+  }
+  if (buffer.trim()) dispatch(buffer)
+}
+
+// ── History pages → messages ────────────────────────────────────────────────────
+// A page is newest first; each interaction becomes a question and an answer, oldest first
+function historyToMessages(items: ChatHistoryItem[]): Message[] {
+  return [...items].reverse().flatMap((item) => [
+    { id: `history-${item.id}-q`, role: 'user' as const, content: item.message, timestamp: item.timestamp },
+    { id: `history-${item.id}-a`, role: 'assistant' as const, content: item.response, sources: item.sources, timestamp: item.timestamp },
+  ])
+}
+
 // ── Chat ──────────────────────────────────────────────────────────────────────
 export const chatApi = {
   send: (message: string, session_id: string) =>
@@ -87,8 +158,18 @@ export const chatApi = {
       { message, session_id }
     ),
 
-  history: (session_id: string) =>
-    http.get<ChatHistoryItem[]>(`/api/v1/chat/history/${session_id}`),
+  stream: streamQuery,
+
+  // Newest page first; pass the previous response's x-next-cursor header as `before` for older messages
+  history: (session_id: string, params?: { limit?: number; before?: string }) =>
+    http.get<ChatHistoryItem[]>(`/api/v1/chat/history/${session_id}`, { params }),
+
+  // One history page as chat messages (oldest first) and the `before` cursor of the next, older page
+  historyPage: async (session_id: string, before?: string) => {
+    const { data, headers } = await http.get<ChatHistoryItem[]>(`/api/v1/chat/history/${session_id}`, { params: { before } })
+    const cursor = headers['x-next-cursor']
+    return { messages: historyToMessages(data), cursor: typeof cursor === 'string' ? cursor : null }
+  },
 
   clearHistory: (session_id: string) =>
     http.delete(`/api/v1/chat/history/${session_id}`),
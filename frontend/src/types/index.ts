@@ -35,6 +35,7 @@ export interface Conversation {
     messages: Message[]
     createdAt: string
     updatedAt: string
+    historyCursor?: string | null  // `before` cursor of the next older history page; null once all are loaded
 }
 
 export interface ChatHistoryItem {
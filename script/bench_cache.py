@@ -0,0 +1,88 @@
+import sys
+import time
+import argparse
+import threading
+from pathlib import Path
+
+import numpy as np
+
+# Add the 'backend' directory to sys.path so Python can find 'app'
+root_path = Path(__file__).resolve().parent.parent
+backend_path = root_path / "backend"
+
+if str(backend_path) not in sys.path:
+    sys.path.insert(0, str(backend_path))
+
+from app.rag.qa_cache import SemanticIndex
+from bench_vectorstore import synthetic_corpus
+from app.utils.cache import LRUCache
+
+
+def bench_semantic_lookup(sizes, dim: int, queries: int) -> None:
+    """Median latency of a nearest-question lookup in the semantic cache index, and how often it finds the exact nearest."""
+    rng = np.random.default_rng(0)
+    print(f"{'entries':>10} {'cells':>8} {'us/lookup':>10} {'recall@1':>10}")
+    for size in sizes:
+        index = SemanticIndex()
+        vectors, probes = synthetic_corpus(size, dim, queries, rng)
+        for i, vector in enumerate(vectors):
+            index.add(f"question {i}", vector)
+        truth = np.argmax(probes @ vectors.T, axis=1)
+        timings, found = [], 0
+        for probe, expected in zip(probes, truth):
+            start = time.perf_counter()
+            key, _ = index.nearest(probe)
+            timings.append(time.perf_counter() - start)
+            found += key == f"question {expected}"
+        print(f"{size:>10} {index.cells:>8} {np.median(timings) * 1e6:>10.1f} {found / queries:>10.2%}")
+
+
+def bench_lru_contention(thread_counts, ops_per_thread: int, keyspace: int, capacity: int) -> None:
+    """Aggregate get/put throughput of the bounded TTL+LRU cache with N threads hammering it."""
+    print(f"{'threads':>10} {'ops/sec':>12} {'hit rate':>10}")
+    for threads in thread_counts:
+        cache = LRUCache(max_entries=capacity, ttl=3600)
+        rng = np.random.default_rng(threads)
+        # Zipf-like key popularity, 80% reads / 20% writes
+        keys = [f"question {k % keyspace}" for k in rng.zipf(1.2, size=ops_per_thread * threads)]
+        is_read = rng.random(ops_per_thread * threads) < 0.8
+        barrier = threading.Barrier(threads + 1)
+
+        def worker(offset: int):
+            barrier.wait()
+            for i in range(offset, offset + ops_per_thread):
+                if is_read[i]:
+                    cache.get(keys[i])
+                else:
+                    cache.put(keys[i], "answer")
+
+        pool = [threading.Thread(target=worker, args=(t * ops_per_thread,)) for t in range(threads)]
+        for thread in pool:
+            thread.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        stats = cache.stats()
+        print(f"{threads:>10} {threads * ops_per_thread / elapsed:>12,.0f} {stats['hit_rate']:>10.2%}")
+
+
+def main():
+    """Micro-benchmarks for the QA cache."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated cache sizes.")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--threads", default="1,4,16", help="Comma-separated thread counts for the LRU benchmark.")
+    parser.add_argument("--ops", type=int, default=100000, help="Operations per thread in the LRU benchmark.")
+    parser.add_argument("--capacity", type=int, default=10000)
+    args = parser.parse_args()
+
+    bench_semantic_lookup([int(s) for s in args.sizes.split(",")], args.dim, args.queries)
+    print()
+    bench_lru_contention([int(t) for t in args.threads.split(",")], args.ops, 100000, args.capacity)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+from functools import partial
+from pathlib import Path
+
+# Add the 'backend' and 'tests' directories to sys.path so Python can find 'app' and 'helpers'
+root_path = Path(__file__).resolve().parent.parent
+backend_path = root_path / "backend"
+tests_path = root_path / "tests"
+
+for import_path in (backend_path, tests_path):
+    if str(import_path) not in sys.path:
+        sys.path.insert(0, str(import_path))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.cache import EmbeddingCacheEntry
+from app.rag.bulk_embed import BulkEmbedder
+from app.rag.embedding_cache import EmbeddingCache
+from app.rag.embeddings import QueryEmbeddingBatcher, get_embeddings_model
+from helpers import SimulatedEncoder
+
+
+async def run_clients(embed, clients: int, requests_per_client: int, tag: str) -> float:
+    """Queries/sec when `clients` coroutines each embed distinct queries back to back."""
+    async def client(c: int):
+        for r in range(requests_per_client):
+            await embed(f"{tag} client {c} question {r}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in range(clients)))
+    return clients * requests_per_client / (time.perf_counter() - start)
+
+
+async def bench(model, concurrency, total_requests: int) -> None:
+    print(f"{'clients':>8} {'unbatched q/s':>14} {'batched q/s':>12} {'speedup':>8} {'mean batch':>11}")
+    for clients in concurrency:
+        per_client = max(1, total_requests // clients)
+
+        # Previous behaviour: every request runs its own encode([text]) inline
+        async def unbatched(text):
+            return model._encode([text])[0]
+
+        before = await run_clients(unbatched, clients, per_client, f"u{clients}")
+
+        batcher = QueryEmbeddingBatcher(model)
+        after = await run_clients(batcher.embed, clients, per_client, f"b{clients}")
+        await batcher.close()
+
+        print(
+            f"{clients:>8} {before:>14.1f} {after:>12.1f} {after / before:>7.1f}x "
+            f"{batcher.stats()['mean_batch_size']:>11.1f}"
+        )
+
+
+def bench_bulk(args) -> None:
+    """Chunks/sec of bulk embedding: one fixed batch in one process vs. BulkEmbedder pools."""
+    if args.simulate:
+        factory = partial(SimulatedEncoder, args.call_ms, args.item_ms)
+    else:
+        factory = get_embeddings_model
+    texts = [f"chunk {i} of a medical textbook on {i % 97} topics" for i in range(args.chunks)]
+    print(f"CPU cores: {os.cpu_count()}")
+    print(f"{'workers':>8} {'batch':>6} {'chunks/s':>9} {'speedup':>8}")
+
+    # Previous behaviour of ingest_doc.py: fixed batches of 100 through a single model
+    model = factory()
+    start = time.perf_counter()
+    for i in range(0, len(texts), 100):
+        model.embed_documents(texts[i:i + 100])
+    baseline = len(texts) / (time.perf_counter() - start)
+    print(f"{'1 fixed':>8} {100:>6} {baseline:>9.0f} {1.0:>7.1f}x")
+
+    for workers in sorted({int(w) for w in args.workers.split(",")}):
+        with BulkEmbedder(model=model, model_factory=factory, workers=workers) as embedder:
+            embedder.embed(texts[:embedder.in_flight])  # start the workers and load their models
+            start = time.perf_counter()
+            embedder.embed(texts)
+            rate = len(texts) / (time.perf_counter() - start)
+            print(f"{workers:>8} {embedder.batch_size.size:>6} {rate:>9.0f} {rate / baseline:>7.1f}x")
+
+
+def bench_rebuild(args) -> None:
+    """Re-embedding after editing 2% of the chunks, with and without the cache (simulated encoder)."""
+    model = SimulatedEncoder(args.call_ms, args.item_ms)
+    texts = [f"chunk {i} of a medical textbook on {i % 97} topics" for i in range(args.chunks)]
+    edited = [f"{text} (revised)" if i % 50 == 0 else text for i, text in enumerate(texts)]  # 2% changed
+    print(f"{'strategy':>16} {'encoded':>8} {'seconds':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{directory}/cache.db")
+        EmbeddingCacheEntry.__table__.create(bind=engine)
+        cache = EmbeddingCache(model.model_name, sessionmaker(bind=engine))
+        BulkEmbedder(model=model, workers=1, cache=cache).embed(texts)  # the first build fills the cache
+
+        for label, embedder in (
+            ("no cache", BulkEmbedder(model=model, workers=1)),
+            ("embedding cache", BulkEmbedder(model=model, workers=1, cache=cache)),
+        ):
+            start = time.perf_counter()
+            embedder.embed(edited)
+            print(f"{label:>16} {embedder.rows:>8} {time.perf_counter() - start:>8.2f}")
+
+
+def main():
+    """Query-embedding throughput with and without micro-batching (--mode query), bulk embedding
+    (--mode bulk), or re-embedding after small edits with the embedding cache (--mode rebuild)."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--mode", choices=["query", "bulk", "rebuild"], default="query")
+    parser.add_argument("--concurrency", default="1,8,32,128", help="Comma-separated client counts.")
+    parser.add_argument("--requests", type=int, default=256, help="Total queries per concurrency level.")
+    parser.add_argument(
+        "--simulate", action="store_true",
+        help="Use a simulated CPU-bound encoder instead of the configured sentence-transformer.",
+    )
+    parser.add_argument("--call-ms", type=float, default=8.0, help="Simulated fixed cost per encode call.")
+    parser.add_argument("--item-ms", type=float, default=1.0, help="Simulated cost per query in a batch.")
+    parser.add_argument("--chunks", type=int, default=4000, help="Chunks embedded per run (--mode bulk).")
+    parser.add_argument("--workers", default=f"1,2,4,{os.cpu_count()}", help="Comma-separated pool sizes.")
+    args = parser.parse_args()
+
+    if args.mode == "bulk":
+        bench_bulk(args)
+        return
+    if args.mode == "rebuild":
+        bench_rebuild(args)
+        return
+
+    model = SimulatedEncoder(args.call_ms, args.item_ms) if args.simulate else get_embeddings_model()
+    print(f"Model: {type(model).__name__}")
+    asyncio.run(bench(model, [int(c) for c in args.concurrency.split(",")], args.requests))
+
+
+if __name__ == "__main__":
+    main()
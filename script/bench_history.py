@@ -0,0 +1,208 @@
+import sys
+import time
+import asyncio
+import argparse
+import threading
+import tracemalloc
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import desc, insert
+from sqlalchemy.orm import sessionmaker
+
+# Add the 'backend' directory to sys.path so Python can find 'app'
+root_path = Path(__file__).resolve().parent.parent
+backend_path = root_path / "backend"
+
+if str(backend_path) not in sys.path:
+    sys.path.insert(0, str(backend_path))
+
+from app.db.session import create_db_engine
+from app.models.history import ChatHistory
+from app.schemas.chat import ChatHistoryItem
+from app.services.history_query import decode_cursor, history_page
+from app.services.history_export import export_history
+from app.services.history_writer import HistoryWriter
+
+
+def history_engine(path: str):
+    """SQLite file configured like app/db/session.py."""
+    engine = create_db_engine(f"sqlite:///{path}")
+    ChatHistory.__table__.create(bind=engine)
+    return engine
+
+
+def history_row(client: int, request: int) -> dict:
+    return {
+        "session_id": f"session-{client}",
+        "message": f"question {request} from client {client}",
+        "response": "An answer of a few sentences. " * 8,
+        "sources": "pharm.pdf (Page 12)|cardio.pdf (Page 40)",
+        "timestamp": datetime.utcnow(),
+    }
+
+
+async def run_clients(save, clients: int, requests_per_client: int) -> float:
+    """Requests/sec when every request (otherwise a cache hit: no work) saves its history."""
+    async def client(c: int):
+        for r in range(requests_per_client):
+            await save(history_row(c, r))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in range(clients)))
+    return clients * requests_per_client / (time.perf_counter() - start)
+
+
+async def bench(concurrency, total_requests: int) -> None:
+    print(f"{'clients':>8} {'sync commit req/s':>18} {'write-behind req/s':>19} {'speedup':>8} {'mean batch':>11}")
+    for clients in concurrency:
+        per_client = max(1, total_requests // clients)
+        with tempfile.TemporaryDirectory() as directory:
+            Session = sessionmaker(bind=history_engine(f"{directory}/history.db"))
+
+            # Previous behaviour: a session, one INSERT and a commit on the event loop per request
+            async def sync_commit(row):
+                db = Session()
+                db.add(ChatHistory(**row))
+                db.commit()
+                db.close()
+
+            before = await run_clients(sync_commit, clients, per_client)
+
+            writer = HistoryWriter(Session)
+            start = time.perf_counter()
+            after = await run_clients(writer.submit, clients, per_client)
+            await writer.flush()
+            drained = clients * per_client / (time.perf_counter() - start)
+            await writer.close()
+            with Session() as db:
+                assert db.query(ChatHistory).count() == 2 * clients * per_client
+
+        print(
+            f"{clients:>8} {before:>18.0f} {after:>19.0f} {after / before:>7.1f}x "
+            f"{writer.stats()['mean_batch_size']:>11.1f}  (all committed: {drained:.0f} rows/s)"
+        )
+
+
+def to_items(rows):
+    """Response objects, built as GET /history builds them."""
+    return [
+        ChatHistoryItem(
+            id=h.id, session_id=h.session_id, message=h.message, response=h.response,
+            sources=h.sources.split("|") if h.sources else [], timestamp=h.timestamp,
+        )
+        for h in rows
+    ]
+
+
+def best_ms(fn, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def bench_pages(sizes, limit: int, repeats: int) -> None:
+    """GET /history latency by session length: whole session (previous) vs. one keyset page."""
+    print(f"{'session rows':>13} {'all rows ms':>12} {'first page ms':>14} {'middle page ms':>15}")
+    with tempfile.TemporaryDirectory() as directory:
+        Session = sessionmaker(bind=history_engine(f"{directory}/history.db"))
+        start = datetime(2026, 1, 1)
+        for size in sizes:
+            session_id = f"session-{size}"
+            with Session() as db:
+                for offset in range(0, size, 10000):
+                    rows = [history_row(0, r) for r in range(offset, min(size, offset + 10000))]
+                    for r, row in enumerate(rows, offset):
+                        row.update(session_id=session_id, timestamp=start + timedelta(seconds=r))
+                    db.execute(insert(ChatHistory), rows)
+                db.commit()
+
+                def all_rows():
+                    to_items(db.query(ChatHistory).filter(ChatHistory.session_id == session_id)
+                             .order_by(desc(ChatHistory.timestamp)).all())
+
+                middle = decode_cursor(history_page(db, session_id, size // 2)[1]) if size > 1 else None
+                full = best_ms(all_rows, max(1, repeats // 10) if size > 10000 else repeats)
+                first = best_ms(lambda: to_items(history_page(db, session_id, limit)[0]), repeats)
+                deep = best_ms(lambda: to_items(history_page(db, session_id, limit, middle)[0]), repeats)
+            print(f"{size:>13} {full:>12.2f} {first:>14.2f} {deep:>15.2f}")
+
+
+def peak_mib(fn) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def bench_export(sizes, fmt: str) -> None:
+    """Export of every row: loading them all at once vs. streaming batches, with a writer committing meanwhile."""
+    print(f"{'rows':>9} {'load-all peak MiB':>18} {'export peak MiB':>16} {'export rows/s':>14} {'max commit ms during export':>28}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            Session = sessionmaker(bind=history_engine(f"{directory}/history.db"))
+            with Session() as db:
+                for offset in range(0, size, 20000):
+                    db.execute(insert(ChatHistory), [history_row(r % 1000, r) for r in range(offset, min(size, offset + 20000))])
+                db.commit()
+
+            def load_all():
+                with Session() as db:
+                    "".join(item.model_dump_json() + "\n" for item in to_items(db.query(ChatHistory).all()))
+
+            def export():
+                for _ in export_history(fmt, Session):
+                    pass
+
+            before = peak_mib(load_all) if size <= 1000000 else float("nan")
+            after = peak_mib(export)
+
+            # Throughput, while another thread keeps committing chat history
+            stop, commits = threading.Event(), []
+
+            def writer():
+                while not stop.is_set():
+                    begin = time.perf_counter()
+                    with Session() as db:
+                        db.execute(insert(ChatHistory), [history_row(0, 0)])
+                        db.commit()
+                    commits.append(time.perf_counter() - begin)
+                    time.sleep(0.01)
+
+            thread = threading.Thread(target=writer)
+            thread.start()
+            begin = time.perf_counter()
+            export()
+            rate = size / (time.perf_counter() - begin)
+            stop.set()
+            thread.join()
+        print(f"{size:>9} {before:>18.1f} {after:>16.1f} {rate:>14,.0f} {max(commits) * 1000:>28.1f}")
+
+
+def main():
+    """Chat history benchmarks: saving (commit per request vs. write-behind), reading pages by session length, bulk export."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--mode", choices=["write-behind", "pages", "export"], default="write-behind")
+    parser.add_argument("--concurrency", default="1,8,32,128", help="write-behind: comma-separated client counts.")
+    parser.add_argument("--requests", type=int, default=2000, help="write-behind: total requests per concurrency level.")
+    parser.add_argument("--sizes", help="pages: session lengths (default 100,1000,10000,100000); export: table sizes (default 100000,1000000).")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson", help="export: output format.")
+    parser.add_argument("--limit", type=int, default=50, help="pages: page size.")
+    parser.add_argument("--repeats", type=int, default=20, help="pages: best of this many reads.")
+    args = parser.parse_args()
+    if args.mode == "pages":
+        bench_pages([int(s) for s in (args.sizes or "100,1000,10000,100000").split(",")], args.limit, args.repeats)
+    elif args.mode == "export":
+        bench_export([int(s) for s in (args.sizes or "100000,1000000").split(",")], args.format)
+    else:
+        asyncio.run(bench([int(c) for c in args.concurrency.split(",")], args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+
+import numpy as np
+
+# Add the 'backend' and 'tests' directories to sys.path so Python can find 'app' and 'helpers'
+root_path = Path(__file__).resolve().parent.parent
+backend_path = root_path / "backend"
+tests_path = root_path / "tests"
+
+for import_path in (backend_path, tests_path):
+    if str(import_path) not in sys.path:
+        sys.path.insert(0, str(import_path))
+
+from app.core.config import settings
+from app.rag.page_cache import PageTextCache
+from app.rag.pdf_extract import parse_pdfs
+from app.rag.pipeline import IngestionPipeline
+from app.rag.vectorstore import SimpleDocument, SimpleVectorStore
+from helpers import write_text_pdf
+
+WORDS = (
+    "patient presents with acute abdominal pain fever and elevated white cell count "
+    "differential diagnosis includes appendicitis cholecystitis and pancreatitis imaging "
+    "confirms inflammation management consists of fluids analgesia antibiotics and surgery"
+).split()
+
+
+def generate_library(directory: str, files: int, pages: int, lines: int = 60):
+    paths = []
+    for n in range(files):
+        body = [
+            [" ".join(WORDS[(n + p + l + i) % len(WORDS)] for i in range(12)) for l in range(lines)]
+            for p in range(pages)
+        ]
+        path = os.path.join(directory, f"textbook_{n:03d}.pdf")
+        write_text_pdf(path, body)
+        paths.append(path)
+    return paths
+
+
+class RandomEmbeddings:
+    """Embedding model stand-in, so the benchmark measures the pipeline rather than a transformer."""
+
+    def embed_documents(self, texts) -> np.ndarray:
+        return np.random.default_rng(len(texts)).standard_normal((len(texts), 384), dtype=np.float32)
+
+    def embed_query(self, text) -> np.ndarray:
+        return self.embed_documents([text])[0]
+
+
+def split_text(text: str, size: int = 700, overlap: int = 120):
+    return [text[start:start + size] for start in range(0, max(len(text) - overlap, 1), size - overlap)]
+
+
+def load_pages(paths):
+    for path, pages in parse_pdfs(paths, workers=1):
+        yield path, [SimpleDocument(text, {"page": page}) for page, text in pages]
+
+
+def split_pages(path, pages):
+    for page in pages:
+        for piece in split_text(page.page_content):
+            yield SimpleDocument(piece, dict(page.metadata))
+
+
+class AnonMemorySampler(threading.Thread):
+    """
+    Peak anonymous (heap) RSS, sampled from /proc. ru_maxrss also counts memory-mapped index
+    pages, which the kernel can drop at any time.
+    """
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.peak_kib = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(0.02):
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("RssAnon:"):
+                        self.peak_kib = max(self.peak_kib, int(line.split()[1]))
+
+
+def run_strategy(strategy: str, paths, index_dir: str) -> dict:
+    """Ingest paths into a fresh index; runs in its own process so memory peaks are per strategy."""
+    sampler = AnonMemorySampler()
+    sampler.start()
+    store = SimpleVectorStore(index_dir=index_dir, embeddings_model=RandomEmbeddings())
+    start = time.perf_counter()
+    result = {"strategy": strategy}
+    if strategy == "materialize":
+        # Previous behaviour: every page, then every chunk, in lists before embedding anything
+        pages = [page for _, file_pages in load_pages(paths) for page in file_pages]
+        chunks = [chunk for chunk in split_pages(None, pages)]
+        store.add_documents(chunks)
+        result["chunks"] = len(chunks)
+    else:
+        pipeline = IngestionPipeline(store, load_pages, split_pages)
+        result["chunks"] = sum(r.chunks for r in pipeline.run(paths))
+        result["stages"] = pipeline.stats()
+    store.wait_for_compaction()
+    result["seconds"] = time.perf_counter() - start
+    sampler.stopped.set()
+    sampler.join()
+    result["peak_rss_mib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    result["peak_anon_mib"] = sampler.peak_kib / 1024
+    return result
+
+
+def bench_pipeline(args) -> None:
+    """Peak RSS and throughput of the streaming pipeline vs. materializing the whole library."""
+    print(f"{'files':>6} {'pages':>7} {'strategy':>12} {'chunks':>8} {'seconds':>8} {'RSS MiB':>8} {'anon MiB':>9}")
+    for files in (int(f) for f in args.library_sizes.split(",")):
+        with tempfile.TemporaryDirectory() as directory:
+            generate_library(directory, files, args.pages)
+            for strategy in ("materialize", "pipeline"):
+                output = subprocess.run(
+                    [sys.executable, __file__, "--mode", "run", "--strategy", strategy, "--library", directory],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                print(
+                    f"{files:>6} {files * args.pages:>7} {strategy:>12} {result['chunks']:>8} "
+                    f"{result['seconds']:>8.1f} {result['peak_rss_mib']:>8.0f} {result['peak_anon_mib']:>9.0f}"
+                )
+                for stage, stats in result.get("stages", {}).items():
+                    print(f"{'':>6} {'':>7} {stage:>12} {stats['items']:>8} {stats['seconds']:>8.1f} "
+                          f"{stats['per_second']:>8.0f}/s")
+
+
+def bench_page_cache(args) -> None:
+    """Pages/sec of parsing PDFs vs. reading their text back from the page text cache."""
+    workers = int(args.workers.split(",")[-1])
+    with tempfile.TemporaryDirectory() as directory:
+        paths = generate_library(directory, args.files, args.pages)
+        pdf_mib = sum(os.path.getsize(path) for path in paths) / 2**20
+        cache = PageTextCache(os.path.join(directory, "page_text"))
+        total_pages = args.files * args.pages
+        print(f"{args.files} PDFs, {total_pages} pages, {pdf_mib:.1f} MiB, {workers} workers")
+        print(f"{'run':>24} {'seconds':>8} {'pages/s':>9}")
+        for label in ("parse + fill cache", "from cache"):
+            start = time.perf_counter()
+            pages = sum(len(result) for _, result in parse_pdfs(paths, workers, args.pages_per_task, cache=cache))
+            elapsed = time.perf_counter() - start
+            assert pages == total_pages
+            print(f"{label:>24} {elapsed:>8.2f} {total_pages / elapsed:>9.0f}")
+        cache_mib = sum(entry.stat().st_size for entry in os.scandir(cache.directory)) / 2**20
+        print(f"Cache size: {cache_mib:.2f} MiB ({pdf_mib / cache_mib:.0f}x smaller than the PDFs)")
+
+
+def main():
+    """PDF extraction scaling (--mode extract), page text cache (--mode page-cache) or streaming ingestion memory (--mode pipeline)."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--mode", choices=["extract", "page-cache", "pipeline", "run"], default="extract")
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=150, help="Pages per generated PDF.")
+    parser.add_argument("--workers", default=f"1,2,4,{os.cpu_count()}", help="Comma-separated pool sizes.")
+    parser.add_argument("--pages-per-task", type=int, default=64)
+    parser.add_argument("--library-sizes", default="10,40", help="Comma-separated file counts (--mode pipeline).")
+    parser.add_argument("--strategy", default="pipeline", help=argparse.SUPPRESS)
+    parser.add_argument("--library", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode == "run":
+        settings.VECTOR_COMPACTION_BACKGROUND = False
+        paths = sorted(str(p) for p in Path(args.library).glob("*.pdf"))
+        with tempfile.TemporaryDirectory() as index_dir:
+            print(json.dumps(run_strategy(args.strategy, paths, index_dir)))
+        return
+    if args.mode == "pipeline":
+        bench_pipeline(args)
+        return
+    if args.mode == "page-cache":
+        bench_page_cache(args)
+        return
+
+    print(f"CPU cores: {os.cpu_count()}")
+    with tempfile.TemporaryDirectory() as directory:
+        paths = generate_library(directory, args.files, args.pages)
+        total_pages = args.files * args.pages
+        print(f"{'workers':>8} {'seconds':>8} {'pages/s':>8} {'speedup':>8}")
+        baseline = None
+        for workers in sorted({int(w) for w in args.workers.split(",")}):
+            start = time.perf_counter()
+            pages = sum(len(result) for _, result in parse_pdfs(paths, workers, args.pages_per_task))
+            elapsed = time.perf_counter() - start
+            assert pages == total_pages
+            baseline = baseline or elapsed
+            print(f"{workers:>8} {elapsed:>8.2f} {total_pages / elapsed:>8.0f} {baseline / elapsed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
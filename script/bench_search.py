@@ -0,0 +1,128 @@
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import insert, text
+from sqlalchemy.orm import sessionmaker
+
+# Add the 'backend' directory to sys.path so Python can find 'app'
+root_path = Path(__file__).resolve().parent.parent
+backend_path = root_path / "backend"
+
+if str(backend_path) not in sys.path:
+    sys.path.insert(0, str(backend_path))
+
+from app.db.session import create_db_engine
+from app.models.history import ChatHistory
+from app.services.history_search import ensure_history_fts, search_history
+
+# Filler vocabulary, drawn with a Zipf-like skew; the drug names below appear at known rates
+VOCABULARY = [f"word{i}" for i in range(5000)]
+WEIGHTS = [1 / (i + 1) for i in range(len(VOCABULARY))]
+DRUGS = {"metformin": 0.001, "lisinopril": 0.01, "ibuprofen": 0.1}
+
+
+def history_rows(rng: random.Random, start: int, count: int, sessions: int):
+    rows = []
+    for i in range(start, start + count):
+        message = rng.choices(VOCABULARY, WEIGHTS, k=12)
+        response = rng.choices(VOCABULARY, WEIGHTS, k=40)
+        for drug, rate in DRUGS.items():
+            if rng.random() < rate:
+                (message if rng.random() < 0.5 else response).insert(rng.randrange(10), drug)
+        rows.append({
+            "session_id": f"session-{i % sessions}",
+            "message": " ".join(message),
+            "response": " ".join(response),
+            "sources": "pharm.pdf (Page 12)",
+            "timestamp": datetime(2026, 1, 1) + timedelta(seconds=i),
+        })
+    return rows
+
+
+def best_ms(fn, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def insert_rate(Session, rng, start: int, count: int, sessions: int) -> float:
+    rows = history_rows(rng, start, count, sessions)
+    begin = time.perf_counter()
+    with Session() as db:
+        for offset in range(0, count, 256):  # write-behind sized batches
+            db.execute(insert(ChatHistory), rows[offset:offset + 256])
+            db.commit()
+    return count / (time.perf_counter() - begin)
+
+
+def main():
+    """GET /search latency with the FTS5 index vs. a LIKE scan of chat_history, and the index's write cost."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--sessions", type=int, default=20000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_db_engine(f"sqlite:///{directory}/history.db")
+        ChatHistory.__table__.create(bind=engine)
+        Session = sessionmaker(bind=engine)
+
+        for offset in range(0, args.rows, 50000):
+            with Session() as db:
+                db.execute(insert(ChatHistory), history_rows(rng, offset, min(50000, args.rows - offset), args.sessions))
+                db.commit()
+        plain = insert_rate(Session, rng, args.rows, 20000, args.sessions)
+
+        begin = time.perf_counter()
+        ensure_history_fts(engine)
+        built = time.perf_counter() - begin
+        indexed = insert_rate(Session, rng, args.rows + 20000, 20000, args.sessions)
+        with engine.connect() as conn:
+            pages = conn.execute(text("SELECT SUM(pgsize) FROM dbstat WHERE name LIKE 'chat_history_fts%'")).scalar()
+        total = args.rows + 40000
+        print(f"{total:,} rows: index built in {built:.1f}s, {pages / 2**20:.0f} MiB; "
+              f"inserts {plain:,.0f} rows/s without / {indexed:,.0f} rows/s with the sync triggers")
+
+        # "All conversations mentioning X" needs every match, which LIKE finds only by reading the
+        # whole table; LIKE's newest 50 can stop early on common words but is not ranked
+        print(f"{'query':>28} {'matches':>8} {'LIKE all ms':>12} {'LIKE newest 50 ms':>18} {'FTS5 ranked page ms':>20}")
+        queries = [("metformin", None), ("lisinopril", None), ("ibuprofen", None), ("ibuprofen lisinopril", None), ("ibuprofen", "session-7")]
+        with Session() as db:
+            for query, session_id in queries:
+                terms = query.split()
+                like = " AND ".join(f"(message LIKE :t{i} OR response LIKE :t{i})" for i in range(len(terms)))
+                params = {f"t{i}": f"%{term}%" for i, term in enumerate(terms)}
+                if session_id:
+                    like += " AND session_id = :session_id"
+                    params["session_id"] = session_id
+                count = db.execute(text(f"SELECT COUNT(*) FROM chat_history WHERE {like}"), params).scalar()
+
+                def scan_all():
+                    db.execute(text(f"SELECT id FROM chat_history WHERE {like}"), params).all()
+
+                def scan_newest():
+                    db.execute(text(f"SELECT * FROM chat_history WHERE {like} ORDER BY timestamp DESC LIMIT {args.limit}"), params).all()
+
+                def fts():
+                    search_history(db, query, args.limit, session_id=session_id)
+
+                label = query + (f" in {session_id}" if session_id else "")
+                print(
+                    f"{label:>28} {count:>8} {best_ms(scan_all, args.repeats):>12.1f} "
+                    f"{best_ms(scan_newest, args.repeats):>18.1f} {best_ms(fts, args.repeats):>20.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+# Add the 'backend' directory to sys.path so Python can find 'app'
+root_path = Path(__file__).resolve().parent.parent
+backend_path = root_path / "backend"
+
+if str(backend_path) not in sys.path:
+    sys.path.insert(0, str(backend_path))
+
+from app.core.config import settings
+from app.rag.splitter import TextSplitter
+
+WORDS = (
+    "patient presents with acute abdominal pain fever and elevated white cell count differential "
+    "diagnosis includes appendicitis cholecystitis and pancreatitis imaging confirms inflammation "
+    "management consists of intravenous fluids analgesia broad spectrum antibiotics and surgery"
+).split()
+
+
+def textbook_page(rng: random.Random, chars: int) -> str:
+    """PDF-like page text: short extracted lines, sentences across lines, a few blank-line paragraphs."""
+    lines, size = [], 0
+    while size < chars:
+        line = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 14)))
+        if rng.random() < 0.3:
+            line += "."
+        if rng.random() < 0.08:
+            line += "\n"
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines)
+
+
+def chars_per_second(split, pages, repeats: int) -> float:
+    """Best of `repeats` passes over every page."""
+    total = sum(len(page) for page in pages)
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for page in pages:
+            split(page)
+        best = min(best, time.perf_counter() - start)
+    return total / best
+
+
+def main():
+    """Chars/sec of the app's TextSplitter vs langchain's RecursiveCharacterTextSplitter, and prompt size."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--page-chars", type=int, default=3000, help="Characters per generated page.")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    pages = [textbook_page(rng, args.page_chars) for _ in range(args.pages)]
+    total = sum(len(page) for page in pages)
+    print(f"{args.pages} pages, {total / 2**20:.1f} MiB of text, chunk {settings.CHUNK_SIZE} / overlap {settings.CHUNK_OVERLAP}")
+    print(f"{'splitter':>24} {'chars/s':>12} {'chunks':>8} {'mean chars':>11}")
+
+    splitters = {"app TextSplitter": TextSplitter().split_text}
+    try:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        splitters["langchain recursive"] = RecursiveCharacterTextSplitter(
+            chunk_size=settings.CHUNK_SIZE,
+            chunk_overlap=settings.CHUNK_OVERLAP,
+            separators=["\n\n", "\n", ".", " ", ""],  # as script/ingest_doc.py configured it
+        ).split_text
+    except ImportError:
+        print(f"{'langchain recursive':>24} {'(langchain-text-splitters not installed)':>32}")
+
+    rates = {}
+    for name, split in splitters.items():
+        rates[name] = chars_per_second(split, pages, args.repeats)
+        chunks = [chunk for page in pages for chunk in split(page)]
+        print(f"{name:>24} {rates[name]:>12,.0f} {len(chunks):>8} {sum(map(len, chunks)) / len(chunks):>11.0f}")
+    if len(rates) == 2:
+        print(f"{'speedup':>24} {rates['app TextSplitter'] / rates['langchain recursive']:>11.1f}x")
+
+    # Context the LLM receives for TOP_K retrieved documents: whole pages vs chunks
+    print(
+        f"Prompt context for TOP_K={settings.TOP_K}: whole pages ~{settings.TOP_K * total / len(pages):,.0f} chars, "
+        f"chunks ~{settings.TOP_K * settings.CHUNK_SIZE:,} chars at most"
+    )
+
+
+if __name__ == "__main__":
+    main()
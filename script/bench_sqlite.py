@@ -0,0 +1,160 @@
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import create_engine, desc, event, insert
+from sqlalchemy.orm import sessionmaker
+
+# Add the 'backend' directory to sys.path so Python can find 'app'
+root_path = Path(__file__).resolve().parent.parent
+backend_path = root_path / "backend"
+
+if str(backend_path) not in sys.path:
+    sys.path.insert(0, str(backend_path))
+
+from app.db.session import create_db_engine
+from app.models.history import ChatHistory
+
+
+def bare_engine(url: str):
+    """The engine before any tuning: rollback journal, synchronous=FULL, default pool."""
+    return create_engine(url, connect_args={"check_same_thread": False})
+
+
+def wal_only_engine(url: str):
+    """The previous app/db/session.py: WAL and nothing else."""
+    engine = bare_engine(url)
+
+    @event.listens_for(engine, "connect")
+    def _enable_wal(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.close()
+
+    return engine
+
+
+PROFILES = {
+    "bare (rollback journal)": bare_engine,
+    "WAL only (previous)": wal_only_engine,
+    "tuned profile": create_db_engine,
+}
+
+
+def history_row(session: int, n: int) -> dict:
+    return {
+        "session_id": f"session-{session}",
+        "message": f"question {n}",
+        "response": "An answer of a few sentences. " * 8,
+        "sources": "pharm.pdf (Page 12)|cardio.pdf (Page 40)",
+        "timestamp": datetime.utcnow(),
+    }
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float("nan")
+
+
+def run(make_engine, path: str, sessions: int, rows: int, readers: int, writers: int, write_rate: float, seconds: float) -> dict:
+    engine = make_engine(f"sqlite:///{path}")
+    ChatHistory.__table__.create(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.execute(insert(ChatHistory), [history_row(i % sessions, i) for i in range(rows)])
+        db.commit()
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    latencies, counts = [], {"reads": 0, "writes": 0, "errors": 0}
+
+    def reader(seed: int):
+        rng, mine = random.Random(seed), []
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                with Session() as db:
+                    # What GET /history/{session_id} runs
+                    db.query(ChatHistory).filter(
+                        ChatHistory.session_id == f"session-{rng.randrange(sessions)}"
+                    ).order_by(desc(ChatHistory.timestamp)).all()
+            except Exception:
+                with lock:
+                    counts["errors"] += 1
+                continue
+            mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+            counts["reads"] += len(mine)
+
+    def writer(seed: int):
+        rng, written = random.Random(seed), 0
+        interval = writers / write_rate if write_rate else 0.0
+        due = time.perf_counter()
+        while not stop.is_set():
+            # Same offered write load for every profile; a profile that cannot keep up falls behind
+            due += interval
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            # One committed row per answered query, as with HISTORY_WRITE_BEHIND off
+            try:
+                with Session() as db:
+                    db.add(ChatHistory(**history_row(rng.randrange(sessions), written)))
+                    db.commit()
+                written += 1
+            except Exception:
+                with lock:
+                    counts["errors"] += 1
+        with lock:
+            counts["writes"] += written
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=(1000 + i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+
+    return {
+        "reads_per_s": counts["reads"] / seconds,
+        "writes_per_s": counts["writes"] / seconds,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "errors": counts["errors"],
+    }
+
+
+def main():
+    """History reads (GET /history) while other threads commit history rows, per SQLite connection profile."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--rows", type=int, default=50000, help="History rows present before the run.")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--write-rate", type=float, default=200.0, help="Offered history commits/sec over all writers; 0 = as fast as possible.")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each run.")
+    args = parser.parse_args()
+
+    offered = f"{args.write_rate:.0f} commits/s offered" if args.write_rate else "unthrottled"
+    print(f"{args.readers} reader / {args.writers} writer threads ({offered}), {args.rows} rows in {args.sessions} sessions, {args.seconds:.0f}s per profile")
+    print(f"{'profile':>24} {'reads/s':>9} {'read p50 ms':>12} {'read p99 ms':>12} {'writes/s':>9} {'errors':>7}")
+    for name, make_engine in PROFILES.items():
+        with tempfile.TemporaryDirectory() as directory:
+            result = run(make_engine, f"{directory}/history.db", args.sessions, args.rows, args.readers, args.writers, args.write_rate, args.seconds)
+        print(
+            f"{name:>24} {result['reads_per_s']:>9.0f} {result['p50_ms']:>12.2f} {result['p99_ms']:>12.2f} "
+            f"{result['writes_per_s']:>9.0f} {result['errors']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
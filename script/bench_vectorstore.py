@@ -0,0 +1,238 @@
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# Add the 'backend' directory to sys.path so Python can find 'app'
+root_path = Path(__file__).resolve().parent.parent
+backend_path = root_path / "backend"
+
+if str(backend_path) not in sys.path:
+    sys.path.insert(0, str(backend_path))
+
+from app.core.config import settings
+from app.rag.vectorstore import (
+    IVFIndex, ScalarQuantizer, SimpleDocument, SimpleVectorStore,
+    hamming_distances, normalize_rows, pack_signs, rerank_exact, top_k_indices,
+)
+
+
+def legacy_search(embeddings: np.ndarray, query: np.ndarray, k: int) -> np.ndarray:
+    """The original similarity_search: per-query norms over the whole matrix and a full argsort."""
+    query_norm = np.linalg.norm(query) + 1e-10
+    doc_norms = np.linalg.norm(embeddings, axis=1) + 1e-10
+    similarities = np.dot(embeddings, query) / (doc_norms * query_norm)
+    return np.argsort(similarities)[-k:][::-1]
+
+
+def exact_search(normalized: np.ndarray, query: np.ndarray, k: int) -> np.ndarray:
+    """Current path: one matvec against pre-normalized rows, argpartition for the top-k."""
+    return top_k_indices(normalized @ normalize_rows(query), k)
+
+
+def synthetic_corpus(size: int, dim: int, queries: int, rng, topics: int = 2000):
+    """
+    Clustered embeddings: chunks of real textbooks group around topics, which is the structure
+    ANN indexes rely on. Queries are perturbed copies of random chunks.
+    """
+    centers = rng.standard_normal((topics, dim), dtype=np.float32)
+    embeddings = np.empty((size, dim), dtype=np.float32)
+    for start in range(0, size, 100000):
+        block = min(100000, size - start)
+        embeddings[start:start + block] = (
+            centers[rng.integers(0, topics, block)] + 0.6 * rng.standard_normal((block, dim), dtype=np.float32)
+        )
+    embeddings = normalize_rows(embeddings)
+    probes = embeddings[rng.integers(0, size, queries)] + 0.05 * rng.standard_normal((queries, dim), dtype=np.float32)
+    return embeddings, normalize_rows(probes)
+
+
+def recall_at_k(normalized: np.ndarray, queries: np.ndarray, search, k: int) -> float:
+    """Mean fraction of the exact top-k that the approximate search also returns."""
+    found = 0
+    for q in queries:
+        found += len(set(exact_search(normalized, q, k)) & set(search(q)))
+    return found / (k * len(queries))
+
+
+def time_per_query(search, queries: np.ndarray, repeats: int) -> float:
+    """Median wall-clock milliseconds per query."""
+    timings = []
+    for _ in range(repeats):
+        for q in queries:
+            start = time.perf_counter()
+            search(q)
+            timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+
+def bench_ivf(args, rng) -> None:
+    """Recall@k vs latency of the IVF index against exact search, for several nprobe values."""
+    nprobes = [int(p) for p in args.nprobe.split(",")]
+    print(f"{'chunks':>10} {'nlist':>6} {'nprobe':>7} {'recall@k':>9} {'ms/query':>9}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        normalized, queries = synthetic_corpus(size, args.dim, args.queries, rng)
+        exact_ms = time_per_query(lambda q: exact_search(normalized, q, args.k), queries, args.repeats)
+        print(f"{size:>10} {'-':>6} {'exact':>7} {1.0:>9.3f} {exact_ms:>9.2f}")
+
+        nlist = args.nlist or int(np.sqrt(size))
+        start = time.perf_counter()
+        ivf = IVFIndex.train(normalized, nlist)
+        print(f"{'':>10} trained {nlist} lists in {time.perf_counter() - start:.1f}s")
+        for nprobe in nprobes:
+            search = lambda q: ivf.search(normalized, q, args.k, nprobe)
+            recall = recall_at_k(normalized, queries, search, args.k)
+            ms = time_per_query(search, queries, args.repeats)
+            print(f"{size:>10} {nlist:>6} {nprobe:>7} {recall:>9.3f} {ms:>9.2f}  ({exact_ms / ms:.1f}x)")
+        del normalized, ivf
+
+
+def bench_int8(args, rng) -> None:
+    """Memory, latency and recall@k of int8 candidate scoring + exact float rerank."""
+    print(f"{'chunks':>10} {'strategy':>14} {'MiB':>8} {'recall@k':>9} {'ms/query':>9}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        normalized, queries = synthetic_corpus(size, args.dim, args.queries, rng)
+        exact_ms = time_per_query(lambda q: exact_search(normalized, q, args.k), queries, args.repeats)
+        print(f"{size:>10} {'exact float32':>14} {normalized.nbytes / 2**20:>8.1f} {1.0:>9.3f} {exact_ms:>9.2f}")
+
+        quantizer = ScalarQuantizer.fit(normalized)
+        codes = quantizer.encode(normalized)
+        for candidates in (int(c) for c in args.candidates.split(",")):
+            def search(q):
+                approx = top_k_indices(quantizer.scores(codes, q), max(args.k, candidates))
+                return rerank_exact(normalized, approx, q, args.k)
+
+            recall = recall_at_k(normalized, queries, search, args.k)
+            ms = time_per_query(search, queries, args.repeats)
+            label = f"int8+rerank{candidates}"
+            print(
+                f"{size:>10} {label:>14} {codes.nbytes / 2**20:>8.1f} {recall:>9.3f} {ms:>9.2f}"
+                f"  ({exact_ms / ms:.1f}x, {normalized.nbytes / codes.nbytes:.0f}x less resident)"
+            )
+        del normalized, codes
+
+
+def bench_binary(args, rng) -> None:
+    """Memory, latency and recall@k of the Hamming prefilter + exact float rerank."""
+    print(f"{'chunks':>10} {'strategy':>16} {'MiB':>8} {'recall@k':>9} {'ms/query':>9}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        normalized, queries = synthetic_corpus(size, args.dim, args.queries, rng)
+        exact_ms = time_per_query(lambda q: exact_search(normalized, q, args.k), queries, args.repeats)
+        print(f"{size:>10} {'exact float32':>16} {normalized.nbytes / 2**20:>8.1f} {1.0:>9.3f} {exact_ms:>9.2f}")
+
+        bits = pack_signs(normalized)
+        for candidates in (int(c) for c in args.binary_candidates.split(",")):
+            def search(q):
+                distances = hamming_distances(bits, pack_signs(q)).astype(np.int32)
+                return rerank_exact(normalized, top_k_indices(-distances, max(args.k, candidates)), q, args.k)
+
+            recall = recall_at_k(normalized, queries, search, args.k)
+            ms = time_per_query(search, queries, args.repeats)
+            label = f"binary+rerank{candidates}"
+            print(
+                f"{size:>10} {label:>16} {bits.nbytes / 2**20:>8.1f} {recall:>9.3f} {ms:>9.2f}"
+                f"  ({exact_ms / ms:.1f}x, {normalized.nbytes / bits.nbytes:.0f}x less resident)"
+            )
+        del normalized, bits
+
+
+class RandomEmbeddings:
+    """Embedding model stand-in: random vectors, so only index I/O is measured."""
+
+    def __init__(self, dim: int, rng):
+        self.dim = dim
+        self.rng = rng
+
+    def embed_documents(self, texts) -> np.ndarray:
+        return self.rng.standard_normal((len(texts), self.dim), dtype=np.float32)
+
+    def embed_query(self, text) -> np.ndarray:
+        return self.embed_documents([text])[0]
+
+
+def bench_append(args, rng) -> None:
+    """Cost of appending a few chunks: whole-matrix rewrite vs. a new index segment."""
+    settings.VECTOR_COMPACTION_MAX_SEGMENTS = 1 << 30  # measure appends only
+    print(f"{'chunks':>10} {'strategy':>16} {'MiB written':>12} {'ms/append':>10}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as index_dir:
+            model = RandomEmbeddings(args.dim, rng)
+            store = SimpleVectorStore(index_dir=index_dir, embeddings_model=model)
+            for start in range(0, size, 100000):
+                count = min(100000, size - start)
+                store.add_documents([SimpleDocument(f"chunk {start + i}", {"page": start + i}) for i in range(count)])
+            existing = np.concatenate([np.asarray(segment.embeddings) for segment in store.segments])
+
+            # Previous behaviour: np.vstack copy of the full matrix, then rewrite it
+            timings = []
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                grown = np.vstack([existing, normalize_rows(model.embed_documents(["x"] * args.append))])
+                with open(f"{index_dir}/rewrite.npy", "wb") as f:
+                    np.save(f, grown)
+                timings.append(time.perf_counter() - start)
+            print(f"{size:>10} {'full rewrite':>16} {grown.nbytes / 2**20:>12.1f} {np.median(timings) * 1000:>10.1f}")
+            del grown, existing
+
+            timings = []
+            for r in range(args.repeats):
+                docs = [SimpleDocument(f"new chunk {r} {i}", {"page": -1}) for i in range(args.append)]
+                start = time.perf_counter()
+                store.add_documents(docs)
+                timings.append(time.perf_counter() - start)
+            new_bytes = store.segments[-1].embeddings.nbytes + store.segments[-1].documents.nbytes
+            print(f"{size:>10} {'new segment':>16} {new_bytes / 2**20:>12.3f} {np.median(timings) * 1000:>10.1f}")
+
+
+def main():
+    """Per-query latency of vector store search strategies on synthetic embeddings."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--mode", choices=["exact", "ivf", "int8", "binary", "append"], default="exact",
+                        help="exact: legacy vs normalized brute force; ivf / int8 / binary: recall and latency "
+                             "of the approximate modes against exact search; append: cost of adding chunks.")
+    parser.add_argument("--sizes", default="100000,1000000", help="Comma-separated chunk counts.")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimension (all-MiniLM-L6-v2 is 384).")
+    parser.add_argument("--k", type=int, default=7)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--nlist", type=int, default=0, help="IVF lists; 0 = sqrt(chunks).")
+    parser.add_argument("--nprobe", default="1,4,8,16,32", help="Comma-separated IVF nprobe values.")
+    parser.add_argument("--candidates", default="16,48,128", help="Comma-separated int8 rerank depths.")
+    parser.add_argument("--binary-candidates", default="50,200,1000", help="Comma-separated binary rerank depths.")
+    parser.add_argument("--append", type=int, default=10, help="Chunks added per append in --mode append.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.mode == "ivf":
+        bench_ivf(args, rng)
+        return
+    if args.mode == "int8":
+        bench_int8(args, rng)
+        return
+    if args.mode == "binary":
+        bench_binary(args, rng)
+        return
+    if args.mode == "append":
+        bench_append(args, rng)
+        return
+
+    print(f"{'chunks':>10} {'strategy':>10} {'ms/query':>10}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        embeddings = rng.standard_normal((size, args.dim), dtype=np.float32)
+        queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+
+        legacy_ms = time_per_query(lambda q: legacy_search(embeddings, q, args.k), queries, args.repeats)
+        print(f"{size:>10} {'legacy':>10} {legacy_ms:>10.2f}")
+
+        normalized = normalize_rows(embeddings)
+        del embeddings
+        exact_ms = time_per_query(lambda q: exact_search(normalized, q, args.k), queries, args.repeats)
+        print(f"{size:>10} {'exact':>10} {exact_ms:>10.2f}  ({legacy_ms / exact_ms:.1f}x)")
+        del normalized
+
+
+if __name__ == "__main__":
+    main()
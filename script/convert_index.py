@@ -0,0 +1,36 @@
+import sys
+import argparse
+from pathlib import Path
+
+# Add the 'backend' directory to sys.path so Python can find 'app'
+root_path = Path(__file__).resolve().parent.parent
+backend_path = root_path / "backend"
+
+if str(backend_path) not in sys.path:
+    sys.path.insert(0, str(backend_path))
+
+from app.core.config import settings
+from app.rag.vectorstore import LEGACY_INDEX_FILE, convert_json_index
+
+
+def main():
+    """Convert a legacy simple_index.json into the memory-mapped binary index format."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "--index-dir",
+        default=settings.VECTOR_STORE_PATH,
+        help="Directory holding simple_index.json; the binary index is written next to it.",
+    )
+    args = parser.parse_args()
+
+    json_path = Path(args.index_dir) / LEGACY_INDEX_FILE
+    if not json_path.exists():
+        print(f"No legacy index found at {json_path}")
+        sys.exit(1)
+
+    count = convert_json_index(str(json_path), args.index_dir)
+    print(f"Converted {count} documents. {json_path.name} can now be removed.")
+
+
+if __name__ == "__main__":
+    main()
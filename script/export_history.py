@@ -0,0 +1,46 @@
+import sys
+import time
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+# Add the 'backend' directory to sys.path so Python can find 'app'
+root_path = Path(__file__).resolve().parent.parent
+backend_path = root_path / "backend"
+
+if str(backend_path) not in sys.path:
+    sys.path.insert(0, str(backend_path))
+
+from app.services.history_export import MEDIA_TYPES, export_history
+from app.utils.logger import get_logger
+
+logger = get_logger("export_history")
+
+
+def main():
+    """Export chat history from DATABASE_URL as NDJSON or CSV (same output as GET /api/v1/chat/export)."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--format", choices=sorted(MEDIA_TYPES), default="ndjson")
+    parser.add_argument("--session", help="Only this session id.")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="Only interactions at or after this ISO time (UTC).")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="Only interactions before this ISO time (UTC); default now.")
+    parser.add_argument("--batch-size", type=int, help="Rows per read (default HISTORY_EXPORT_BATCH_SIZE).")
+    parser.add_argument("-o", "--output", help="Output file; default stdout.")
+    args = parser.parse_args()
+
+    out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    start, written = time.perf_counter(), 0
+    try:
+        for chunk in export_history(
+            args.format, session_id=args.session, since=args.since, until=args.until, batch_size=args.batch_size
+        ):
+            out.write(chunk)
+            written += len(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    logger.info(f"Exported {written / 2**20:.1f} MiB of {args.format} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
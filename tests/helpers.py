@@ -0,0 +1,60 @@
+"""
+Helpers shared by the tests and the benchmark scripts in script/.
+"""
+import time
+import zlib
+
+import numpy as np
+
+from app.rag.embeddings import CachedQueryEmbeddings
+
+
+def write_text_pdf(path: str, pages) -> None:
+    """Minimal uncompressed PDF with one Helvetica text block per page (no PDF library needed)."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", b"", b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        body = " ".join(f"({line}) '" for line in lines)
+        stream = f"BT /F1 10 Tf 50 780 Td 12 TL {body} ET".encode("latin-1")
+        kids.append(len(objects) + 1)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects) + 2} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in kids)}] /Count {len(kids)} >>".encode()
+
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+class SimulatedEncoder(CachedQueryEmbeddings):
+    """
+    CPU-bound stand-in for a sentence-transformer: a fixed per-call overhead plus a smaller
+    per-item cost, busy-waiting so calls serialize on the CPU like a real forward pass.
+    Vectors are derived from the text, so callers can check they come back in order.
+    """
+
+    model_name = "simulated"
+
+    def __init__(self, call_ms: float, item_ms: float, dim: int = 384):
+        self.call_s = call_ms / 1000
+        self.item_s = item_ms / 1000
+        self.dim = dim
+
+    def _encode(self, texts) -> np.ndarray:
+        end = time.perf_counter() + self.call_s + self.item_s * len(texts)
+        while time.perf_counter() < end:
+            pass
+        return np.stack([
+            np.random.default_rng(zlib.crc32(text.encode())).standard_normal(self.dim, dtype=np.float32)
+            for text in texts
+        ]) if texts else np.empty((0, self.dim), dtype=np.float32)
@@ -7,7 +7,9 @@ backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "bac
 if backend_dir not in sys.path:
     sys.path.insert(0, backend_dir)
 
+import json
 import pytest
+import numpy as np
 from pydantic import ValidationError
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
@@ -59,4 +61,1027 @@ def test_db_session():
     with get_db() as db:
         assert isinstance(db, Session)
         # Verify db is active/open
-        assert db.is_active
\ No newline at end of file
+        assert db.is_active
+
+class _FakeEmbeddings:
+    """Deterministic bag-of-letters embeddings so vector store tests need no model download."""
+
+    def _vector(self, text):
+        vec = [0.0] * 26
+        for ch in text.lower():
+            if "a" <= ch <= "z":
+                vec[ord(ch) - ord("a")] += 1.0
+        return vec
+
+    def embed_documents(self, texts):
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+# 5. Binary Vector Index Round Trip Test
+def test_vector_index_round_trip(tmp_path):
+    import json
+    from app.rag.vectorstore import SimpleVectorStore, SimpleDocument, MANIFEST_FILE
+
+    model = _FakeEmbeddings()
+    legacy = {
+        "documents": [{"page_content": "insulin and glucose", "metadata": {"source": "a.pdf", "page": 1}}],
+        "embeddings": model.embed_documents(["insulin and glucose"]),
+    }
+    (tmp_path / "simple_index.json").write_text(json.dumps(legacy))
+
+    # Legacy JSON is converted on first load
+    store = SimpleVectorStore(index_dir=str(tmp_path), embeddings_model=model)
+    assert (tmp_path / MANIFEST_FILE).exists()
+    assert len(store.documents) == 1
+
+    store.add_documents([SimpleDocument("zzz xyz", {"source": "b.pdf", "page": 2})])
+
+    reloaded = SimpleVectorStore(index_dir=str(tmp_path), embeddings_model=model)
+    assert len(reloaded.documents) == 2
+    assert all(isinstance(segment.embeddings, np.memmap) for segment in reloaded.segments)
+    top = reloaded.similarity_search("glucose", k=1)[0]
+    assert top.metadata == {"source": "a.pdf", "page": 1}
+
+
+# 6. Async Groq Client Test (against a local OpenAI-compatible stub)
+def test_rag_chain_against_stub():
+    import asyncio
+    import json
+    import time
+    import httpx
+    from app.rag.chain import get_rag_chain, start_llm_client, close_llm_client
+
+    async def stub_completions(request: httpx.Request) -> httpx.Response:
+        assert request.url.path.endswith("/chat/completions")
+        body = json.loads(request.content)
+        await asyncio.sleep(0.2)  # simulated generation time
+        question = body["messages"][0]["content"].rsplit("Question: ", 1)[1].split("\n")[0]
+        return httpx.Response(200, json={"choices": [{"message": {"content": f" echo: {question} "}}]})
+
+    async def run():
+        await start_llm_client(httpx.MockTransport(stub_completions))
+        try:
+            rag_chain = get_rag_chain()
+            start = time.perf_counter()
+            answers = await asyncio.gather(*(rag_chain(f"q{i}") for i in range(5)))
+            return answers, time.perf_counter() - start
+        finally:
+            await close_llm_client()
+
+    answers, elapsed = asyncio.run(run())
+    assert answers == [f"echo: q{i}" for i in range(5)]
+    # Requests overlap instead of running back to back (5 x 0.2 s)
+    assert elapsed < 0.6
+
+
+def _parse_sse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+# 7. SSE Streaming Endpoint Test
+def test_query_stream_endpoint(monkeypatch):
+    import httpx
+    import app.rag.chain as chain
+    import app.rag.vectorstore as vectorstore
+    import app.services.chat_service as chat_service
+    from app.rag.vectorstore import SimpleDocument
+
+    saved = []
+
+    async def fake_save(*args):
+        saved.append(args)
+
+    monkeypatch.setattr(chat_service, "save_chat_history", fake_save)
+
+    embedded = []
+    real_embed_query = chat_service.embed_query
+
+    async def counting_embed_query(message):
+        embedded.append(message)
+        return await real_embed_query(message)
+
+    monkeypatch.setattr(chat_service, "embed_query", counting_embed_query)
+
+    class FakeStore:
+        def similarity_search(self, query, k=5):
+            return [SimpleDocument("Metformin lowers glucose.", {"source": "pharm.pdf", "page": 12})]
+
+    monkeypatch.setattr(vectorstore, "get_vector_store", lambda: FakeStore())
+
+    def stub_stream(request: httpx.Request) -> httpx.Response:
+        assert json.loads(request.content)["stream"] is True
+        chunks = ["Metformin", " lowers", " glucose."]
+        body = "".join(
+            f"data: {json.dumps({'choices': [{'delta': {'content': c}}]})}\n\n" for c in chunks
+        ) + "data: [DONE]\n\n"
+        return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+    monkeypatch.setattr(chain, "_llm_client", chain.create_llm_client(httpx.MockTransport(stub_stream)))
+
+    client = TestClient(app)
+    payload = {"message": "How does metformin work?", "session_id": "stream_test"}
+    events = _parse_sse(client.post("/api/v1/chat/query/stream", json=payload).text)
+    assert events[0] == ("sources", ["pharm.pdf (Page 12)"])
+    assert "".join(d for e, d in events if e == "token") == "Metformin lowers glucose."
+    assert events[-1] == ("done", {"session_id": "stream_test", "cached": False})
+    assert saved[-1][2] == "Metformin lowers glucose."
+
+    # Second request is a cache hit and is replayed through the same event sequence
+    replay = _parse_sse(client.post("/api/v1/chat/query/stream", json=payload).text)
+    assert replay[0] == ("sources", ["Cached from Vector DB"])
+    assert "".join(d for e, d in replay if e == "token") == "Metformin lowers glucose."
+    assert replay[-1][1]["cached"] is True
+    assert len(embedded) == 1  # the exact-key hit is answered without embedding the query
+
+
+# 8. Semantic Cache Test
+def test_semantic_cache():
+    from app.rag.qa_cache import get_cache_stats
+
+    rng = np.random.default_rng(42)
+    diabetes = rng.standard_normal(384).astype(np.float32)
+    save_to_cache("symptoms of diabetes?", "Thirst, polyuria and fatigue.", diabetes)
+
+    paraphrase = diabetes + 0.05 * rng.standard_normal(384).astype(np.float32)
+    assert get_cached_answer("what are diabetes symptoms", paraphrase) == "Thirst, polyuria and fatigue."
+
+    unrelated = rng.standard_normal(384).astype(np.float32)
+    assert get_cached_answer("how is asthma treated", unrelated) is None
+
+    stats = get_cache_stats()
+    assert stats["semantic_hits"] >= 1
+    assert sum(bucket["count"] for bucket in stats["similarity_histogram"]) >= 2
+
+
+# 9. Bounded TTL + LRU Cache Test
+def test_lru_cache_bounds_and_ttl():
+    from app.utils.cache import LRUCache
+
+    now = [0.0]
+    evicted = []
+    cache = LRUCache(max_entries=2, ttl=10, clock=lambda: now[0], on_evict=lambda k, v: evicted.append(k))
+
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1      # "a" becomes most recently used
+    cache.put("c", 3)               # evicts "b", the least recently used
+    assert "b" not in cache and evicted == ["b"]
+
+    now[0] = 11.0                   # past the TTL
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+# 10. Persistent (SQLite) QA Cache Test
+def test_persistent_qa_cache(tmp_path, monkeypatch):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    import app.rag.qa_cache as qa_cache
+    from app.models.cache import QACacheEntry
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'cache.db'}")
+    QACacheEntry.__table__.create(bind=engine)
+    store = qa_cache.SQLiteCacheStore(sessionmaker(bind=engine))
+    monkeypatch.setattr(qa_cache, "_persistent_store", store)
+
+    embedding = np.ones(384, dtype=np.float32)
+    save_to_cache("what causes anemia?", "Low hemoglobin.", embedding)
+
+    # A fresh worker (empty L1) is served from the shared L2 table
+    qa_cache._cache_store.clear()
+    assert get_cached_answer("what causes anemia?") == "Low hemoglobin."
+    assert qa_cache.get_cache_stats()["persistent_hits"] >= 1
+
+    # Warm-up restores entries, including their embeddings for semantic lookups
+    qa_cache._cache_store.clear()
+    assert qa_cache.warm_cache() == 1
+    assert get_cached_answer("anemia causes", embedding * 2) == "Low hemoglobin."
+
+
+# 11. Query Embedding LRU Test
+def test_query_embedding_cache():
+    from app.rag.embeddings import CachedQueryEmbeddings, get_query_cache_stats
+
+    class CountingEmbeddings(CachedQueryEmbeddings):
+        model_name = "counting-test-model"
+        calls = 0
+
+        def _encode(self, texts):
+            CountingEmbeddings.calls += 1
+            return np.full((len(texts), 4), float(len(texts[0])), dtype=np.float32)
+
+    model = CountingEmbeddings()
+    hits_before = get_query_cache_stats()["hits"]
+    first = model.embed_query("What is  Sepsis?")
+    second = model.embed_query("what is sepsis?")   # same normalized text
+    assert CountingEmbeddings.calls == 1
+    assert isinstance(second, np.ndarray) and second.dtype == np.float32
+    assert second is first
+    assert get_query_cache_stats()["hits"] == hits_before + 1
+
+
+# 12. Query Embedding Micro-Batching Test
+def test_query_embedding_batcher():
+    import asyncio
+    from app.rag.embeddings import CachedQueryEmbeddings, QueryEmbeddingBatcher
+
+    class RecordingEmbeddings(CachedQueryEmbeddings):
+        model_name = "batching-test-model"
+
+        def __init__(self):
+            self.batch_sizes = []
+
+        def _encode(self, texts):
+            self.batch_sizes.append(len(texts))
+            return np.array([[float(len(t))] * 4 for t in texts], dtype=np.float32)
+
+    model = RecordingEmbeddings()
+    batcher = QueryEmbeddingBatcher(model, max_batch=16, max_wait=0.05)
+
+    async def run():
+        await batcher.embed("warm up query")           # idle traffic: encoded on its own
+        vectors = await asyncio.gather(*(batcher.embed(f"question {'x' * i}") for i in range(10)))
+        await batcher.close()
+        return vectors
+
+    vectors = asyncio.run(run())
+    assert [v[0] for v in vectors] == [float(len(f"question {'x' * i}")) for i in range(10)]
+    assert model.batch_sizes[0] == 1
+    assert sum(model.batch_sizes[1:]) == 10 and len(model.batch_sizes) <= 3
+
+
+# 13. IVF Approximate Search Test
+def test_ivf_index_persisted_per_segment(tmp_path, monkeypatch):
+    from pathlib import Path
+    from app.core.config import settings
+    from app.rag.vectorstore import SimpleVectorStore, SimpleDocument, IVF_FILE
+
+    monkeypatch.setattr(settings, "VECTOR_SEARCH_MODE", "ivf")
+    monkeypatch.setattr(settings, "IVF_MIN_ROWS", 20)
+    monkeypatch.setattr(settings, "IVF_NPROBE", 2)
+
+    words = ["insulin", "aspirin", "femur", "retina", "cortisol", "sepsis", "bronchi", "zygote"]
+    docs = [SimpleDocument(f"{w} {w} note {i}", {"word": w}) for i in range(4) for w in words]
+    store = SimpleVectorStore(index_dir=str(tmp_path), embeddings_model=_FakeEmbeddings())
+    store.add_documents(docs)
+    assert store.segments[0].ivf is not None and (Path(store.segments[0].path) / IVF_FILE).exists()
+
+    store.add_documents([SimpleDocument("xylophone xylophone", {"word": "xylophone"})])
+    assert store.segments[1].ivf is None     # small segment is searched exactly
+    assert store.compact()
+    assert len(store.segments[0].ivf) == len(docs) + 1   # merged segment gets its own IVF
+
+    reloaded = SimpleVectorStore(index_dir=str(tmp_path), embeddings_model=_FakeEmbeddings())
+    assert len(reloaded.segments[0].ivf) == len(docs) + 1
+    assert reloaded.similarity_search("retina", k=1)[0].metadata == {"word": "retina"}
+
+
+# 14. Int8 Quantized Search Test
+def test_int8_search_matches_exact(tmp_path, monkeypatch):
+    from app.core.config import settings
+    from app.rag.vectorstore import SimpleVectorStore, SimpleDocument, INT8_CODES_FILE
+
+    words = ["insulin", "aspirin", "femur", "retina", "cortisol", "sepsis", "bronchi", "zygote"]
+    docs = [SimpleDocument(f"{w} {w} note {i}", {"word": w}) for i in range(4) for w in words]
+    exact = SimpleVectorStore(index_dir=str(tmp_path), embeddings_model=_FakeEmbeddings())
+    exact.add_documents(docs)
+    expected = [d.metadata for d in exact.similarity_search("cortisol", k=4)]
+
+    monkeypatch.setattr(settings, "VECTOR_SEARCH_MODE", "int8")
+    monkeypatch.setattr(settings, "INT8_RERANK_CANDIDATES", 8)
+    quantized = SimpleVectorStore(index_dir=str(tmp_path), embeddings_model=_FakeEmbeddings())
+    segment = quantized.segments[0]
+    assert segment.codes is not None and os.path.exists(os.path.join(segment.path, INT8_CODES_FILE))
+    assert [d.metadata for d in quantized.similarity_search("cortisol", k=4)] == expected
+
+
+# 15. Binary Hamming Prefilter Test
+def test_binary_search_matches_exact(tmp_path, monkeypatch):
+    import numpy as np
+    from app.core.config import settings
+    from app.rag.vectorstore import (
+        SimpleVectorStore, SimpleDocument, BINARY_CODES_FILE, hamming_distances, pack_signs,
+    )
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((5, 40)).astype(np.float32)
+    expected = [int(np.sum((vectors[i] > 0) != (vectors[0] > 0))) for i in range(5)]
+    assert hamming_distances(pack_signs(vectors), pack_signs(vectors[0])).tolist() == expected
+
+    words = ["insulin", "aspirin", "femur", "retina", "cortisol", "sepsis", "bronchi", "zygote"]
+    docs = [SimpleDocument(f"{w} {w} note {i}", {"word": w}) for i in range(4) for w in words]
+    exact = SimpleVectorStore(index_dir=str(tmp_path), embeddings_model=_FakeEmbeddings())
+    exact.add_documents(docs)
+    expected = [d.metadata for d in exact.similarity_search("sepsis", k=4)]
+
+    monkeypatch.setattr(settings, "VECTOR_SEARCH_MODE", "binary")
+    monkeypatch.setattr(settings, "BINARY_RERANK_CANDIDATES", 12)
+    binary = SimpleVectorStore(index_dir=str(tmp_path), embeddings_model=_FakeEmbeddings())
+    segment = binary.segments[0]
+    assert segment.sign_bits is not None and os.path.exists(os.path.join(segment.path, BINARY_CODES_FILE))
+    assert [d.metadata for d in binary.similarity_search("sepsis", k=4)] == expected
+
+
+# 16. Segmented Append And Compaction Test
+def test_segmented_index_appends_and_compacts(tmp_path, monkeypatch):
+    import os
+    import json
+    from app.core.config import settings
+    from app.rag.vectorstore import SimpleVectorStore, SimpleDocument, MANIFEST_FILE, EMBEDDINGS_FILE
+
+    monkeypatch.setattr(settings, "VECTOR_COMPACTION_MAX_SEGMENTS", 3)
+    monkeypatch.setattr(settings, "VECTOR_COMPACTION_BACKGROUND", False)
+    words = ["insulin", "aspirin", "femur", "retina", "cortisol", "sepsis", "bronchi", "zygote"]
+    store = SimpleVectorStore(index_dir=str(tmp_path), embeddings_model=_FakeEmbeddings())
+
+    store.add_documents([SimpleDocument(f"{words[0]} {i}", {"n": i}) for i in range(3)])
+    first = store.segments[0]
+    first_stat = os.stat(os.path.join(first.path, EMBEDDINGS_FILE))
+    for n, word in enumerate(words[1:3], start=1):
+        store.add_documents([SimpleDocument(word, {"n": 2 + n})])
+
+    # Appends leave existing segment files untouched
+    assert len(store.segments) == 3 and store.segments[0] is first
+    assert os.stat(os.path.join(first.path, EMBEDDINGS_FILE)).st_mtime_ns == first_stat.st_mtime_ns
+
+    # A fourth segment exceeds the limit; the two small newest ones are merged, order is kept
+    store.add_documents([SimpleDocument(words[3], {"n": 5})])
+    assert len(store.segments) <= 3
+    assert [d.metadata["n"] for d in store.documents] == [0, 1, 2, 3, 4, 5]
+    manifest = json.loads((tmp_path / MANIFEST_FILE).read_text())
+    assert sorted(os.listdir(tmp_path / "segments")) == sorted(e["name"] for e in manifest["segments"])
+
+    reloaded = SimpleVectorStore(index_dir=str(tmp_path), embeddings_model=_FakeEmbeddings())
+    assert len(reloaded.documents) == 6
+    assert reloaded.similarity_search("retina", k=1)[0].metadata == {"n": 5}
+    assert reloaded.count_by_source() == {None: 6}  # source ids carried through the merge
+
+
+# 17. Incremental Re-ingestion Test
+def test_sync_documents_only_reingests_changed_files(tmp_path, monkeypatch):
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.orm import sessionmaker
+    from app.core.config import settings
+    from app.db.session import Base, add_missing_columns
+    from app.models.history import DocumentMetadata
+    from app.rag.ingestion import sync_documents
+    import app.rag.page_cache as page_cache
+    from app.rag.page_cache import PageTextCache
+    from app.rag.vectorstore import SimpleVectorStore, SimpleDocument
+
+    monkeypatch.setattr(settings, "VECTOR_COMPACTION_BACKGROUND", False)
+    hashed, file_sha256 = [], page_cache.file_sha256
+    monkeypatch.setattr(page_cache, "file_sha256", lambda path: hashed.append(os.path.basename(path)) or file_sha256(path))
+    engine = create_engine(f"sqlite:///{tmp_path / 'meta.db'}")
+    with engine.begin() as conn:  # document_metadata as created before the hash columns existed
+        conn.execute(text(
+            "CREATE TABLE document_metadata (id INTEGER PRIMARY KEY, filename VARCHAR(255) UNIQUE, "
+            "file_path VARCHAR(512), total_pages INTEGER, total_chunks INTEGER, "
+            "ingest_date DATETIME, last_updated DATETIME)"
+        ))
+    add_missing_columns(engine)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    library = tmp_path / "library"
+    library.mkdir()
+    for name, body in [("a.txt", "insulin|glucose"), ("b.txt", "femur|tibia"), ("c.txt", "retina")]:
+        (library / name).write_text(body)
+
+    loaded = []
+
+    def load_file(path):
+        loaded.append(os.path.basename(path))
+        parts = open(path).read().split("|")
+        return [SimpleDocument(part, {"page": i}) for i, part in enumerate(parts)]
+
+    store = SimpleVectorStore(index_dir=str(tmp_path / "index"), embeddings_model=_FakeEmbeddings())
+    pages = PageTextCache(str(tmp_path / "page_text"))
+    sync = lambda: sync_documents(store, str(library), db, load_file, extensions=(".txt",), page_cache=pages)
+    content_hash = lambda name: db.query(DocumentMetadata).filter_by(filename=name).one().content_hash
+
+    assert sync()["added"] == 3 and len(store.documents) == 5
+    # The hashes of the loaded files are handed to the page cache, which does not read them again
+    assert [pages.key(str(library / name)) for name in ("a.txt", "b.txt", "c.txt")] == [
+        content_hash(name) for name in ("a.txt", "b.txt", "c.txt")
+    ] and hashed == []
+    loaded.clear()
+    assert sync()["unchanged"] == 3 and loaded == []
+
+    os.utime(library / "c.txt", (1, 1))  # touched but identical: hashed, not re-embedded
+    (library / "a.txt").write_text("insulin|glucose|ketone")
+    (library / "b.txt").unlink()
+    stats = sync()
+    assert (stats["updated"], stats["removed"], stats["unchanged"]) == (1, 1, 1) and loaded == ["a.txt"]
+    assert sorted(d.page_content for d in store.documents) == ["glucose", "insulin", "ketone", "retina"]
+    assert db.query(DocumentMetadata).filter_by(filename="a.txt").one().total_chunks == 3
+    # Only the reloaded file's hash is handed over; the touched one is not reloaded, so it is hashed
+    assert pages.key(str(library / "a.txt")) == content_hash("a.txt") and hashed == []
+    assert pages.key(str(library / "c.txt")) == content_hash("c.txt") and hashed == ["c.txt"]
+
+    reloaded = SimpleVectorStore(index_dir=str(tmp_path / "index"), embeddings_model=_FakeEmbeddings())
+    assert len(reloaded.documents) == 4
+    assert reloaded.similarity_search("tibia femur", k=4)[0].metadata["source"] != "b.txt"
+    db.close()
+
+
+# 18. Parallel PDF Extraction Test
+def test_parse_pdfs_in_order_with_isolated_failures(tmp_path):
+    from helpers import write_text_pdf
+    from app.rag.pdf_extract import parse_pdfs
+
+    write_text_pdf(str(tmp_path / "big.pdf"), [[f"femur page {p}"] for p in range(5)])
+    write_text_pdf(str(tmp_path / "small.pdf"), [["insulin dosing"]])
+    (tmp_path / "broken.pdf").write_bytes(b"%PDF-1.4 truncated")
+    paths = [str(tmp_path / name) for name in ("big.pdf", "broken.pdf", "small.pdf")]
+
+    # 5 pages at 2 per task: the big file is parsed as three ranges and reassembled in order
+    results = list(parse_pdfs(paths, workers=2, pages_per_task=2))
+    assert [path for path, _ in results] == paths
+    big, broken, small = (pages for _, pages in results)
+    assert [(page, text.strip()) for page, text in big] == [(p, f"femur page {p}") for p in range(5)]
+    assert isinstance(broken, Exception)
+    assert small[0][1].strip() == "insulin dosing"
+
+
+# 19. Streaming Ingestion Pipeline Test
+def test_ingestion_pipeline_batches_and_isolates_failures(tmp_path, monkeypatch):
+    from app.core.config import settings
+    from app.rag.pipeline import IngestionPipeline
+    from app.rag.vectorstore import SimpleVectorStore, SimpleDocument
+
+    monkeypatch.setattr(settings, "VECTOR_COMPACTION_BACKGROUND", False)
+    library = {
+        "a.pdf": ["insulin glucose", "insulin ketone"],
+        "bad.pdf": ["femur tibia fibula", "femur patella"],
+        "c.pdf": ["retina cornea"],
+    }
+
+    def load_files(paths):
+        for path in paths:
+            yield path, [SimpleDocument(text, {"page": i}) for i, text in enumerate(library[path])]
+
+    def split(path, pages):
+        for page in pages:
+            if path == "bad.pdf" and page.metadata["page"] == 1:
+                raise ValueError("corrupt page")
+            for word in page.page_content.split():
+                yield SimpleDocument(word, {"source": path, "page": page.metadata["page"]})
+
+    store = SimpleVectorStore(index_dir=str(tmp_path), embeddings_model=_FakeEmbeddings())
+    pipeline = IngestionPipeline(store, load_files, split, batch_size=3, segment_rows=4)
+    results = list(pipeline.run(list(library)))
+
+    assert [r.path for r in results] == ["a.pdf", "bad.pdf", "c.pdf"]
+    assert (results[0].pages, results[0].chunks, results[0].error) == (2, 4, None)
+    assert isinstance(results[1].error, ValueError) and results[1].chunks == 0  # buffered batch dropped
+    assert results[2].chunks == 2
+    assert [d.page_content for d in store.documents] == ["insulin", "glucose", "insulin", "ketone", "retina", "cornea"]
+    assert len(store.segments) == 2   # one segment per 4 buffered chunks, not one per batch
+    assert pipeline.stats()["embed"]["items"] == 9  # includes bad.pdf's discarded batch
+
+
+# 20. Multi-process Bulk Embedding Test
+def test_bulk_embedder_returns_vectors_in_order():
+    from functools import partial
+    from helpers import SimulatedEncoder
+    from app.rag.bulk_embed import AdaptiveBatchSize, BulkEmbedder
+
+    encoder = SimulatedEncoder(call_ms=0.0, item_ms=0.0, dim=8)
+    items = [(n, [f"text {n} {i}" for i in range(n % 7)]) for n in range(40)]  # includes empty items
+    expected = {n: encoder.embed_documents(texts) for n, texts in items}
+
+    # Worker processes (each builds its own encoder) pack items into shared batches
+    with BulkEmbedder(model_factory=partial(SimulatedEncoder, 0.0, 0.0, 8), workers=2, min_batch=4, max_batch=16) as embedder:
+        results = list(embedder.embed_stream(items))
+        assert [tag for tag, _ in results] == [n for n, _ in items]
+        for n, vectors in results:
+            assert len(vectors) == n % 7
+            if len(vectors):
+                assert np.allclose(vectors, expected[n])
+        assert embedder.stats()["rows"] == sum(n % 7 for n in range(40))
+
+    inline = BulkEmbedder(model=encoder, workers=1, min_batch=4, max_batch=16)
+    assert np.allclose(inline.embed([f"text 6 {i}" for i in range(6)]), expected[6])
+
+    # Batch size doubles while throughput improves, then settles on the best size
+    tuner = AdaptiveBatchSize(16, 256, samples=1)
+    tuner.record(16, 1.0)
+    tuner.record(32, 1.0)  # 16/s then 32/s: keep doubling
+    assert (tuner.size, tuner.settled) == (64, False)
+    tuner.record(16, 0.1)  # a batch cut at an older size is ignored
+    tuner.record(64, 4.0)  # 16/s: worse, fall back to 32
+    assert (tuner.size, tuner.settled) == (32, True)
+
+
+# 21. Recursive Text Splitter Test
+def test_text_splitter_prefers_paragraphs_and_overlaps():
+    from app.rag.splitter import TextSplitter
+    from app.rag.vectorstore import SimpleDocument
+
+    splitter = TextSplitter(chunk_size=40, chunk_overlap=0)
+    text = "Insulin lowers glucose.\n\nMetformin is first line. It reduces hepatic output of glucose."
+    # Whole paragraph first; the long one is cut at a sentence, never mid-word
+    assert splitter.split_text(text) == [
+        "Insulin lowers glucose.", "Metformin is first line.", "It reduces hepatic output of glucose.",
+    ]
+
+    words = " ".join(f"word{i}" for i in range(200))
+    chunks = TextSplitter(chunk_size=100, chunk_overlap=30).split_text(words)
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert all(chunk.split()[0] in previous for previous, chunk in zip(chunks, chunks[1:]))  # overlap
+    assert chunks[0].startswith("word0 ") and chunks[-1].endswith(" word199")
+    assert TextSplitter(chunk_size=10, chunk_overlap=0).split_text("x" * 25) == ["x" * 10, "x" * 10, "x" * 5]
+
+    page = SimpleDocument(text, {"source": "endo.pdf", "page": 3})
+    docs = list(splitter.split_pages("endo.pdf", [page]))
+    assert len(docs) == 3 and all(d.metadata == {"source": "endo.pdf", "page": 3} for d in docs)
+    docs[0].metadata["chunk"] = 0
+    assert "chunk" not in page.metadata  # metadata is copied per chunk
+
+
+# 22. Content-addressed Embedding Cache Test
+def test_embedding_cache_skips_already_embedded_chunks(tmp_path, monkeypatch):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.core.config import settings
+    from app.models.cache import EmbeddingCacheEntry
+    from app.rag.embedding_cache import EmbeddingCache
+    from app.rag.vectorstore import SimpleVectorStore, SimpleDocument
+
+    monkeypatch.setattr(settings, "VECTOR_COMPACTION_BACKGROUND", False)
+    engine = create_engine(f"sqlite:///{tmp_path / 'cache.db'}")
+    EmbeddingCacheEntry.__table__.create(bind=engine)
+    cache = EmbeddingCache("fake-letters", sessionmaker(bind=engine))
+
+    class CountingEmbeddings(_FakeEmbeddings):
+        encoded = []
+
+        def embed_documents(self, texts):
+            self.encoded.extend(texts)
+            return super().embed_documents(texts)
+
+    model = CountingEmbeddings()
+    texts = ["insulin glucose", "femur tibia", "retina cornea"]
+    first = SimpleVectorStore(index_dir=str(tmp_path / "v1"), embeddings_model=model, embedding_cache=cache)
+    first.add_documents([SimpleDocument(t) for t in texts])
+    assert model.encoded == texts
+
+    # Rebuild into a new index after one chunk changed: only that chunk reaches the model
+    model.encoded.clear()
+    rebuilt = SimpleVectorStore(index_dir=str(tmp_path / "v2"), embeddings_model=model, embedding_cache=cache)
+    rebuilt.add_documents([SimpleDocument(t) for t in ["insulin glucose", "femur patella", "retina cornea"]])
+    assert model.encoded == ["femur patella"]
+    assert [d.page_content for d in rebuilt.similarity_search("patella femur", k=1)] == ["femur patella"]
+    assert np.allclose(rebuilt.segments[0].embeddings[0], first.segments[0].embeddings[0])
+    assert cache.stats()["hits"] == 2
+
+    # Vectors are keyed per model: another model name shares nothing
+    other = EmbeddingCache("other-model", sessionmaker(bind=engine))
+    assert other.get_many(other.keys(texts)) == {}
+
+
+# 23. Extracted Page Text Cache Test
+def test_page_text_cache_skips_parsing_unchanged_pdfs(tmp_path, monkeypatch):
+    import gzip
+    import shutil
+    from helpers import write_text_pdf
+    import app.rag.pdf_extract as pdf_extract
+    from app.rag.page_cache import PageTextCache
+
+    write_text_pdf(str(tmp_path / "renal.pdf"), [["nephron filtration"], ["loop of henle"]])
+    (tmp_path / "broken.pdf").write_bytes(b"%PDF-1.4 truncated")
+    paths = [str(tmp_path / "renal.pdf"), str(tmp_path / "broken.pdf")]
+    cache = PageTextCache(str(tmp_path / "page_text"))
+
+    first = list(pdf_extract.parse_pdfs(paths, workers=1, cache=cache))
+    assert isinstance(first[1][1], Exception) and cache.stats() == {"hits": 0, "stored": 1}
+
+    # Cached files are not parsed again, under any name
+    shutil.copy(tmp_path / "renal.pdf", tmp_path / "renal copy.pdf")
+    monkeypatch.setattr(pdf_extract, "extract_page_range", lambda *args: pytest.fail("parsed a cached PDF"))
+    second = list(pdf_extract.parse_pdfs([paths[0], str(tmp_path / "renal copy.pdf")], workers=1, cache=cache))
+    assert second[0][1] == second[1][1] == first[0][1]
+    assert [text.strip() for _, text in second[0][1]] == ["nephron filtration", "loop of henle"]
+
+    # An entry written by another extractor version is re-parsed
+    monkeypatch.undo()
+    key = cache.key(paths[0])
+    with gzip.open(cache.path_for(key), "wt") as f:
+        f.write('{"extractor": "pypdf 0.0", "pages": 1}\n{"page": 0, "text": "stale"}\n')
+    assert list(pdf_extract.parse_pdfs(paths[:1], workers=1, cache=cache))[0][1] == first[0][1]
+    assert cache.get(key) == first[0][1]
+
+    # A hash handed over by the caller (sync_documents) is used once, while the file is unchanged
+    import app.rag.page_cache as page_cache
+    monkeypatch.setattr(page_cache, "file_sha256", lambda path: "rehashed")
+    cache.remember(paths[0], key, os.stat(paths[0]))
+    assert cache.key(paths[0]) == key and cache.key(paths[0]) == "rehashed"
+    cache.remember(paths[0], key, os.stat(paths[0]))
+    os.utime(paths[0], (1, 1))
+    assert cache.key(paths[0]) == "rehashed"
+
+
+# 24. Write-behind Chat History Test
+def test_history_writer_batches_and_applies_backpressure(tmp_path):
+    import asyncio
+    import threading
+    import time
+    from datetime import datetime
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.models.history import ChatHistory
+    from app.services.history_writer import HistoryWriter
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'history.db'}")
+    ChatHistory.__table__.create(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    def row(i):
+        return {"session_id": "s", "message": f"q{i}", "response": "a", "sources": "", "timestamp": datetime.utcnow()}
+
+    async def scenario():
+        writer = HistoryWriter(Session, max_batch=50, max_wait=0.01, max_queue=1000)
+        await asyncio.gather(*(writer.submit(row(i)) for i in range(120)))
+        await writer.flush()
+        with Session() as db:
+            assert db.query(ChatHistory).count() == 120
+        assert writer.stats()["batches"] <= 4  # not one transaction per record
+        await writer.close()
+
+        # While the database is stuck, requests wait once the queue is full
+        gate = threading.Event()
+        slow = HistoryWriter(Session, max_batch=1, max_wait=0, max_queue=2)
+        insert = slow._insert
+        slow._insert = lambda rows: (gate.wait(), insert(rows))
+        submits = [asyncio.create_task(slow.submit(row(i))) for i in range(5)]
+        await asyncio.sleep(0.1)
+        assert sum(task.done() for task in submits) == 3  # one being written, two queued
+        gate.set()
+        await asyncio.gather(*submits)
+        await slow.close()
+        with Session() as db:
+            assert db.query(ChatHistory).count() == 125
+
+        # Under steady traffic flush() returns once the rows submitted before it are written
+        steady = HistoryWriter(Session, max_batch=5, max_wait=0.005, max_queue=1000)
+        insert_rows = steady._insert
+        steady._insert = lambda rows: (time.sleep(0.02), insert_rows(rows))
+        stop = asyncio.Event()
+
+        async def traffic():
+            i = 0
+            while not stop.is_set():
+                await steady.submit(row(1000 + i))
+                i += 1
+                await asyncio.sleep(0.002)
+
+        producer = asyncio.create_task(traffic())
+        await asyncio.sleep(0.05)
+        submitted = steady._submitted
+        await asyncio.wait_for(steady.flush(), timeout=2)
+        assert steady.stats()["written"] >= submitted
+        stop.set()
+        await producer
+        await steady.close()
+
+    asyncio.run(scenario())
+
+
+# 25. SQLite Connection Profile Test
+def test_sqlite_profile_applied_to_every_connection(tmp_path, monkeypatch):
+    from sqlalchemy import text
+    from sqlalchemy.pool import QueuePool
+    from app.core.config import settings
+    from app.db.session import create_db_engine
+
+    monkeypatch.setattr(settings, "SQLITE_BUSY_TIMEOUT_MS", 1234)
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 3)
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'tuned.db'}")
+    assert isinstance(engine.pool, QueuePool) and engine.pool.size() == 3
+
+    with engine.connect() as first, engine.connect() as second:
+        for conn in (first, second):
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+            assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+            assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 1234
+            assert conn.execute(text("PRAGMA cache_size")).scalar() == -settings.SQLITE_CACHE_SIZE_KIB
+
+        # WAL: a reader is not blocked by an open write transaction
+        first.execute(text("CREATE TABLE t (x INTEGER)"))
+        first.commit()
+        first.execute(text("INSERT INTO t VALUES (1)"))
+        assert second.execute(text("SELECT COUNT(*) FROM t")).scalar() == 0
+        first.commit()
+        assert second.execute(text("SELECT COUNT(*) FROM t")).scalar() == 1
+
+    # In-memory databases keep SQLAlchemy's single-connection pool
+    assert not isinstance(create_db_engine("sqlite://").pool, QueuePool)
+
+
+# 26. Keyset-paginated History Test
+def test_history_endpoint_pages_with_cursor(tmp_path, monkeypatch):
+    from datetime import datetime, timedelta
+    from sqlalchemy import create_engine, insert
+    from sqlalchemy.orm import sessionmaker
+    import app.api.chat as chat_api
+    from app.models.history import ChatHistory
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'history.db'}")
+    ChatHistory.__table__.create(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(chat_api, "SessionLocal", Session)
+
+    start = datetime(2026, 1, 1)
+    rows = [
+        # Pairs of messages share a timestamp, so pages must break ties by id
+        {"session_id": "long", "message": f"q{i}", "response": "a", "sources": "", "timestamp": start + timedelta(seconds=i // 2)}
+        for i in range(25)
+    ] + [{"session_id": "other", "message": "x", "response": "a", "sources": "", "timestamp": start}]
+    with Session() as db:
+        db.execute(insert(ChatHistory), rows)
+        db.commit()
+
+    client = TestClient(app)
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 10, **({"before": cursor} if cursor else {})}
+        response = client.get("/api/v1/chat/history/long", params=params)
+        assert response.status_code == 200
+        assert len(response.json()) <= 10
+        seen += [item["message"] for item in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert seen == [f"q{i}" for i in reversed(range(25))]  # newest first, none repeated or skipped
+
+    assert client.get("/api/v1/chat/history/long", params={"before": "not-a-cursor"}).status_code == 400
+    assert client.get("/api/v1/chat/history/long", params={"limit": 0}).status_code == 422
+
+    with engine.connect() as conn:
+        plan = " ".join(str(r) for r in conn.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT * FROM chat_history WHERE session_id = 'long' "
+            "AND (timestamp, id) < ('2026-01-01 00:00:05.000000', 11) ORDER BY timestamp DESC, id DESC LIMIT 11"
+        ))
+    assert "ix_chat_history_session_timestamp_id" in plan and "TEMP B-TREE" not in plan
+
+
+# 27. Streaming History Export Test
+def test_history_export_streams_filtered_batches(tmp_path, monkeypatch):
+    import csv
+    import io
+    from datetime import datetime, timedelta
+    from sqlalchemy import create_engine, insert
+    from sqlalchemy.orm import sessionmaker
+    from types import SimpleNamespace
+    import app.api.chat as chat_api
+    from app.core.config import settings
+    from app.models.history import ChatHistory
+    from app.services.auth_service import get_current_user
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'history.db'}")
+    ChatHistory.__table__.create(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(chat_api, "SessionLocal", Session)
+    monkeypatch.setattr(settings, "HISTORY_EXPORT_BATCH_SIZE", 4)  # many batches, ties across batch edges
+
+    start = datetime(2026, 1, 1)
+    with Session() as db:
+        db.execute(insert(ChatHistory), [
+            {"session_id": f"s{i % 2}", "message": f"q{i}", "response": "line one\nline, two", "sources": "a.pdf (Page 1)|b.pdf (Page 2)",
+             "timestamp": start + timedelta(minutes=i // 3)}
+            for i in range(30)
+        ])
+        db.commit()
+
+    client = TestClient(app)
+    assert client.get("/api/v1/chat/export").status_code == 403  # no bearer token
+    user = SimpleNamespace(id=1, email="Staff@example.com", is_active=True, is_verified=True)
+    monkeypatch.setitem(app.dependency_overrides, get_current_user, lambda: user)
+    assert client.get("/api/v1/chat/export").status_code == 403  # signed in, but not an admin
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", ["staff@example.com"])
+
+    response = client.get("/api/v1/chat/export")
+    assert response.status_code == 200 and response.headers["content-type"].startswith("application/x-ndjson")
+    items = [json.loads(line) for line in response.text.splitlines()]
+    assert [item["message"] for item in items] == [f"q{i}" for i in range(30)]  # (timestamp, id) order, no gaps
+    assert items[0]["sources"] == ["a.pdf (Page 1)", "b.pdf (Page 2)"]
+
+    params = {"format": "csv", "session_id": "s1", "since": "2026-01-01T00:02:00", "until": "2026-01-01T00:06:00Z"}
+    response = client.get("/api/v1/chat/export", params=params)
+    assert response.headers["content-type"].startswith("text/csv")
+    records = list(csv.DictReader(io.StringIO(response.text)))
+    assert [r["message"] for r in records] == [f"q{i}" for i in range(6, 18) if i % 2 == 1]
+    assert records[0]["response"] == "line one\nline, two"
+
+    assert client.get("/api/v1/chat/export", params={"format": "xml"}).status_code == 422
+
+
+# 28. Full-text History Search Test
+def test_history_search_ranked_and_kept_in_sync(tmp_path, monkeypatch):
+    from datetime import datetime, timedelta
+    from sqlalchemy import create_engine, insert
+    from sqlalchemy.orm import sessionmaker
+    from types import SimpleNamespace
+    import app.api.chat as chat_api
+    from app.core.config import settings
+    from app.models.history import ChatHistory
+    from app.services.auth_service import get_current_user
+    from app.services.history_search import ensure_history_fts
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'history.db'}")
+    ChatHistory.__table__.create(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(chat_api, "SessionLocal", Session)
+
+    client = TestClient(app)
+    assert client.get("/api/v1/chat/search", params={"q": "metformin"}).status_code == 403  # no bearer token
+    user = SimpleNamespace(id=1, email="staff@example.com", is_active=True, is_verified=True)
+    monkeypatch.setitem(app.dependency_overrides, get_current_user, lambda: user)
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", ["staff@example.com"])
+
+    def row(session_id, message, response, minute):
+        return {"session_id": session_id, "message": message, "response": response, "sources": "pharm.pdf (Page 12)",
+                "timestamp": datetime(2026, 1, 1) + timedelta(minutes=minute)}
+
+    with Session() as db:  # rows written before the index exists are indexed when it is built
+        db.execute(insert(ChatHistory), [row("old", "What does metformin do?", "It lowers glucose.", 0)])
+        db.commit()
+    response = client.get("/api/v1/chat/search", params={"q": "metformin"})
+    assert response.status_code == 503 and "chat_history_fts" not in response.text  # no index yet, no SQL echoed
+    assert ensure_history_fts(engine) and ensure_history_fts(engine)
+
+    with Session() as db:  # later writes reach the index through the triggers
+        db.execute(insert(ChatHistory), [
+            row("a", "Is aspirin safe?", "Aspirin can interact with metformin rarely.", 1),
+            row("b", "Metformin dosing for metformin-naive patients", "Start low.", 2),
+            row("c", "Symptoms of flu?", "Fever and cough.", 3),
+        ] + [row("d", f"metformin question {i}", "answer", 10 + i) for i in range(5)])
+        db.commit()
+
+    hits = client.get("/api/v1/chat/search", params={"q": "metformin", "limit": 3}).json()
+    assert hits[0]["session_id"] == "b"  # repeated in the weighted question column
+    assert "[metformin]" in hits[0]["snippet"].lower() and hits[0]["sources"] == ["pharm.pdf (Page 12)"]
+
+    seen, offset = [], 0
+    while offset is not None:
+        response = client.get("/api/v1/chat/search", params={"q": "metformin", "limit": 3, "offset": offset})
+        seen += [hit["id"] for hit in response.json()]
+        offset = response.headers.get("X-Next-Offset")
+    assert len(seen) == len(set(seen)) == 8
+
+    assert [h["session_id"] for h in client.get("/api/v1/chat/search", params={"q": "lowers glucose"}).json()] == ["old"]
+    assert client.get("/api/v1/chat/search", params={"q": "metformin", "session_id": "a"}).json()[0]["session_id"] == "a"
+    assert len(client.get("/api/v1/chat/search", params={"q": "metformin", "since": "2026-01-01T00:10:00Z"}).json()) == 5
+    assert client.get("/api/v1/chat/search", params={"q": 'metformin" OR NOT (*'}).status_code == 200  # operators are not interpreted
+
+    client.delete("/api/v1/chat/history/d")
+    assert len(client.get("/api/v1/chat/search", params={"q": "metformin"}).json()) == 3
+
+
+# 29. Lost Index Re-ingestion Test
+def test_sync_documents_rebuilds_a_lost_index(tmp_path, monkeypatch):
+    import shutil
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.core.config import settings
+    from app.db.session import Base
+    from app.rag.ingestion import sync_documents
+    from app.rag.vectorstore import SimpleVectorStore, SimpleDocument, SOURCE_IDS_FILE, SOURCE_NAMES_FILE
+
+    monkeypatch.setattr(settings, "VECTOR_COMPACTION_BACKGROUND", False)
+    engine = create_engine(f"sqlite:///{tmp_path / 'meta.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    library = tmp_path / "library"
+    library.mkdir()
+    (library / "a.txt").write_text("insulin|glucose")
+    (library / "b.txt").write_text("retina")
+
+    def load_file(path):
+        return [SimpleDocument(part, {"page": i}) for i, part in enumerate(open(path).read().split("|"))]
+
+    def sync(store):
+        return sync_documents(store, str(library), db, load_file, extensions=(".txt",))
+
+    index = tmp_path / "index"
+    store = SimpleVectorStore(index_dir=str(index), embeddings_model=_FakeEmbeddings())
+    assert sync(store)["added"] == 2 and store.count_by_source() == {"a.txt": 2, "b.txt": 1}
+
+    # Segments written before per-row source ids were stored rebuild them from their documents
+    for name in (SOURCE_IDS_FILE, SOURCE_NAMES_FILE):
+        os.remove(os.path.join(store.segments[0].path, name))
+    reloaded = SimpleVectorStore(index_dir=str(index), embeddings_model=_FakeEmbeddings())
+    assert reloaded.count_by_source() == {"a.txt": 2, "b.txt": 1}
+    assert os.path.exists(os.path.join(store.segments[0].path, SOURCE_IDS_FILE))
+
+    # The records survive, the index does not: files are re-ingested although their hash is unchanged
+    shutil.rmtree(index)
+    store = SimpleVectorStore(index_dir=str(index), embeddings_model=_FakeEmbeddings())
+    stats = sync(store)
+    assert (stats["updated"], stats["unchanged"], stats["chunks"]) == (2, 0, 3)
+    assert len(store.documents) == 3
+
+    # One file's chunks missing from the store: only that file is redone
+    store.delete_by_source(["b.txt"])
+    stats = sync(store)
+    assert (stats["updated"], stats["unchanged"], stats["chunks"]) == (1, 1, 1)
+    assert sync(store)["unchanged"] == 2
+    db.close()
+
+
+# 30. Partitioned Semantic Index Test
+def test_semantic_index_splits_cells_and_finds_neighbours():
+    from app.rag.qa_cache import SemanticIndex
+
+    rng = np.random.default_rng(3)
+    topics = rng.standard_normal((20, 64)).astype(np.float32)
+    vectors = topics[rng.integers(0, 20, 1500)] + 0.5 * rng.standard_normal((1500, 64)).astype(np.float32)
+
+    index = SemanticIndex(initial_capacity=16)
+    index.MAX_CELL_ROWS = 64
+    for i, vector in enumerate(vectors):
+        index.add(f"q{i}", vector)
+    assert len(index) == 1500 and index.cells > 20
+
+    # A lookup scans only NPROBE cells yet still finds near-duplicates of stored questions
+    probes = rng.integers(0, 1500, 100)
+    found = [index.nearest(vectors[i] + 0.01 * rng.standard_normal(64).astype(np.float32)) for i in probes]
+    assert sum(key == f"q{i}" for (key, _), i in zip(found, probes)) >= 95
+    assert all(similarity > 0.99 for _, similarity in found)
+
+    # Removed keys leave no row behind: not even their own vectors find them
+    removed = {f"q{i}" for i in range(0, 1500, 2)}
+    for key in removed:
+        index.remove(key)
+    assert len(index) == 750 and not any(key in index for key in removed)
+    assert not any(key in removed for i in range(0, 1500, 2) for key, _ in index.top(vectors[i], 5))
+    assert index.nearest(vectors[0])[0] != "q0"
+
+
+# 31. Expired Semantic Candidate Test
+def test_semantic_lookup_falls_back_past_expired_entries(monkeypatch):
+    import app.rag.qa_cache as qa_cache
+    from app.utils.cache import LRUCache
+
+    now = [0.0]
+    index = qa_cache.SemanticIndex()
+    monkeypatch.setattr(qa_cache, "_semantic_index", index)
+    monkeypatch.setattr(qa_cache, "_cache_store", LRUCache(ttl=10, clock=lambda: now[0], on_evict=lambda q, _: index.remove(q)))
+    monkeypatch.setattr(qa_cache, "_persistent_store", None)
+
+    rng = np.random.default_rng(5)
+    question = rng.standard_normal(384).astype(np.float32)
+    save_to_cache("what is hypertension?", "High blood pressure.", question)
+    now[0] = 5.0
+    save_to_cache("define hypertension", "Persistently raised blood pressure.", question + 0.1 * rng.standard_normal(384).astype(np.float32))
+
+    # The closest question has expired; the next-best live one answers instead
+    now[0] = 12.0
+    assert qa_cache.get_similar_answer(question) == "Persistently raised blood pressure."
+    assert "what is hypertension?" not in index and len(index) == 1
+
+
+# 32. Tombstone Masking Test
+def test_segment_search_masks_tombstoned_rows(tmp_path, monkeypatch):
+    import app.rag.vectorstore as vectorstore
+    from app.core.config import settings
+    from app.rag.vectorstore import SimpleVectorStore, SimpleDocument, normalize_rows
+
+    monkeypatch.setattr(settings, "IVF_MIN_ROWS", 20)
+    monkeypatch.setattr(settings, "IVF_NPROBE", 64)
+    monkeypatch.setattr(settings, "INT8_RERANK_CANDIDATES", 8)
+    monkeypatch.setattr(settings, "BINARY_RERANK_CANDIDATES", 8)
+    reranked = []
+    rerank_exact = vectorstore.rerank_exact
+    monkeypatch.setattr(vectorstore, "rerank_exact", lambda e, c, q, k: reranked.append(len(c)) or rerank_exact(e, c, q, k))
+
+    words = ["insulin", "aspirin", "femur", "retina", "cortisol", "sepsis", "bronchi", "zygote"]
+    docs = [SimpleDocument(f"{w} {w} note {i}", {"word": w}) for i in range(4) for w in words]
+    SimpleVectorStore(index_dir=str(tmp_path), embeddings_model=_FakeEmbeddings()).add_documents(docs)
+    query = normalize_rows(np.asarray(_FakeEmbeddings().embed_query("cortisol"), dtype=np.float32))
+    deleted = [row for row, doc in enumerate(docs) if doc.metadata["word"] in ("cortisol", "retina", "sepsis", "insulin", "femur")]
+
+    for mode in ("exact", "ivf", "int8", "binary"):
+        monkeypatch.setattr(settings, "VECTOR_SEARCH_MODE", mode)
+        segment = SimpleVectorStore(index_dir=str(tmp_path), embeddings_model=_FakeEmbeddings()).segments[0]
+        segment.tombstone(deleted)
+        live = segment.live_rows
+        best = live[np.argsort(-(np.asarray(segment.embeddings[live]) @ query), kind="stable")]
+
+        rows, scores = segment.search(query, 4)
+        assert not set(rows.tolist()) & set(deleted)
+        assert np.allclose(scores, np.asarray(segment.embeddings[best[:4]]) @ query)
+        assert sorted(segment.search(query, 50)[0].tolist()) == live.tolist()  # k is capped at the live rows
+
+    # int8 and binary rerank a fixed candidate count (k=4, then k capped at the 12 live rows),
+    # not k plus the 20 tombstones
+    assert reranked == [8, 12, 8, 12]